@@ -0,0 +1,56 @@
+# the tests import data.* from the repository root and the dump scripts from scripts/dump_single
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parent
+for path in (ROOT, ROOT.joinpath("scripts", "dump_single")):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from dump_single import DumpNumericCatagory  # noqa: E402
+
+
+def _make_data(seed: int = 0, symbols: int = 6, dates: int = 40) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    calendar = pd.bdate_range("2001-01-01", periods=dates)
+    rows = []
+    for i in range(symbols):
+        # the spans of the symbols are different, the dates inside a span have gaps
+        span = calendar[i : dates - i]
+        span = span[rng.random(len(span)) > 0.2]
+        rows.append(
+            pd.DataFrame(
+                {
+                    "symbol": f"S{i:02d}",
+                    "date": span,
+                    "price": rng.normal(size=len(span)),
+                    "rare": np.where(rng.random(len(span)) < 0.1, rng.normal(size=len(span)), np.nan),
+                    "big": rng.integers(10**9, 10**10, len(span)).astype("float64"),
+                    "kind": rng.choice(["A", "B", None], len(span)),
+                    "filed": (span + pd.to_timedelta(rng.integers(0, 5, len(span)), unit="D")).where(
+                        rng.random(len(span)) > 0.3
+                    ),
+                }
+            )
+        )
+    return pd.concat(rows, ignore_index=True)
+
+
+def _dump(df: pd.DataFrame, path, qlib_dir, cls=DumpNumericCatagory, **kwargs):
+    df.to_parquet(path)
+    kwargs = {"symbol_field_name": "symbol", "date_field_name": "date", "max_workers": 1, **kwargs}
+    cls(csv_path=path, qlib_dir=qlib_dir, **kwargs).dump()
+
+
+@pytest.fixture()
+def make_data():
+    return _make_data
+
+
+@pytest.fixture()
+def dump():
+    return _dump
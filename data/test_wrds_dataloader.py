@@ -0,0 +1,235 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import qlib
+from qlib.config import C
+
+from data.wrds_dataloader import MultiWRDSDataLoader, WRDSDataLoader, can_fork
+
+
+@pytest.fixture()
+def dataset(tmp_path, make_data, dump):
+    df = make_data()
+    qlib_dir = tmp_path / "qlib"
+    dump(df, tmp_path / "data.parquet", qlib_dir)
+    qlib.init(provider_uri=str(qlib_dir), expression_cache=None, dataset_cache=None)
+    return df, qlib_dir
+
+
+CONFIG = {
+    "feature": (["$price", "$kind", "Ref($price, 1)", "$filed"], ["price", "kind", "last_price", "filed"]),
+    "label": (["$big"], ["big"]),
+}
+
+
+def list_shm() -> set:
+    return set(os.listdir("/dev/shm"))
+
+
+@pytest.mark.skipif(not can_fork(), reason="the partitions are loaded by forked workers on linux only")
+@pytest.mark.parametrize("use_categorical", [False, True])
+def test_parallel_equals_serial(dataset, use_categorical):
+    before = list_shm()
+    serial = WRDSDataLoader(config=CONFIG, use_categorical=use_categorical).load("all")
+    parallel = WRDSDataLoader(config=CONFIG, use_categorical=use_categorical, max_workers=4).load("all")
+    pd.testing.assert_frame_equal(parallel, serial)
+    assert list_shm() == before
+
+
+@pytest.mark.skipif(not can_fork(), reason="the partitions are loaded by forked workers on linux only")
+def test_parallel_releases_blocks_on_error(dataset, monkeypatch):
+    load_group_df = WRDSDataLoader._load_group_df
+
+    def failing(self, instruments, *args):
+        # the first partition fails, the blocks of the later ones are never read
+        if "S00" in instruments:
+            raise RuntimeError("failed partition")
+        return load_group_df(self, instruments, *args)
+
+    monkeypatch.setattr(WRDSDataLoader, "_load_group_df", failing)
+    before = list_shm()
+    with pytest.raises(RuntimeError, match="failed partition"):
+        WRDSDataLoader(config=CONFIG, max_workers=3).load("all")
+    assert list_shm() == before
+
+
+@pytest.mark.parametrize("use_categorical", [False, True])
+def test_decode_catagory(dataset, use_categorical):
+    df, qlib_dir = dataset
+    loaded = WRDSDataLoader(config=["$kind", "$filed", "$price"], use_categorical=use_categorical).load("all")
+    loaded.columns = ["kind", "filed", "price"]
+    expected = df.rename(columns={"date": "datetime", "symbol": "instrument"}).set_index(["datetime", "instrument"])
+    expected = expected.reindex(loaded.index)
+    kinds = (qlib_dir / "catagories" / "kind.day.txt").read_text().splitlines()
+    if use_categorical:
+        # the columns share the values of the catagory file
+        assert isinstance(loaded["kind"].dtype, pd.CategoricalDtype)
+        assert list(loaded["kind"].cat.categories) == kinds
+        assert isinstance(loaded["filed"].cat.categories, pd.DatetimeIndex)
+        loaded = loaded.astype({"kind": object, "filed": "datetime64[ns]"})
+    else:
+        assert loaded["kind"].dtype == object
+        assert loaded["filed"].dtype == "datetime64[ns]"
+    # the rows and codes missing in the source are None/NaT
+    assert loaded["kind"].isna().equals(expected["kind"].isna())
+    pd.testing.assert_series_equal(loaded["kind"].dropna(), expected["kind"].dropna())
+    pd.testing.assert_series_equal(loaded["filed"], expected["filed"])
+    assert loaded["price"].dtype == np.float32
+
+
+def test_catagory_mappers_cached_lazily(tmp_path):
+    from dump_single import DumpNumericCatagory
+
+    dates = pd.bdate_range("2001-01-01", periods=4)
+    pd.DataFrame(
+        {
+            "symbol": np.repeat(["X", "Y"], 4),
+            "date": np.tile(dates, 2),
+            "price": np.arange(8, dtype=float),
+            "kind": ["A", "B"] * 4,
+            "sector": ["Energy", "Utilities", None, "Energy"] * 2,
+        }
+    ).to_parquet(tmp_path / "prices.parquet")
+    qlib_dir = tmp_path / "qlib"
+    DumpNumericCatagory(
+        csv_path=tmp_path / "prices.parquet", qlib_dir=qlib_dir, max_workers=1, binary_catagory=True
+    ).dump()
+    qlib.init(provider_uri=str(qlib_dir), expression_cache=None, dataset_cache=None)
+
+    first = WRDSDataLoader(config=["$price", "$kind"])
+    # the binary file is preferred, no file is read before the load
+    assert first.catagory_files["kind"].endswith(".arrow")
+    assert first.catagory_mappers == {}
+    first.load("all")
+    # only the catagory fields of the config are read
+    assert set(first.catagory_mappers) == {"kind"}
+    second = WRDSDataLoader(config=["$kind"])
+    second.load("all")
+    assert second.catagory_mappers["kind"] is first.catagory_mappers["kind"]
+
+    # a newer txt file, e.g. rewritten by an older dump_update, is preferred and reloaded
+    text_path = qlib_dir / "catagories" / "kind.day.txt"
+    text_path.write_text("a\nb\n")
+    stat = os.stat(qlib_dir / "catagories" / "kind.day.arrow")
+    os.utime(text_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    third = WRDSDataLoader(config=["$kind"])
+    assert third.catagory_files["kind"] == str(text_path)
+    assert set(third.load("all").iloc[:, 0]) == {"a", "b"}
+
+
+@pytest.mark.parametrize(
+    "expr, rejected",
+    [
+        ("$kind", False),
+        ("  $KIND ", False),
+        ("Ref($kind, 1)", True),
+        ("$price * $kind", True),
+        ("Gt($filed, $kind)", True),
+        ("Mean($price, 5)", False),
+        # a field named like a catagory field is not one
+        ("$kindness", False),
+    ],
+)
+def test_check_rejects_operators_on_catagory(dataset, expr, rejected):
+    loader = WRDSDataLoader(config=["$price"])
+    if rejected:
+        with pytest.raises(NotImplementedError, match="Catagory_field"):
+            loader.check([expr])
+    else:
+        loader.check([expr])
+
+
+def test_expression_fields(dataset):
+    loader = WRDSDataLoader(config={"feature": ["$Price / Ref($price, 1)", "$kind"], "label": ["Ref($big, -1)"]})
+    # parsed once for the expressions of the config
+    assert loader.expr_fields == {
+        "$Price / Ref($price, 1)": frozenset({"price"}),
+        "$kind": frozenset({"kind"}),
+        "Ref($big, -1)": frozenset({"big"}),
+    }
+    # only the bare catagory fields are decoded, under the names of their columns
+    exprs, names = ["$kind", "$price", "$filed", "Ref($price, 1)"], ["k", "p", "f", "r"]
+    assert loader.get_catagory_columns(exprs, names) == {"k": "kind", "f": "filed"}
+
+
+def test_numeric_date_round_trip(tmp_path, dump):
+    funda = pd.DataFrame(
+        {
+            "gvkey": ["001", "001", "002", "002"],
+            "datadate": pd.to_datetime(["2000-12-29", "2001-03-30", "2000-12-29", "2001-03-30"]),
+            "fdate": pd.to_datetime(["2001-03-15", None, "2001-02-01", "2001-05-15"]),
+            "pdate": pd.to_datetime(["2001-02-20", "2001-05-01", None, "2001-05-10"]),
+            "at": [1.0, 2.0, 3.0, 4.0],
+        }
+    )
+    qlib_dir = tmp_path / "funda"
+    kwargs = {"symbol_field_name": "gvkey", "date_field_name": "datadate", "numeric_date": True}
+    dump(funda, tmp_path / "funda.parquet", qlib_dir, **kwargs)
+    # day offsets instead of catagories
+    assert (qlib_dir / "numeric_date_fields.txt").read_text().split() == ["fdate", "pdate"]
+    assert not list((qlib_dir / "catagories").glob("*date*"))
+    offsets = np.fromfile(qlib_dir / "features" / "001" / "fdate.day.bin", dtype="<f")[1:]
+    np.testing.assert_array_equal(offsets, [(pd.Timestamp("2001-03-15") - pd.Timestamp(0)).days, np.nan])
+
+    qlib.init(provider_uri=str(qlib_dir), expression_cache=None, dataset_cache=None)
+    # operators apply to the numeric dates, e.g. whether the preliminary filing comes first
+    config = (["$fdate", "$pdate", "Lt($pdate, $fdate)"], ["fdate", "pdate", "early"])
+    loaded = WRDSDataLoader(config=config).load("all")
+    expected = funda.rename(columns={"datadate": "datetime", "gvkey": "instrument"})
+    expected = expected.set_index(["datetime", "instrument"]).reindex(loaded.index)
+    for field in ("fdate", "pdate"):
+        assert loaded[field].dtype == "datetime64[ns]"
+        pd.testing.assert_series_equal(loaded[field], expected[field])
+    np.testing.assert_array_equal(loaded["early"], [1.0, 0.0, 0.0, 1.0])
+
+
+@pytest.fixture()
+def providers(tmp_path, dump):
+    months = pd.to_datetime(["2001-01-31", "2001-02-28", "2001-03-30"])
+    msf = pd.DataFrame({"permno": ["10001"] * 3 + ["10002"] * 2, "date": list(months) + list(months[1:])})
+    msf["ret"] = [0.01, -0.02, 0.03, 0.05, -0.01]
+    msf["shrcd"] = ["10", "10", "11", "10", None]
+    # the rates are on another calendar, with a date shared with msf
+    rates = pd.DataFrame(
+        {
+            "tocurm": ["USD", "USD", "GBP"],
+            "datadate": pd.to_datetime(["2001-01-15", "2001-02-28", "2001-02-28"]),
+            "exratm": [1.5, 1.6, 1.0],
+        }
+    )
+    dump(msf, tmp_path / "msf.parquet", tmp_path / "msf", symbol_field_name="permno")
+    dump(rates, tmp_path / "rates.parquet", tmp_path / "rates", symbol_field_name="tocurm", date_field_name="datadate")
+    qlib.init(provider_uri=str(tmp_path / "msf"), expression_cache=None, dataset_cache=None)
+    return msf, rates, {
+        "msf": {"provider_uri": str(tmp_path / "msf"), "config": {"feature": ["$ret", "$shrcd"], "label": ["$ret"]}},
+        "fx": {"provider_uri": str(tmp_path / "rates"), "config": {"feature": ["$exratm"]}},
+    }
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_multi_loader_aligns_providers(providers, max_workers):
+    msf, rates, datasets = providers
+    provider_uri = dict(C["provider_uri"])
+    df = MultiWRDSDataLoader(datasets, max_workers=max_workers).load("all")
+    assert C["provider_uri"] == provider_uri
+    # the groups are kept together, the columns are prefixed by the dataset
+    assert list(df.columns) == [
+        ("feature", "msf:$ret"),
+        ("feature", "msf:$shrcd"),
+        ("feature", "fx:$exratm"),
+        ("label", "msf:$ret"),
+    ]
+    # the union of the rows of both datasets, each dataset on its own calendar
+    expected_index = pd.MultiIndex.from_arrays(
+        [pd.concat([msf["date"], rates["datadate"]]), pd.concat([msf["permno"], rates["tocurm"]])],
+        names=["datetime", "instrument"],
+    ).sort_values()
+    pd.testing.assert_index_equal(df.index, expected_index)
+    ret = msf.set_index(["date", "permno"])["ret"]
+    exratm = rates.set_index(["datadate", "tocurm"])["exratm"]
+    np.testing.assert_allclose(df[("feature", "msf:$ret")], ret.reindex(df.index.values), rtol=1e-6)
+    np.testing.assert_allclose(df[("feature", "fx:$exratm")], exratm.reindex(df.index.values), rtol=1e-6)
+    # each dataset decodes with its own catagory dictionary
+    assert df[("feature", "msf:$shrcd")].dropna().tolist() == ["10", "10", "10", "11"]
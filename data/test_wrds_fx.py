@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import qlib
+
+from data.wrds_fx import FXConvert
+
+
+@pytest.fixture()
+def fx_uri(tmp_path, dump):
+    # units of each currency per GBP, the rate of USD in February is missing
+    rates = pd.DataFrame(
+        [
+            ("GBP", "2001-01-31", 1.0),
+            ("GBP", "2001-02-28", 1.0),
+            ("GBP", "2001-03-30", 1.0),
+            ("USD", "2001-01-31", 1.5),
+            ("USD", "2001-03-30", 1.6),
+            ("EUR", "2001-01-31", 1.2),
+            ("EUR", "2001-02-28", 1.1),
+            ("EUR", "2001-03-30", 1.0),
+        ],
+        columns=["tocurm", "datadate", "exratm"],
+    )
+    rates["datadate"] = pd.to_datetime(rates["datadate"])
+    qlib_dir = tmp_path / "g_exrt_mth"
+    dump(rates, tmp_path / "g_exrt_mth.parquet", qlib_dir, symbol_field_name="tocurm", date_field_name="datadate")
+    qlib.init(provider_uri=str(qlib_dir), expression_cache=None, dataset_cache=None)
+    return str(qlib_dir)
+
+
+@pytest.mark.parametrize("categorical", [False, True])
+def test_fx_convert(fx_uri, categorical):
+    rows = [
+        # datetime, curcd, at, expected in USD
+        ("2001-01-15", "EUR", 12.0, 12.0 * 1.5 / 1.2),
+        # the missing rate of USD is the one of January
+        ("2001-02-20", "EUR", 11.0, 11.0 * 1.5 / 1.1),
+        ("2001-03-05", "gbp", 2.0, 2.0 * 1.6),
+        ("2001-03-05", "USD", 3.0, 3.0),
+        # the months after the last rate use the last rate
+        ("2001-06-29", "EUR", 1.0, 1.6),
+        ("2001-03-05", "JPY", 1.0, np.nan),
+        ("2001-03-05", None, 1.0, np.nan),
+        ("2000-12-29", "EUR", 1.0, np.nan),
+    ]
+    index = pd.MultiIndex.from_arrays(
+        [pd.to_datetime([row[0] for row in rows]), [f"I{i}" for i in range(len(rows))]],
+        names=["datetime", "instrument"],
+    )
+    currencies = pd.Series([row[1] for row in rows], dtype="category" if categorical else object)
+    df = pd.DataFrame(
+        {
+            ("feature", "curcd"): currencies.values,
+            ("feature", "at"): np.array([row[2] for row in rows], dtype=np.float32),
+        },
+        index=index,
+    )
+    df = FXConvert(fx_uri, fields=["at"])(df)
+    assert df[("feature", "at")].dtype == np.float32
+    np.testing.assert_allclose(df[("feature", "at")], [row[3] for row in rows], rtol=1e-6)
+
+
+def test_rates_reloaded_after_rewrite(fx_uri):
+    df = pd.DataFrame(
+        {"curcd": ["EUR"], "at": np.array([12.0], dtype=np.float32)},
+        index=pd.MultiIndex.from_tuples([(pd.Timestamp("2001-01-15"), "I0")], names=["datetime", "instrument"]),
+    )
+    convert = FXConvert(fx_uri, fields=["at"])
+    np.testing.assert_allclose(convert(df.copy())["at"], [15.0], rtol=1e-6)
+    # only the rate bin of EUR is rewritten, the calendar and the instruments are the same
+    bin_path = os.path.join(fx_uri, "features", "eur", "exratm.day.bin")
+    data = np.fromfile(bin_path, dtype="<f")
+    data[1:] *= 2
+    data.tofile(bin_path)
+    stat = os.stat(bin_path)
+    os.utime(bin_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    np.testing.assert_allclose(convert(df.copy())["at"], [7.5], rtol=1e-6)
@@ -0,0 +1,134 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from qlib.data.cache import H
+from qlib.data.dataset.processor import Fillna
+
+from data.wrds_dataloader import WRDSDataLoader
+from data.wrds_handler import WRDS, get_feature_config
+
+
+@pytest.fixture()
+def dataset(tmp_path):
+    import qlib
+    from dump_single import DumpNumericCatagory
+
+    dates = pd.bdate_range("2001-01-01", periods=30)
+    df = pd.DataFrame(
+        {
+            "symbol": np.repeat(["A", "B", "C"], len(dates)),
+            "date": np.tile(dates, 3),
+            "price": np.arange(3 * len(dates), dtype=float),
+        }
+    )
+    df.to_parquet(tmp_path / "prices.parquet")
+    qlib_dir = tmp_path / "qlib"
+    DumpNumericCatagory(
+        csv_path=tmp_path / "prices.parquet",
+        qlib_dir=qlib_dir,
+        symbol_field_name="symbol",
+        date_field_name="date",
+        max_workers=1,
+    ).dump()
+    qlib.init(provider_uri=str(qlib_dir), expression_cache=None, dataset_cache=None)
+    return qlib_dir
+
+
+def make_handler(cache_dir):
+    return WRDS(instruments="all", include_fields=["price"], infer_processors=[Fillna()], cache_dir=str(cache_dir))
+
+
+def test_cache_key_of_processor_instances(dataset, tmp_path):
+    # the repr of a processor instance has its address, the key must not
+    first, second = make_handler(tmp_path / "cache"), make_handler(tmp_path / "cache")
+    assert first.get_cache_key("fit_seq") == second.get_cache_key("fit_seq")
+    assert len(os.listdir(tmp_path / "cache")) == 1
+
+
+def test_cache_invalidated_by_features(dataset, tmp_path):
+    handler = make_handler(tmp_path / "cache")
+    key = handler.get_cache_key("fit_seq")
+    # rewrite the bin of the first instrument only, calendars and instruments are the same
+    bin_path = dataset / "features" / "a" / "price.day.bin"
+    data = np.fromfile(bin_path, dtype="<f")
+    data[1:] *= 2
+    data.tofile(bin_path)
+    stat = bin_path.stat()
+    os.utime(bin_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    # a new session after the re-dump, the features are not in the memory cache of qlib
+    H.clear()
+    reloaded = make_handler(tmp_path / "cache")
+    assert reloaded.get_cache_key("fit_seq") != key
+    price = reloaded.fetch(col_set="feature")["price"]
+    np.testing.assert_array_equal(price.xs("A", level="instrument").to_numpy(), np.arange(30, dtype="float32") * 2)
+
+
+@pytest.mark.parametrize("iterate", [lambda h: h.iter_batches(batch_size=2), lambda h: h.iter_time_shards(freq="2W")])
+def test_iteration_equals_full_load(dataset, iterate):
+    handler = WRDS(instruments="all", include_fields=["price"], infer_processors=[Fillna()])
+    full = handler.fetch()
+    batches = list(iterate(handler))
+    assert len(batches) > 1
+    pd.testing.assert_frame_equal(pd.concat(batches).sort_index(), full)
+    # the frames of the handler are restored after the iteration
+    pd.testing.assert_frame_equal(handler.fetch(), full)
+
+
+def test_iteration_closed_early_restores_frames(dataset):
+    handler = WRDS(instruments="all", include_fields=["price"])
+    full = handler.fetch()
+    batches = handler.iter_batches(batch_size=1)
+    assert len(next(batches)) == 30
+    batches.close()
+    pd.testing.assert_frame_equal(handler.fetch(), full)
+
+
+def test_cache_hit_miss_and_processor_change(dataset, tmp_path, monkeypatch):
+    loads = []
+    load = WRDSDataLoader.load
+
+    def counted(self, *args, **kwargs):
+        loads.append(args)
+        return load(self, *args, **kwargs)
+
+    monkeypatch.setattr(WRDSDataLoader, "load", counted)
+
+    def cached(fill_value):
+        handler = WRDS(
+            instruments="all",
+            include_fields=["price"],
+            infer_processors=[Fillna(fill_value=fill_value)],
+            cache_dir=str(tmp_path / "cache"),
+        )
+        return handler.fetch()
+
+    miss = cached(0)
+    assert len(loads) == 1
+    # the same config is a hit, the data is not loaded
+    pd.testing.assert_frame_equal(cached(0), miss)
+    assert len(loads) == 1
+    # another processor config is a miss
+    pd.testing.assert_frame_equal(cached(1), miss)
+    assert len(loads) == 2
+    assert len(os.listdir(tmp_path / "cache")) == 2
+
+
+def test_manifest_describes_the_dump(tmp_path, make_data, dump):
+    df = make_data(symbols=4)
+    qlib_dir = tmp_path / "qlib"
+    # rare is a sparse bin, a scan of the *.bin of the first instrument misses it
+    dump(df, tmp_path / "data.parquet", qlib_dir, sparse_ratio=0.5)
+    manifest = json.loads((qlib_dir / "manifest.json").read_text())
+    assert manifest["fields"] == ["big", "filed", "kind", "price", "rare"]
+    assert manifest["catagory_fields"] == {"kind": "object", "filed": "datetime64[ns]"}
+    assert (manifest["symbol_fields"], manifest["date_field"]) == (["symbol"], "date")
+    assert (manifest["instrument_count"], manifest["row_count"]) == (4, len(df))
+    calendar = (qlib_dir / "calendars" / "day.txt").read_text().split()
+    assert manifest["calendar"] == {"start": calendar[0], "end": calendar[-1], "length": len(calendar)}
+
+    fields, names = get_feature_config(str(qlib_dir), labels=(["$big"], ["big"]))
+    assert fields == ["$filed", "$kind", "$price", "$rare"]
+    assert names == ["filed", "kind", "price", "rare"]
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from data.wrds_link import LinkTable
+
+
+def make_links() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "gvkey": ["001001", "001002", "001002", "001003", "001003"],
+            "lpermno": [10001.0, 10002.0, 10012.0, 10003.0, 10013.0],
+            "linktype": ["LU", "LC", "LU", "LU", "LC"],
+            "linkprim": ["P", "P", "P", "P", "C"],
+            "linkdt": pd.to_datetime(["1990-01-01", "1990-01-01", "2000-01-01", "1990-01-01", "2001-06-01"]),
+            "linkenddt": pd.to_datetime([None, "1999-12-31", None, None, "2001-09-30"]),
+        }
+    )
+
+
+def brute_lookup(links: pd.DataFrame, from_field: str, to_field: str, key, date):
+    # the active link starting last
+    active = links[
+        (links[from_field] == key) & (links["linkdt"] <= date) & (links["linkenddt"].isna() | (links["linkenddt"] >= date))
+    ]
+    return None if active.empty else active.sort_values("linkdt", kind="stable")[to_field].iloc[-1]
+
+
+def test_float_string_keys():
+    link = LinkTable(make_links(), from_field="lpermno", to_field="gvkey")
+    dates = ["2002-01-01"] * 4
+    expected = ["001001", "001001", "001001", None]
+    assert list(link.lookup(["10001.0", "10001", 10001.0, "99999.0"], dates)) == expected
+
+
+def test_hidden_active_link():
+    # the LC link of 001003 ended in 2001, the LU link from 1990 is still active
+    link = LinkTable(make_links(), from_field="gvkey", to_field="lpermno")
+    dates = pd.to_datetime(["2001-07-01", "2002-01-01", "1989-12-31", "2000-06-30", "1995-06-30"])
+    assert list(link.lookup(["001003", "001003", "001003", "001002", "001002"], dates)) == [
+        "10013",
+        "10003",
+        None,
+        "10012",
+        "10002",
+    ]
+
+
+def test_lookup_brute_force():
+    rng = np.random.default_rng(0)
+    n = 300
+    starts = pd.to_datetime("1980-01-01") + pd.to_timedelta(rng.integers(0, 15000, n), unit="D")
+    ends = starts + pd.to_timedelta(rng.integers(0, 5000, n), unit="D")
+    links = pd.DataFrame(
+        {
+            "gvkey": [f"{i:06d}" for i in rng.integers(0, 40, n)],
+            "lpermno": rng.integers(10000, 10100, n).astype(float),
+            "linkdt": starts,
+            "linkenddt": ends.where(rng.random(n) > 0.3, pd.NaT),
+        }
+    )
+    link = LinkTable(links, from_field="gvkey", to_field="lpermno", linktype=None, linkprim=None)
+    keys = [f"{i:06d}" for i in rng.integers(0, 45, 2000)]
+    dates = pd.to_datetime("1980-01-01") + pd.to_timedelta(rng.integers(0, 22000, 2000), unit="D")
+    result = link.lookup(keys, dates)
+    for key, date, value in zip(keys, dates, result):
+        expected = brute_lookup(links, "gvkey", "lpermno", key, date)
+        assert value == (None if expected is None else str(int(expected)))
+
+
+def test_rekey_to_instruments():
+    link = LinkTable(make_links(), from_field="gvkey", to_field="lpermno")
+    index = pd.MultiIndex.from_arrays(
+        [pd.to_datetime(["2002-12-31", "2002-12-31", "2002-12-31"]), ["001001", "001003", "009999"]],
+        names=["datetime", "instrument"],
+    )
+    df = pd.DataFrame({"at": [1.0, 2.0, 3.0]}, index=index)
+    rekeyed = link.rekey(df, to_instruments=pd.Index(["10001.0", "10003.0"]))
+    assert rekeyed.index.get_level_values("instrument").tolist() == ["10001.0", "10003.0"]
+    assert rekeyed["at"].tolist() == [1.0, 2.0]
+
+
+@pytest.fixture(scope="module")
+def msf_funda(tmp_path_factory):
+    from dump_single import DumpNumericCatagory
+
+    root = tmp_path_factory.mktemp("link")
+    months = pd.date_range("2000-01-31", "2002-12-31", freq="M")
+    permnos = [10001.0, 10003.0, 10013.0]
+    msf = pd.DataFrame(
+        {
+            "permno": np.repeat(permnos, len(months)),
+            "date": np.tile(months, len(permnos)),
+            "prc": np.arange(len(permnos) * len(months), dtype=float),
+        }
+    )
+    years = pd.to_datetime(["2000-12-31", "2001-12-31", "2002-12-31"])
+    funda = pd.DataFrame(
+        {
+            "gvkey": np.repeat(["001001", "001003"], len(years)),
+            "datadate": np.tile(years, 2),
+            "at": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+        }
+    )
+    msf.to_parquet(root / "msf.parquet")
+    funda.to_parquet(root / "funda.parquet")
+    make_links().to_parquet(root / "ccm.parquet")
+    for name, symbol, date in [("msf", "permno", "date"), ("funda", "gvkey", "datadate")]:
+        DumpNumericCatagory(
+            csv_path=root / f"{name}.parquet",
+            qlib_dir=root / name,
+            symbol_field_name=symbol,
+            date_field_name=date,
+            max_workers=1,
+        ).dump()
+    return root
+
+
+def test_multi_wrds_join(msf_funda):
+    import qlib
+    from data.wrds_handler import MultiWRDS
+
+    root = msf_funda
+    qlib.init(provider_uri=str(root / "msf"), expression_cache=None, dataset_cache=None)
+    link = {
+        "path": str(root / "ccm.parquet"),
+        "from_field": "gvkey",
+        "to_field": "lpermno",
+        "symbol_field": "gvkey",
+        "to_uri": str(root / "msf"),
+    }
+    handler = MultiWRDS(
+        datasets={
+            "msf": {"provider_uri": str(root / "msf"), "include_fields": ["prc"]},
+            "funda": {"provider_uri": str(root / "funda"), "include_fields": ["at"], "link": link},
+        },
+        instruments="all",
+    )
+    df = handler.fetch(col_set="feature")
+    assert set(df.index.get_level_values("instrument")) == {"10001.0", "10003.0", "10013.0"}
+    joined = df.dropna()
+    # funda rows land on the msf rows of the linked permnos, 001003 moves to 10013 during its LC link only
+    assert joined.index.tolist() == [
+        (pd.Timestamp("2000-12-31"), "10001.0"),
+        (pd.Timestamp("2000-12-31"), "10003.0"),
+        (pd.Timestamp("2001-12-31"), "10001.0"),
+        (pd.Timestamp("2001-12-31"), "10003.0"),
+        (pd.Timestamp("2002-12-31"), "10001.0"),
+        (pd.Timestamp("2002-12-31"), "10003.0"),
+    ]
+    assert joined["funda:at"].tolist() == [1.0, 4.0, 2.0, 5.0, 3.0, 6.0]
@@ -0,0 +1,130 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+import qlib
+from qlib.data import D
+from qlib.data.cache import H
+
+from data.wrds_storage import WRDSFeatureStorage
+from dump_single import DumpNumericCatagoryUpdate
+
+
+def init_qlib(qlib_dir):
+    qlib.init(
+        provider_uri=str(qlib_dir),
+        feature_provider={
+            "class": "LocalFeatureProvider",
+            "kwargs": {"backend": {"class": "WRDSFeatureStorage", "module_path": "data.wrds_storage"}},
+        },
+        expression_provider={"class": "WRDSExpressionProvider", "module_path": "data.wrds_storage"},
+        expression_cache=None,
+        dataset_cache=None,
+    )
+    # a new session, the maps and the features of the former datasets are not reused
+    WRDSFeatureStorage.clear_maps()
+    H.clear()
+
+
+def load(fields) -> pd.DataFrame:
+    df = D.features(D.instruments("all"), [f"${field}" for field in fields])
+    df.columns = list(fields)
+    return df.swaplevel().sort_index()
+
+
+def test_round_trip(tmp_path, make_data, dump):
+    df = make_data()
+    kwargs = {"sparse_ratio": 0.5, "float64_fields": "big", "compact_catagory": True}
+    dump(df, tmp_path / "data.parquet", tmp_path / "qlib", **kwargs)
+    manifest = json.loads((tmp_path / "qlib" / "manifest.json").read_text())
+    assert manifest["sparse_fields"] == ["rare"]
+    assert manifest["bin_dtypes"] == {"big": "<f8", "kind": "<u1", "filed": "<u1"}
+    assert (tmp_path / "qlib" / "features" / "s00" / "rare.day.sbin").exists()
+    init_qlib(tmp_path / "qlib")
+    features = load(["price", "rare", "big", "kind"])
+
+    expected = (
+        df.assign(kind=df["kind"].map({"A": 0.0, "B": 1.0}))
+        .rename(columns={"date": "datetime", "symbol": "instrument"})
+        .set_index(["datetime", "instrument"])[features.columns]
+    )
+    features = features.dropna(how="all")
+    expected = expected.dropna(how="all")
+    pd.testing.assert_index_equal(features.index, expected.sort_index().index)
+    expected = expected.reindex(features.index)
+    np.testing.assert_allclose(features["price"], expected["price"], rtol=1e-6)
+    np.testing.assert_array_equal(features["rare"], expected["rare"].astype(np.float32))
+    # float64 bins keep the integers beyond the precision of float32
+    assert features["big"].dtype == np.float64
+    np.testing.assert_array_equal(features["big"], expected["big"])
+    np.testing.assert_array_equal(features["kind"], expected["kind"])
+
+
+def read_dtype(path) -> np.dtype:
+    return np.dtype(path.read_bytes()[:8].rstrip(b"\0").decode("ascii"))
+
+
+@pytest.fixture()
+def kinds():
+    # two symbols on the same dates, X is not in the delta
+    dates = pd.bdate_range("2001-01-01", periods=300)
+    return pd.DataFrame(
+        {
+            "symbol": np.repeat(["X", "Y"], len(dates)),
+            "date": np.tile(dates, 2),
+            "kind": [f"K{i:03d}" if i % 7 else None for i in range(len(dates))] * 2,
+        }
+    )
+
+
+def test_update_widens_codes(tmp_path, kinds, dump):
+    # 200 catagories fit uint8, 300 do not
+    base = kinds[kinds["date"] < kinds["date"].iloc[200]]
+    delta = kinds[(kinds["date"] >= kinds["date"].iloc[200]) & (kinds["symbol"] == "Y")]
+    dump(base, tmp_path / "base.parquet", tmp_path / "qlib", compact_catagory=True)
+    assert json.loads((tmp_path / "qlib" / "manifest.json").read_text())["bin_dtypes"] == {"kind": "<u1"}
+    dump(delta, tmp_path / "delta.parquet", tmp_path / "qlib", cls=DumpNumericCatagoryUpdate)
+    assert json.loads((tmp_path / "qlib" / "manifest.json").read_text())["bin_dtypes"] == {"kind": "<u2"}
+    # the bin of X is not updated, it keeps the dtype in its header
+    assert read_dtype(tmp_path / "qlib" / "features" / "x" / "kind.day.tbin") == np.uint8
+    assert read_dtype(tmp_path / "qlib" / "features" / "y" / "kind.day.tbin") == np.uint16
+
+    init_qlib(tmp_path / "qlib")
+    features = load(["kind"])
+    lines = (tmp_path / "qlib" / "catagories" / "kind.day.txt").read_text().splitlines()
+    decoded = features["kind"].map(lambda code: None if np.isnan(code) else lines[int(code)])
+    expected = pd.concat([base, delta]).set_index(["date", "symbol"])["kind"]
+    expected.index.names = ["datetime", "instrument"]
+    pd.testing.assert_series_equal(
+        decoded.dropna(), expected.dropna().sort_index(), check_names=False, check_index_type=False
+    )
+
+
+def test_sparse_bin_reads_as_dense(tmp_path, dump):
+    # a daily price and a quarterly eps on the same calendar
+    dates = pd.bdate_range("2001-01-01", "2001-12-31")
+    prices = pd.DataFrame({"gvkey": np.repeat(["001", "002"], len(dates)), "datadate": np.tile(dates, 2)})
+    prices["prc"] = np.arange(len(prices), dtype=float)
+    quarter_ends = dates.to_series().groupby(dates.to_period("Q")).max()
+    prices["eps"] = np.where(prices["datadate"].isin(quarter_ends), prices["prc"] / 100, np.nan)
+    prices.loc[(prices["gvkey"] == "002") & (prices["datadate"] < "2001-05-01"), "eps"] = np.nan
+    kwargs = {"symbol_field_name": "gvkey", "date_field_name": "datadate"}
+    dump(prices, tmp_path / "prices.parquet", tmp_path / "sparse", sparse_ratio=0.1, **kwargs)
+    dump(prices, tmp_path / "prices.parquet", tmp_path / "dense", **kwargs)
+    assert json.loads((tmp_path / "sparse" / "manifest.json").read_text())["sparse_fields"] == ["eps"]
+    sparse_bin = tmp_path / "sparse" / "features" / "002" / "eps.day.sbin"
+    assert sparse_bin.stat().st_size < (tmp_path / "dense" / "features" / "002" / "eps.day.bin").stat().st_size
+    init_qlib(tmp_path / "dense")
+
+    calendar_length = len(dates)
+    for instrument in ("001", "002"):
+        sparse = WRDSFeatureStorage(instrument, "eps", "day", provider_uri={"day": str(tmp_path / "sparse")})
+        dense = WRDSFeatureStorage(instrument, "eps", "day", provider_uri={"day": str(tmp_path / "dense")})
+        assert sparse.uri.with_suffix(".sbin").exists() and not sparse.uri.exists()
+        assert (sparse.start_index, sparse.end_index, len(sparse)) == (dense.start_index, dense.end_index, len(dense))
+        for i in range(dense.start_index, dense.end_index + 1):
+            np.testing.assert_array_equal(sparse[i], dense[i])
+        # windows before the start, inside, across the end and after the end of the data
+        for window in [slice(None), slice(0, 40), slice(50, 130), slice(200, calendar_length + 10), slice(300, 400)]:
+            pd.testing.assert_series_equal(sparse[window], dense[window])
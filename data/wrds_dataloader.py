@@ -1,16 +1,204 @@
 
 import os
 import re
+import sys
+import json
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
 from typing import Tuple, Union, List
+import numpy as np
 import pandas as pd
+import pyarrow.feather as feather
 
 from qlib.config import C
-from qlib.data.dataset.loader import QlibDataLoader
+from qlib.data import D
+from qlib.data.cache import H
+from qlib.data.dataset.loader import DataLoader, QlibDataLoader
+
+from data.wrds_link import LinkTable
+
+# process-wide cache of the catagory mappers: file path -> ((mtime, size), mapper)
+_CATAGORY_CACHE={}
+
+# process-wide cache of the manifests: file path -> ((mtime, size), manifest)
+_MANIFEST_CACHE={}
+MANIFEST_FILE='manifest.json'
+
+
+def read_manifest(uri: str) -> Union[dict, None]:
+    """
+    manifest.json written by dump_single.py: fields, dtypes, catagory fields, instrument and row counts of the dataset.
+    None for the dumps of older versions.
+    """
+    path=os.path.join(str(uri), MANIFEST_FILE)
+    try:
+        stat=os.stat(path)
+    except FileNotFoundError:
+        return None
+    version=(stat.st_mtime_ns, stat.st_size)
+    cached=_MANIFEST_CACHE.get(path)
+    if cached is None or cached[0]!=version:
+        with open(path, 'r') as f:
+            cached=(version, json.load(f))
+        _MANIFEST_CACHE[path]=cached
+    return cached[1]
+
+
+@contextmanager
+def use_provider(uri: str):
+    """
+    switch qlib to the provider dir uri in this process without qlib.init, the previous provider is restored on exit.
+    the memory caches(calendars, instruments, features) are keyed without the provider, so they are cleared.
+    """
+    old_provider_uri, old_mount_path=C["provider_uri"], C["mount_path"]
+    C["provider_uri"]=C.DataPathManager.format_provider_uri(str(uri))
+    C["mount_path"]={freq: None for freq in C["provider_uri"]}
+    H.clear()
+    try:
+        yield
+    finally:
+        C["provider_uri"], C["mount_path"]=old_provider_uri, old_mount_path
+        H.clear()
+
+
+def can_fork() -> bool:
+    """
+    fork after threads(numpy/pyarrow pools, the system frameworks of macOS) is only safe on linux, the data is loaded
+    in the process elsewhere
+    """
+    return sys.platform.startswith("linux") and "fork" in mp.get_all_start_methods()
+
+
+# the loader of the parent process, inherited by the forked workers of load_group_df
+_FORK_LOADER=None
+
+
+def _fork_load_partition(args):
+    # qlib's own joblib parallelism is disabled in the workers, the partitions are the parallelism
+    C["kernels"]=1
+    df=_FORK_LOADER._load_group_df(*args)
+    return _to_shared(df)
+
+
+def _to_shared(df: pd.DataFrame) -> dict:
+    """
+    move the float columns of df into one shared memory block(column major), the rest is pickled as usual
+    """
+    # an Index keeps the MultiIndex columns of a loaded frame
+    float_mask=(df.dtypes==np.float32).to_numpy()
+    float_columns=df.columns[float_mask]
+    shm=None
+    if len(float_columns) and len(df):
+        shm=SharedMemory(create=True, size=len(df)*len(float_columns)*4)
+        try:
+            np.ndarray((len(df), len(float_columns)), dtype=np.float32, buffer=shm.buf, order="F")[:]=df[float_columns].to_numpy()
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+        shm.close()
+        # the tracker of the worker would unlink the block when the worker exits, the parent owns and unlinks it, see
+        # _fork_shared
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return dict(
+        shm_name=None if shm is None else shm.name,
+        index=df.index,
+        columns=df.columns,
+        float_columns=float_columns,
+        others=df.loc[:, ~float_mask],
+    )
+
+
+def _release_shared(shared: dict):
+    if shared["shm_name"] is None:
+        return
+    try:
+        shm=SharedMemory(name=shared["shm_name"])
+    except FileNotFoundError:
+        return
+    shm.close()
+    shm.unlink()
+
+
+@contextmanager
+def _fork_shared(func, args: list, max_workers: int):
+    """
+    run func(returning _to_shared) on args in forked workers, and yield the results in the order of args.
+
+    all the workers are waited for, and the blocks of every finished one are unlinked on exit, also when another
+    worker raised, so that no block is left in /dev/shm
+    """
+    futures=[]
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("fork")) as executor:
+            futures=[executor.submit(func, arg) for arg in args]
+        for future in futures:
+            if future.exception() is not None:
+                raise future.exception()
+        yield [future.result() for future in futures]
+    finally:
+        for future in futures:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                _release_shared(future.result())
+
+
+def _from_shared(shareds: list, sort: bool = False) -> pd.DataFrame:
+    """
+    the frame of the partitions loaded by the workers, concatenated by rows and sorted by the index if sort.
+
+    the float columns are copied once from the blocks into their rows of the float array of the result, the other
+    columns are inserted into the result beside it, so the floats are neither pickled nor copied again
+    """
+    float_columns=shareds[0]["float_columns"]
+    if any(not shared["float_columns"].equals(float_columns) for shared in shareds[1:]):
+        # the dtypes of the partitions differ, e.g. all-null ones
+        df=pd.concat([_from_shared([shared]) for shared in shareds], axis=0)
+        return df.sort_index() if sort else df
+    index=shareds[0]["index"].append([shared["index"] for shared in shareds[1:]]) if len(shareds)>1 else shareds[0]["index"]
+    rows=np.arange(len(index))
+    if sort:
+        order=pd.Series(rows, index=index).sort_index().to_numpy()
+        index=index[order]
+        rows=np.empty_like(order)
+        rows[order]=np.arange(len(order))
+    values=np.full((len(index), len(float_columns)), np.nan, dtype=np.float32, order="F")
+    start=0
+    for shared in shareds:
+        end=start+len(shared["index"])
+        if shared["shm_name"] is not None:
+            shm=SharedMemory(name=shared["shm_name"])
+            try:
+                block=np.ndarray((end-start, len(float_columns)), dtype=np.float32, buffer=shm.buf, order="F")
+                values[rows[start:end]]=block
+                del block
+            finally:
+                shm.close()
+        start=end
+    df=pd.DataFrame(values, index=index, columns=float_columns, copy=False)
+    others=pd.concat([shared["others"] for shared in shareds], axis=0) if len(shareds)>1 else shareds[0]["others"]
+    if sort:
+        others=others.take(order)
+    float_columns=set(float_columns)
+    for loc, column in enumerate(shareds[0]["columns"]):
+        if column not in float_columns:
+            df.insert(loc, column, others[column].array)
+    return df
+
 
 class WRDSDataLoader(QlibDataLoader):
     
     CATAGORIES_SEP='\t'
     CATAGORY_DTYPE_FILE='catagory_dtypes.txt'
+    CATAGORY_DIR_NAME='catagories'
+    # datetime fields dumped as day offsets by dump_single.py --numeric_date
+    NUMERIC_DATE_FILE='numeric_date_fields.txt'
+    # suffixes of the catagory files, the binary one(written by dump_single.py --binary_catagory) is preferred
+    CATAGORY_SUFFIXES=('.arrow', '.txt')
+    # raw feature of a qlib expression, e.g. $close
+    FIELD_PATTERN=re.compile(r"\$(\w+)")
     
     def __init__(
         self,
@@ -19,6 +207,9 @@ class WRDSDataLoader(QlibDataLoader):
         swap_level: bool = True,
         freq: Union[str, dict] = "day",
         inst_processor: dict = None,
+        use_categorical: bool = False,
+        max_workers: int = 1,
+        link: dict = None,
     ):
         """
         Parameters
@@ -34,35 +225,126 @@ class WRDSDataLoader(QlibDataLoader):
             If type(config) == dict and type(freq) == dict, load config[<group_name>] data using freq[<group_name>]
         inst_processor: dict
             If inst_processor is not None and type(config) == dict; load config[<group_name>] data using inst_processor[<group_name>]
+        use_categorical: bool
+            If True, catagory fields are returned as pd.Categorical sharing the catagory values, else as objects(datetime64[ns] for datetime fields)
+        max_workers: int
+            If > 1, the instruments are partitioned across max_workers forked processes(on linux only), each one loads and decodes its partition
+        link: dict
+            If not None, the instruments are re-keyed by a link table on each date, e.g. funda onto the permnos of msf:
+            dict(path="ccmxpf_lnkhist.parquet", from_field="gvkey", to_field="lpermno", symbol_field="gvkey", to_uri=".../msf"),
+            symbol_field is the symbol field of the dataset holding the from key, to_uri is the dataset keyed by the
+            linked identifiers, whose instrument names are used(e.g. "10001.0"), the other keys are passed to LinkTable
         """
         super().__init__(config, filter_pipe, swap_level, freq,inst_processor)
+        self.use_categorical=use_categorical
+        self.max_workers=max_workers
+        self.link=link
+        # raw $fields touched by each expression of the config, built once
+        self.expr_fields=self.get_expr_fields(self.fields)
         
         data_uri=[uri for uri in C.dpm.provider_uri.values()][0]
+        self.manifest=read_manifest(data_uri)
+        self.numeric_date_fields=self.get_numeric_date_fields(data_uri)
         try:
-            self.catagory_mappers=self.get_catagory_mappers(data_uri)
             self.catagory_dtypes=self.get_catagory_dtypes(data_uri,freq)
-            self.catagory_fields=list(self.catagory_mappers.keys())
+            self.catagory_files=self.get_catagory_files(data_uri)
+            # loaded lazily by get_catagory_mapper, only for the catagory fields in the loaded columns
+            self.catagory_mappers={}
+            self.catagory_fields=list(self.catagory_files.keys())
         except:
             self.catagory_mappers=None
+            self.catagory_files=None
             self.catagory_dtypes=None
             self.catagory_fields=None
     
-    def get_catagory_mappers(self, uri: str):
+    def get_expr_fields(self, fields) -> dict:
+        expr_fields={}
+        for exprs, _ in (fields.values() if self.is_group else [fields]):
+            for expr in exprs:
+                self.parse_expr(expr, expr_fields)
+        return expr_fields
+
+    def parse_expr(self, expr: str, expr_fields: dict = None) -> frozenset:
+        expr_fields=self.expr_fields if expr_fields is None else expr_fields
+        if expr not in expr_fields:
+            expr_fields[expr]=frozenset(field.lower() for field in self.FIELD_PATTERN.findall(expr))
+        return expr_fields[expr]
+
+    def get_catagory_files(self, uri: str) -> dict:
+        """
+        the catagory file of each field, no file is read here
+        """
+        catagory_files={}
+        dir=os.path.join(str(uri), self.CATAGORY_DIR_NAME)
+        for file in sorted(os.listdir(dir)):
+            field, suffix= file.split('.')[0], os.path.splitext(file)[1]
+            if suffix not in self.CATAGORY_SUFFIXES:
+                continue
+            path=os.path.join(dir, file)
+            if field in catagory_files:
+                # the binary file is stale if the txt is newer, e.g. after dump_update of an old version
+                other=catagory_files[field]
+                binary, text=(path, other) if suffix=='.arrow' else (other, path)
+                path=binary if os.stat(binary).st_mtime_ns>=os.stat(text).st_mtime_ns else text
+            catagory_files[field]=path
+        return catagory_files
+
+    def get_catagory_mapper(self, field: str) -> pd.Index:
+        """
+        the mapper of a catagory field is a pd.Index of its values, the code i is decoded as mapper[i].
+        mappers are cached in the process and reloaded when the file changes.
+        """
+        if field not in self.catagory_mappers:
+            path=self.catagory_files[field]
+            stat=os.stat(path)
+            version=(stat.st_mtime_ns, stat.st_size)
+            cached=_CATAGORY_CACHE.get(path)
+            if cached is None or cached[0]!=version:
+                cached=(version, self.read_catagory_mapper(path, self.catagory_dtypes.get(field)))
+                _CATAGORY_CACHE[path]=cached
+            self.catagory_mappers[field]=cached[1]
+        return self.catagory_mappers[field]
 
-        catagory_dict={}
-        dir=[uri for uri in C.dpm.provider_uri.values()][0]+'/catagories'
-        for file in os.listdir(dir):
-            field= file.split('.')[0]
-            with open(dir+'/'+file, 'r') as f:
-                content=f.read().splitlines()
-            catagory_dict[field]=dict(zip(range(len(content)), content))
-        return catagory_dict
+    @staticmethod
+    def read_catagory_mapper(path: str, dtype: str) -> pd.Index:
+        if path.endswith('.arrow'):
+            values=feather.read_table(path, memory_map=True).column(0).to_numpy(zero_copy_only=False)
+        else:
+            with open(path, 'r') as f:
+                values=f.read().splitlines()
+        if dtype=="datetime64[ns]":
+            return pd.DatetimeIndex(pd.to_datetime(values))
+        return pd.Index(values, dtype=object)
+
+    def get_numeric_date_fields(self, uri: str) -> set:
+        if self.manifest is not None:
+            return set(self.manifest['numeric_date_fields'])
+        path=os.path.join(str(uri), self.NUMERIC_DATE_FILE)
+        if not os.path.exists(path):
+            return set()
+        with open(path, 'r') as f:
+            return set(f.read().split())
 
     def get_catagory_dtypes(self, uri: str, freq: str):
+        if self.manifest is not None:
+            return dict(self.manifest['catagory_fields'])
         with open(uri+f'/{self.CATAGORY_DTYPE_FILE}', 'r') as f:
             content=f.read().splitlines()
         return dict([line.split(self.CATAGORIES_SEP) for line in content])
     
+    def load(self, instruments=None, start_time=None, end_time=None) -> pd.DataFrame:
+        df=super().load(instruments, start_time, end_time)
+        if self.link is not None:
+            df=self.rekey(df)
+        return df
+
+    def rekey(self, df: pd.DataFrame) -> pd.DataFrame:
+        link=dict(self.link)
+        path, symbol_field, to_uri=link.pop("path"), link.pop("symbol_field", None), link.pop("to_uri", None)
+        symbol_fields=None if self.manifest is None else self.manifest["symbol_fields"]
+        to_instruments=None if to_uri is None else LinkTable.read_instruments(to_uri)
+        return LinkTable.read(path, **link).rekey(df, symbol_fields, symbol_field, to_instruments=to_instruments)
+
     def load_group_df(
         self,
         instruments,
@@ -73,9 +355,41 @@ class WRDSDataLoader(QlibDataLoader):
         gp_name: str = None,
     ) -> pd.DataFrame:
         self.check(exprs)
+        if self.max_workers>1 and can_fork():
+            return self._load_group_df_parallel(instruments, exprs, names, start_time, end_time, gp_name)
+        return self._load_group_df(instruments, exprs, names, start_time, end_time, gp_name)
+
+    def _load_group_df(self, instruments, exprs, names, start_time, end_time, gp_name) -> pd.DataFrame:
         df=super().load_group_df(instruments, exprs, names, start_time, end_time, gp_name)
-        df=self.map(df)
+        df=self.map(df, self.get_catagory_columns(exprs, names))
         return  df
+
+    def _get_partitions(self, instruments, gp_name) -> list:
+        """
+        split the instruments into max_workers partitions, the spans of a market config are kept
+        """
+        if instruments is None or isinstance(instruments, str):
+            instruments=D.instruments("all" if instruments is None else instruments, filter_pipe=self.filter_pipe)
+        if isinstance(instruments, dict) and "market" in instruments:
+            freq=self.freq[gp_name] if isinstance(self.freq, dict) else self.freq
+            instruments=D.list_instruments(instruments, freq=freq, as_list=False)
+        items=list(instruments.items()) if isinstance(instruments, dict) else list(instruments)
+        chunks=np.array_split(np.arange(len(items)), min(self.max_workers, len(items)))
+        partitions=[[items[i] for i in chunk] for chunk in chunks if len(chunk)]
+        return [dict(partition) if isinstance(instruments, dict) else partition for partition in partitions]
+
+    def _load_group_df_parallel(self, instruments, exprs, names, start_time, end_time, gp_name) -> pd.DataFrame:
+        global _FORK_LOADER
+        partitions=self._get_partitions(instruments, gp_name)
+        if len(partitions)<=1:
+            return self._load_group_df(instruments, exprs, names, start_time, end_time, gp_name)
+        _FORK_LOADER=self
+        try:
+            args=[(partition, exprs, names, start_time, end_time, gp_name) for partition in partitions]
+            with _fork_shared(_fork_load_partition, args, len(partitions)) as shareds:
+                return _from_shared(shareds, sort=self.swap_level)
+        finally:
+            _FORK_LOADER=None
     
     
     def check(self, exprs: list,):
@@ -83,33 +397,154 @@ class WRDSDataLoader(QlibDataLoader):
         promise no operator applied on catagory fileds
 
         Args:
-            exprs (list): _description_
+            exprs (list): expressions to be loaded
         """
         if self.catagory_fields is None:
             return
-        for catafory_field_i in self.catagory_fields:
-            for expr in exprs:
-                allfields=re.findall("\$[a-z]+", "$auth",flags=0)
-                
-                if "$"+catafory_field_i in allfields and expr!= f"${catafory_field_i}":
-                    raise NotImplementedError(f"Not Support Operator on Catagory_field {catafory_field_i} in expression {expr}!")
+        catagory_fields=set(self.catagory_fields)
+        for expr in exprs:
+            used=self.parse_expr(expr)&catagory_fields
+            if used and (len(used)>1 or expr.strip().lower()!=f"${next(iter(used))}"):
+                raise NotImplementedError(f"Not Support Operator on Catagory_field {','.join(sorted(used))} in expression {expr}!")
+
+    def get_catagory_columns(self, exprs: list, names: list) -> dict:
+        """
+        the columns which are a bare catagory field or numeric date field, column name -> field
+        """
+        decoded_fields=set(self.catagory_fields or [])|self.numeric_date_fields
+        catagory_columns={}
+        for expr, name in zip(exprs, names):
+            used=self.parse_expr(expr)&decoded_fields
+            if used and expr.strip().lower()==f"${next(iter(used))}":
+                catagory_columns[name]=next(iter(used))
+        return catagory_columns
                 
-    def map(self, df: pd.DataFrame)-> pd.DataFrame:
+    def map(self, df: pd.DataFrame, catagory_columns: dict = None)-> pd.DataFrame:
         """
         apply self.catagory_mappers on df for each catagory field
 
         Args:
             df (pd.DataFrame): catagory filed is key
+            catagory_columns (dict): column name -> catagory field, default the columns named as a catagory field
 
         Returns:
             pd.DataFrame: catagory filed is value
         """        
         
-        if self.catagory_mappers is None:
-            return df
-        for catagory_field_i in self.catagory_fields: 
-            if catagory_field_i in df.columns:
-                df[catagory_field_i]=df[catagory_field_i].apply(lambda x:self.catagory_mappers[catagory_field_i].get(x))
-                if self.catagory_dtypes[catagory_field_i]=="datetime64[ns]":
-                    df[catagory_field_i]=pd.to_datetime(df[catagory_field_i])
-        return df
\ No newline at end of file
+        if catagory_columns is None:
+            decoded_fields=list(self.catagory_fields or [])+list(self.numeric_date_fields)
+            catagory_columns={field: field for field in decoded_fields if field in df.columns}
+        for column, catagory_field_i in catagory_columns.items(): 
+            if catagory_field_i in self.numeric_date_fields:
+                # day offsets from 1970-01-01
+                df[column]=pd.to_datetime(df[column].to_numpy(dtype=np.float64), unit="D")
+            else:
+                df[column]=self.decode(df[column], self.get_catagory_mapper(catagory_field_i))
+        return df
+
+    def decode(self, codes: pd.Series, mapper: pd.Index)-> Union[np.ndarray, pd.Categorical]:
+        """
+        decode the codes by an array take over the values of mapper, nan or unknown codes are decoded as None/NaT
+        """
+        codes=codes.to_numpy(dtype=np.float64)
+        valid=(codes>=0)&(codes<len(mapper))
+        codes=np.where(valid, codes, -1).astype(np.int64)
+        if self.use_categorical:
+            return pd.Categorical.from_codes(codes, categories=mapper)
+        values=mapper.to_numpy()[np.where(valid, codes, 0)] if len(mapper) else np.empty(len(codes), dtype=mapper.dtype)
+        values[~valid]=np.datetime64("NaT") if isinstance(mapper, pd.DatetimeIndex) else None
+        return values
+
+
+# the multi-dataset loader of the parent process, inherited by the forked workers of MultiWRDSDataLoader.load
+_FORK_MULTI_LOADER=None
+
+
+def _fork_load_dataset(args):
+    C["kernels"]=1
+    df=_FORK_MULTI_LOADER.load_dataset(*args)
+    return _to_shared(df)
+
+
+class MultiWRDSDataLoader(DataLoader):
+    """
+    load several dumped datasets(e.g. crsp/msf, comp/funda, comp/g_exrt_mth) in one load, without re-initializing
+    qlib for each one.
+
+    each dataset is loaded by a WRDSDataLoader under its own provider dir, so it keeps its own calendar, instruments
+    and catagory dictionaries. the frames are aligned into one frame on the union of their (datetime, instrument),
+    the columns are (group, "<dataset>:<name>").
+    """
+
+    NAME_SEP=":"
+
+    def __init__(
+        self,
+        datasets: dict,
+        freq: str = "day",
+        swap_level: bool = True,
+        use_categorical: bool = False,
+        max_workers: int = 1,
+    ):
+        """
+        Parameters
+        ----------
+        datasets : dict
+            dataset name -> dict(provider_uri=..., config=..., instruments=None, filter_pipe=None, inst_processor=None,
+            link=None), config and link are the ones of WRDSDataLoader, instruments overrides the instruments passed
+            to load, e.g. the currencies of g_exrt_mth
+        freq : str
+            freq of all datasets
+        swap_level :
+            Whether to swap level of MultiIndex
+        use_categorical: bool
+            If True, catagory fields are returned as pd.Categorical, see WRDSDataLoader
+        max_workers: int
+            If > 1, the datasets are loaded concurrently by up to max_workers forked processes, on linux only
+        """
+        self.datasets=datasets
+        self.freq=freq
+        self.swap_level=swap_level
+        self.use_categorical=use_categorical
+        self.max_workers=max_workers
+
+    def get_loader(self, name: str) -> WRDSDataLoader:
+        """
+        the WRDSDataLoader of a dataset, must be called under use_provider of the dataset
+        """
+        dataset=self.datasets[name]
+        return WRDSDataLoader(
+            config=dataset["config"],
+            filter_pipe=dataset.get("filter_pipe", None),
+            swap_level=self.swap_level,
+            freq=self.freq,
+            inst_processor=dataset.get("inst_processor", None),
+            use_categorical=self.use_categorical,
+            link=dataset.get("link", None),
+        )
+
+    def load_dataset(self, name: str, instruments, start_time=None, end_time=None) -> pd.DataFrame:
+        dataset=self.datasets[name]
+        instruments=dataset.get("instruments", None) or instruments
+        with use_provider(dataset["provider_uri"]):
+            df=self.get_loader(name).load(instruments, start_time, end_time)
+        df.columns=pd.MultiIndex.from_tuples([(group, f"{name}{self.NAME_SEP}{column}") for group, column in df.columns])
+        return df
+
+    def load(self, instruments=None, start_time=None, end_time=None) -> pd.DataFrame:
+        global _FORK_MULTI_LOADER
+        names=list(self.datasets)
+        args=[(name, instruments, start_time, end_time) for name in names]
+        if self.max_workers>1 and len(names)>1 and can_fork():
+            _FORK_MULTI_LOADER=self
+            try:
+                with _fork_shared(_fork_load_dataset, args, min(self.max_workers, len(names))) as shareds:
+                    dfs=[_from_shared([shared]) for shared in shareds]
+            finally:
+                _FORK_MULTI_LOADER=None
+        else:
+            dfs=[self.load_dataset(*arg) for arg in args]
+        df=pd.concat(dfs, axis=1, join="outer", copy=False)
+        # keep the groups together, e.g. all features before all labels
+        groups=list(dict.fromkeys(group for group, _ in df.columns))
+        return df[[column for group in groups for column in df.columns if column[0]==group]].sort_index()
@@ -0,0 +1,164 @@
+import os
+import glob
+from typing import Union
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from qlib.data import D
+from qlib.data.dataset.processor import Processor
+
+from data.wrds_dataloader import use_provider
+
+# process-wide cache of the rate matrices: (provider dir, rate field) -> (version, FXRates)
+_FX_CACHE = {}
+
+
+class FXRates:
+    """
+    dense (currency x month) matrix of the exchange rates dumped from Compustat Global g_exrt_mth
+    (symbol tocurm, rate exratm: units of tocurm per unit of the base currency).
+
+    the months without rate are filled by the latest rate of the currency, so that a value of any month converts by
+    the rates known at that month.
+    """
+
+    def __init__(self, currencies: pd.Index, month0: int, rates: np.ndarray):
+        self.currencies = currencies
+        self.month0 = month0
+        self.rates = rates
+
+    @classmethod
+    def read(cls, uri: str, rate_field: str = "exratm") -> "FXRates":
+        """
+        load the rate matrix of a dumped g_exrt_mth, cached in the process and reloaded when the dataset changes
+        """
+        uri = os.path.abspath(os.path.expanduser(str(uri)))
+        version = cls.get_version(uri, rate_field)
+        cached = _FX_CACHE.get((uri, rate_field))
+        if cached is None or cached[0] != version:
+            logger.info(f"load exchange rates of {uri}")
+            with use_provider(uri):
+                df = D.features(D.instruments("all"), [f"${rate_field}"])
+            cached = (version, cls.from_series(df.iloc[:, 0]))
+            _FX_CACHE[(uri, rate_field)] = cached
+        return cached[1]
+
+    @staticmethod
+    def get_version(uri: str, rate_field: str = "exratm") -> tuple:
+        """
+        mtime and size of the calendar, the instruments, the manifest and the rate bins of every currency, a re-dump
+        or dump_update may rewrite the rates only
+        """
+        paths = [os.path.join(uri, "calendars", "day.txt"), os.path.join(uri, "instruments", "all.txt")]
+        paths.append(os.path.join(uri, "manifest.json"))
+        # dense, sparse or typed bins of every currency
+        paths += sorted(glob.glob(os.path.join(uri, "features", "*", f"{rate_field}.day.*")))
+        version = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            version.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(version)
+
+    @staticmethod
+    def to_months(dates) -> np.ndarray:
+        dates = pd.DatetimeIndex(dates)
+        return (dates.year * 12 + dates.month - 1).to_numpy(dtype=np.int64)
+
+    @classmethod
+    def from_series(cls, rates: pd.Series) -> "FXRates":
+        """
+        rates: indexed by (instrument, datetime), the instruments are the currencies
+        """
+        rates = rates.dropna()
+        rates = rates[rates > 0]
+        currency_codes, currencies = pd.factorize(rates.index.get_level_values("instrument"))
+        months = cls.to_months(rates.index.get_level_values("datetime"))
+        month0 = months.min() if len(months) else 0
+        matrix = np.full((len(currencies), months.max() - month0 + 1 if len(months) else 0), np.nan)
+        # the last rate of each month
+        matrix[currency_codes, months - month0] = rates.to_numpy(dtype=np.float64)
+        matrix = pd.DataFrame(matrix.T).ffill().to_numpy().T
+        return cls(pd.Index(currencies).str.upper(), month0, matrix)
+
+    def get_codes(self, currencies: pd.Series) -> np.ndarray:
+        """
+        codes of the currencies in the matrix, -1 for unknown or null currencies
+        """
+        if isinstance(currencies.dtype, pd.CategoricalDtype):
+            categories, codes = currencies.cat.categories, currencies.cat.codes.to_numpy()
+        else:
+            codes, categories = pd.factorize(currencies)
+        category_codes = self.currencies.get_indexer(pd.Index(categories).astype(str).str.upper())
+        return np.append(category_codes, -1)[codes]
+
+    def get_factors(self, from_currencies: pd.Series, dates, to_currency: str = "USD") -> np.ndarray:
+        """
+        factors converting the values in from_currencies[i] on dates[i] to to_currency, nan if any rate is unknown
+        """
+        to_code = self.currencies.get_indexer([to_currency.upper()])[0]
+        codes = self.get_codes(from_currencies)
+        months = self.to_months(dates) - self.month0
+        months = np.minimum(months, self.rates.shape[1] - 1)
+        found = (codes >= 0) & (months >= 0) & (to_code >= 0)
+        codes, months = np.where(found, codes, 0), np.where(found, months, 0)
+        if not self.rates.size:
+            return np.full(len(codes), np.nan)
+        factors = self.rates[to_code, months] / self.rates[codes, months]
+        return np.where(found, factors, np.nan)
+
+
+class FXConvert(Processor):
+    """
+    convert monetary fields to one currency by the dumped g_exrt_mth rates of the month of each row, e.g. for
+    cross-country factors on g_funda:
+
+        {"class": "FXConvert", "module_path": "data.wrds_fx",
+         "kwargs": {"fx_uri": ".../currency/g_exrt_mth", "fields": ["at", "lt", "sale"]}}
+
+    the currency of each row is the (decoded) currency_field column, the rows of unknown currencies are nan.
+    """
+
+    def __init__(
+        self,
+        fx_uri: str,
+        fields: Union[list, tuple],
+        currency_field: str = "curcd",
+        to_currency: str = "USD",
+        rate_field: str = "exratm",
+    ):
+        self.fx_uri = fx_uri
+        self.fields = list(fields)
+        self.currency_field = currency_field
+        self.to_currency = to_currency
+        self.rate_field = rate_field
+
+    @staticmethod
+    def get_columns(df: pd.DataFrame, fields: list) -> list:
+        # the columns of a handler are (group, name)
+        fields = set(fields)
+        return [col for col in df.columns if (col[-1] if isinstance(col, tuple) else col) in fields]
+
+    def __call__(self, df: pd.DataFrame):
+        currency_columns = self.get_columns(df, [self.currency_field])
+        if not currency_columns:
+            raise ValueError(f"{self.currency_field} is not loaded, add it to the features")
+        columns = self.get_columns(df, self.fields)
+        if not columns:
+            return df
+        rates = FXRates.read(self.fx_uri, self.rate_field)
+        factors = rates.get_factors(df[currency_columns[0]], df.index.get_level_values("datetime"), self.to_currency)
+        values = df[columns].to_numpy(dtype=np.float64) * factors[:, None]
+        for i, col in enumerate(columns):
+            df[col] = values[:, i].astype(df[col].dtype)
+        return df
+
+    def is_for_infer(self) -> bool:
+        return True
+
+    def readonly(self) -> bool:
+        return False
@@ -1,13 +1,25 @@
 import os
-from qlib.data.dataset.handler import DataHandlerLP
+import json
+import pickle
+import shutil
+import tempfile
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+from loguru import logger
+from qlib.data import D
+from qlib.data.dataset.handler import DataHandler, DataHandlerLP
 from qlib.data.dataset.processor import Processor
 from qlib.utils import get_callable_kwargs
 from qlib.data.dataset import processor as processor_module
 from inspect import getfullargspec
 from qlib.config import C
+from qlib.utils import lazy_sort_index, hash_args
 
 from typing import Callable, Union, Tuple, List, Iterator, Optional
 from qlib.data.dataset.loader import DataLoader
+from data.wrds_dataloader import read_manifest
 
 def check_transform_proc(proc_l, fit_start_time, fit_end_time):
     new_l = []
@@ -33,6 +45,277 @@ def check_transform_proc(proc_l, fit_start_time, fit_end_time):
             new_l.append(p)
     return new_l
 
+class InstrumentBatchMixin:
+    """
+    iterate a DataHandlerLP by instrument batches or time shards, so that the full universe is never held as a whole.
+
+    each batch is loaded by the same data loader(catagory decoding included) and processed by the same processors.
+    construct the handler with init_data=False to skip loading the whole universe, e.g.
+
+        handler = FundA(instruments="all", init_data=False)
+        for df in handler.iter_batches(batch_size=500, col_set=["feature", "label"]):
+            ...
+
+    processors working across instruments(e.g. CSZScoreNorm) only see the instruments of a batch,
+    use iter_time_shards for them.
+    """
+
+    def get_batch_instruments(self, start_time=None, end_time=None) -> list:
+        if isinstance(self.instruments, (list, tuple)):
+            return list(self.instruments)
+        instruments = self.instruments
+        if instruments is None or isinstance(instruments, str):
+            instruments = D.instruments(
+                "all" if instruments is None else instruments,
+                filter_pipe=getattr(self.data_loader, "filter_pipe", None),
+            )
+        return D.list_instruments(instruments, start_time=start_time, end_time=end_time, as_list=True)
+
+    def _iter_load(self, loads: Iterator[tuple], selector, level, col_set, data_key, fit: bool) -> Iterator[pd.DataFrame]:
+        # the frames of the handler(e.g. loaded by init_data=True) are restored when the iteration ends or is closed
+        frames = {attr: getattr(self, attr, None) for attr in ("_data", "_infer", "_learn")}
+        try:
+            for i, (instruments, start_time, end_time) in enumerate(loads):
+                self._data = lazy_sort_index(self.data_loader.load(instruments, start_time, end_time))
+                self.process_data(with_fit=fit and i == 0)
+                df = self.fetch(selector=selector, level=level, col_set=col_set, data_key=data_key)
+                # release the batch before loading the next one
+                self._data, self._infer, self._learn = None, None, None
+                yield df
+        finally:
+            for attr, df in frames.items():
+                setattr(self, attr, df)
+
+    def iter_batches(
+        self,
+        batch_size: int = 500,
+        selector=slice(None, None),
+        level="datetime",
+        col_set=DataHandler.CS_ALL,
+        data_key=DataHandlerLP.DK_I,
+        fit: bool = False,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Parameters
+        ----------
+        batch_size : int
+            number of instruments of each batch
+        selector, level, col_set, data_key :
+            please refer to the doc of DataHandlerLP.fetch
+        fit : bool
+            if True, the processors are fitted on the first batch only, and its statistics(e.g. the mean and std of
+            ZScoreNorm, the fillna values) are applied to every later batch, so the first batch must be representative
+            of the universe. else the processors must be stateless or fitted already, e.g. by a handler initialized on
+            the fit period. the processors stay fitted after the iteration
+        """
+        instruments = self.get_batch_instruments(self.start_time, self.end_time)
+        loads = (
+            (instruments[i : i + batch_size], self.start_time, self.end_time)
+            for i in range(0, len(instruments), batch_size)
+        )
+        return self._iter_load(loads, selector, level, col_set, data_key, fit)
+
+    def iter_time_shards(
+        self,
+        freq: str = "5Y",
+        selector=slice(None, None),
+        level="datetime",
+        col_set=DataHandler.CS_ALL,
+        data_key=DataHandlerLP.DK_I,
+        fit: bool = False,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Parameters
+        ----------
+        freq : str
+            length of each shard as a pandas offset alias, e.g. "1Y", "6M"
+        selector, level, col_set, data_key :
+            please refer to iter_batches
+        fit : bool
+            if True, the processors are fitted on the first(earliest) shard only and applied to the later shards, see
+            iter_batches
+        """
+        freq_calendar = getattr(self.data_loader, "freq", "day")
+        freq_calendar = freq_calendar if isinstance(freq_calendar, str) else "day"
+        calendar = D.calendar(start_time=self.start_time, end_time=self.end_time, freq=freq_calendar)
+        if len(calendar) == 0:
+            return iter([])
+        shards = pd.Series(calendar, index=calendar).groupby(pd.Grouper(freq=freq)).agg(["min", "max"]).dropna()
+        loads = ((self.instruments, begin, end) for begin, end in shards.itertuples(index=False))
+        return self._iter_load(loads, selector, level, col_set, data_key, fit)
+
+
+class HandlerCacheMixin:
+    """
+    persistent on-disk cache of the processed data of a DataHandlerLP.
+
+    the cache is keyed by a hash of the handler config(data loader, processors, instruments, time range) and the
+    version of the provider data(mtime and size of the calendars, instruments, catagory files, manifest.json and the
+    bins of the first and last instruments), the frames are
+    saved as uncompressed arrow files. a hit reads the files through a memory map, so the arrow buffers are page cache
+    rather than a second copy, but the conversion to pandas copies every column: a hit costs the full frames in memory,
+    the same as a miss without the loading and processing. the least recently used caches are evicted when the cache
+    dir is larger than cache_size(GB).
+
+    enabled by passing cache_dir to the handler, e.g. FundA(instruments="all", cache_dir="~/.wrds_cache")
+    """
+
+    CACHE_META_FILE = "meta.json"
+    # the fitted processors, so that the handler can process new data after a hit
+    CACHE_PROCESSOR_FILE = "processors.pkl"
+    PROCESSOR_ATTRS = ("shared_processors", "infer_processors", "learn_processors")
+    # processed data of DataHandlerLP, see DataHandlerLP.ATTR_MAP
+    CACHE_ATTRS = ("_data", "_infer", "_learn")
+
+    def get_data_version(self) -> dict:
+        return self.get_uri_version([uri for uri in C.dpm.provider_uri.values()][0])
+
+    @staticmethod
+    def get_uri_version(uri) -> dict:
+        data_uri = Path(str(uri)).expanduser().resolve()
+        paths = [data_uri.joinpath("calendars"), data_uri.joinpath("instruments")]
+        paths += [
+            data_uri.joinpath(name)
+            for name in ("catagory_dtypes.txt", "numeric_date_fields.txt", "catagories", "manifest.json")
+        ]
+        # every dump rewrites manifest.json, the bins of the first and last instruments also stamp the features of the
+        # older dumps without manifest, without a stat of every bin
+        features_dir = data_uri.joinpath("features")
+        if features_dir.is_dir():
+            names = sorted(entry.name for entry in os.scandir(features_dir) if entry.is_dir())
+            paths += [features_dir.joinpath(name) for name in dict.fromkeys(names[:1] + names[-1:])]
+        version = {"provider_uri": str(data_uri)}
+        for path in paths:
+            for file in sorted(path.iterdir()) if path.is_dir() else [path] if path.exists() else []:
+                stat = file.stat()
+                version[str(file.relative_to(data_uri))] = (stat.st_mtime_ns, stat.st_size)
+        return version
+
+    @staticmethod
+    def describe_processor(processor):
+        """
+        a stable description of a processor instance(class and attributes), its default repr has the object address
+        """
+        if not isinstance(processor, Processor):
+            return processor
+        klass = type(processor)
+        return {
+            "class": f"{klass.__module__}.{klass.__qualname__}",
+            "kwargs": {k: v for k, v in vars(processor).items() if not k.startswith("_")},
+        }
+
+    def get_cache_key(self, init_type: str) -> str:
+        cache_config = {
+            k: [self.describe_processor(p) for p in v] if k in self.PROCESSOR_ATTRS else v
+            for k, v in self.cache_config.items()
+        }
+        return hash_args(
+            self.__class__.__name__,
+            cache_config,
+            self.instruments,
+            self.start_time,
+            self.end_time,
+            init_type,
+            self.get_data_version(),
+        )
+
+    def setup_data(self, init_type: str = DataHandlerLP.IT_FIT_SEQ, **kwargs):
+        if getattr(self, "cache_dir", None) is None:
+            return super().setup_data(init_type=init_type, **kwargs)
+        cache_path = Path(self.cache_dir).expanduser().joinpath(self.get_cache_key(init_type))
+        if cache_path.joinpath(self.CACHE_META_FILE).exists():
+            logger.info(f"load handler cache {cache_path}")
+            self._load_cache(cache_path)
+            return
+        super().setup_data(init_type=init_type, **kwargs)
+        self._save_cache(cache_path)
+        self._evict_cache(cache_path.parent)
+
+    def _load_cache(self, cache_path: Path):
+        meta = json.loads(cache_path.joinpath(self.CACHE_META_FILE).read_text())
+        frames = {}
+        for attr, file_name in meta.items():
+            if file_name not in frames:
+                # the arrow buffers are mapped, the pandas blocks are copies
+                table = feather.read_table(str(cache_path.joinpath(file_name)), memory_map=True)
+                frames[file_name] = table.to_pandas(split_blocks=True)
+            setattr(self, attr, frames[file_name])
+        with cache_path.joinpath(self.CACHE_PROCESSOR_FILE).open("rb") as f:
+            for attr, processors in pickle.load(f).items():
+                setattr(self, attr, processors)
+        # the mtime of the meta file marks the recently used caches
+        os.utime(cache_path.joinpath(self.CACHE_META_FILE))
+
+    def _save_cache(self, cache_path: Path):
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(tempfile.mkdtemp(dir=cache_path.parent, prefix=".tmp"))
+        try:
+            meta, saved = {}, {}
+            for attr in self.CACHE_ATTRS:
+                df = getattr(self, attr, None)
+                if df is None:
+                    continue
+                # the processed frames are often the same object, e.g. without learn processors
+                if id(df) not in saved:
+                    saved[id(df)] = f"{attr.strip('_')}.arrow"
+                    table = pa.Table.from_pandas(df)
+                    feather.write_feather(table, str(tmp_path.joinpath(saved[id(df)])), compression="uncompressed")
+                meta[attr] = saved[id(df)]
+            with tmp_path.joinpath(self.CACHE_PROCESSOR_FILE).open("wb") as f:
+                pickle.dump({attr: getattr(self, attr) for attr in self.PROCESSOR_ATTRS}, f)
+            tmp_path.joinpath(self.CACHE_META_FILE).write_text(json.dumps(meta))
+            shutil.rmtree(cache_path, ignore_errors=True)
+            tmp_path.rename(cache_path)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        logger.info(f"save handler cache {cache_path}")
+
+    def _evict_cache(self, cache_dir: Path):
+        caches = []
+        for path in cache_dir.iterdir():
+            meta_path = path.joinpath(self.CACHE_META_FILE)
+            if path.is_dir() and meta_path.exists():
+                size = sum(file.stat().st_size for file in path.iterdir())
+                caches.append((meta_path.stat().st_mtime, size, path))
+        total = sum(size for _, size, _ in caches)
+        for _, size, path in sorted(caches):
+            if total <= self.cache_size * 1024**3:
+                break
+            logger.info(f"evict handler cache {path}")
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def get_feature_config(data_uri: str, include_fields="all", labels=None):
+    """
+    bare $field features of a dumped dataset, the label fields are excluded
+    """
+    manifest=read_manifest(data_uri)
+    if include_fields == "all" and manifest is not None:
+      # all fields of the dataset, not only the bins of the first instrument
+      defauflt_fields = list(manifest["fields"])
+    elif include_fields == "all":
+      dir=data_uri+'/features'
+      dir_path_list = [os.path.join(dir, x) for x in os.listdir(dir)]
+      first_dir_path = dir_path_list[0]
+      file_list = [x for x in os.listdir(first_dir_path) if x.endswith('.bin')]
+      defauflt_fields = [file.split('.')[0] for file in file_list]
+    else:
+      defauflt_fields = list(include_fields)
+
+    fields = []
+    names = []
+    if labels:
+      for label in labels[0]:
+        if label[1:] in defauflt_fields:
+          defauflt_fields.remove(label[1:])
+
+    for field in defauflt_fields:
+        fields += ["$" + field]
+        names += [field]
+    return fields, names
+
+
 #_DEFAUFLT_FUNDA_FIELDS = ["indfmt","datafmt","consol","popsrc","acctstd","acqmeth","bspr","compst","curcd","final","fyear","fyr","ismod","pddur","scf","src","stalt","upd","fdate","pdate","accli","acco","aco","acofs","acox","acoxfs","acqdisn","acqdiso","act","adpac","am","amdc","ao","aoloch","aox","ap","apalch","apch","apdpfs","apfs","apo","apofs","aqc","artfs","asdis","asinv","at","atoch","autxr","bcef","bct","ca","capcst","capfl","capr1","capr2","capr3","caprt","caps","capx","capxfi","ceq","cfbd","cfere","cflaoth","cfo","cfpdo","cga","ch","che","cheb","chech","chee","chefs","chenfd","chfs","chs","cmp","cogs","crvnli","cshr","cstk","custadv","dbtb","dbte","dc","dcsfd","dcufd","dd1","dd1fs","dfpac","dfxa","dispoch","dlc","dlcch","dlcfs","dltis","dltr","dltt","do","doc","dp","dpact","dpc","dpdc","dpltb","dpsc","dpstb","dptb","dptc","dptic","dv","dvc","dvp","dvpdp","dvrec","dvrre","dvsco","dvt","ea","ebit","ebitda","eiea","eieac","emp","eqdivp","ero","exre","exres","exreu","fatb","fate","fatl","fatp","fca","fdfr","fea","fel","ffs","fiao","fincf","fininc","finle","finre","finvao","fopo","fsrco","fsrcopo","fsrcopt","fsrct","fuseo","fuset","gdwl","iaeq","iafxi","ialoi","ialti","iamli","iaoi","iapli","iarei","iassi","iasti","iati","ib","ibc","ibki","ibmii","icapt","idiis","idilb","idilc","idis","idist","idit","idits","iire","initb","intan","intand","intanp","intc","intfact","intfl","intiact","intoact","intpd","intpn","intrc","invch","invdsp","invfg","invo","invrm","invsvc","invt","invtfs","invwip","iobd","ioi","iore","ip","ipti","isgr","isgt","isgu","isoth","ist","ivaco","ivaeq","ivao","ivch","ivgod","ivi","ivncf","ivpt","ivst","ivstch","ivstfs","lcabg","lcacl","lcacr","lcag","lcal","lcalt","lcam","lcao","lcast","lcat","lco","lcofs","lcox","lct","lctfs","lcuacu","liqresn","liqreso","lndep","lninc","lnmd","lnrep","lo","lse","lt","ltdch","ltdlch","ltlo","mib","mibn","mibt","mic","mii","miseq","mtl","ncfliq","neqmi","nio","nit","noasub","nopi","np","npanl","npaore","nparl","npat","npfs","oancf","oancfc","oancfd","oiadp","oibdp","onbalb","onbale","opprft","pacqp","pcl","pi","pliach","ppegt","ppent","prc","prodv","prosai","prstkc","prv","psfix","pstk","pstkn","pstkr","ptran","purtshr","pvon","pvt","radp","ragr","rari","rati","rawmsm","rcl","re","recch","recco","reccofs","rect","rectfs","rectr","rectrfs","revt","ris","rlri","rlt","rpag","rv","rvbci","rvbpi","rvbti","rveqt","rvlrv","rvri","rvsi","rvti","rvupi","rvutx","saa","sal","sale","sbdc","sc","sco","seq","shrcap","siv","spi","sppch","sppiv","ssnp","sstk","stbo","stfixa","stinv","stio","stkch","subdis","subpur","tdsg","tdst","teq","transa","tsca","tstk","tstlta","tx","txc","txdb","txdc","txdi","txditc","txo","txop","txp","txpd","txpfs","txt","txw","ui","unl","unnp","vpac","vpo","wcap","wcapch","wcapchc","wcapopc","wcaps","wcapsa","wcapsu","wcapt","wcapu","xacc","xaccfs","xago","xagt","xcom","xcomi","xdvre","xeqo","xi","xido","xidoc","xindb","xindc","xins","xinst","xint","xintd","xivi","xivre","xlr","xnitb","xobd","xoi","xopr","xopro","xore","xpp","xppfs","xpr","xrd","xrent","xs","xsga","xstf","xstfo","xstfws","xt","iid","exchg","isin","sedol","ajexi","curcdi","cshoi","cshpria","epsexcon","epsexnc","epsincon","epsinnc","icapi","nicon","ninc","pv","tstkni","conm","costat","fic","loc","naicsh","sich","rank","au","auop"]
 #_DEFAUFLT_FUNDA_FIELDS = ['indfmt', 'datafmt', 'consol', 'popsrc', 'conm', 'costat',
 #                            'loc', 'fic', 'fyr', 'curcd', 'fyear', 'upd', 'pddur',
@@ -40,7 +323,7 @@ def check_transform_proc(proc_l, fit_start_time, fit_end_time):
 #                            'lse', 'at', 'icapt', 'ceq', 'iid', 'exchg', 'lt', 'final', 'conm', 'sedol','fdate']
 #
 _DEFAUFLT_FUNDA_FIELDS=['curcd', 'loc', 'acqmeth', 'compst', 'bspr', 'popsrc', 'auop', 'final', 'indfmt', 'consol', 'sedol', 'fdate', 'pdate', 'curcdi', 'acctstd', 'iid', 'fic', 'isin', 'stalt', 'datafmt', 'costat', 'au', 'conm']
-class WRDS(DataHandlerLP):
+class WRDS(HandlerCacheMixin, InstrumentBatchMixin, DataHandlerLP):
     def __init__(
         self,
         instruments="test100",
@@ -60,6 +343,10 @@ class WRDS(DataHandlerLP):
 
         infer_processors = check_transform_proc(infer_processors, fit_start_time, fit_end_time)
         learn_processors = check_transform_proc(learn_processors, fit_start_time, fit_end_time)
+        # the currency conversion of the monetary fields, see data.wrds_fx.FXConvert
+        shared_processors = []
+        if kwargs.get("fx", None) is not None:
+            shared_processors.append({"class": "FXConvert", "module_path": "data.wrds_fx", "kwargs": kwargs["fx"]})
 
         config = {}
         if self.labels:
@@ -75,45 +362,42 @@ class WRDS(DataHandlerLP):
               "filter_pipe": filter_pipe,
               "freq": freq,
               "inst_processor": inst_processor,
+              "use_categorical": kwargs.get("use_categorical", False),
+              "max_workers": kwargs.get("max_workers", 1),
+              "link": kwargs.get("link", None),
           },
         }
 
+        self.cache_dir = kwargs.get("cache_dir", None)
+        self.cache_size = kwargs.get("cache_size", 10)
+        # max_workers does not change the data
+        self.cache_config = dict(
+            data_loader={**data_loader, "kwargs": {k: v for k, v in data_loader["kwargs"].items() if k != "max_workers"}},
+            shared_processors=shared_processors,
+            infer_processors=infer_processors,
+            learn_processors=learn_processors,
+        )
+
         super().__init__(
             instruments=instruments,
             start_time=start_time,
             end_time=end_time,
             data_loader=data_loader,
+            shared_processors=shared_processors,
             learn_processors=learn_processors,
             infer_processors=infer_processors,
+            init_data=kwargs.get("init_data", True),
         )
 
     #def get_label_config(self):
     #    return (["$apo", "$che"], ["apo", "che"])
 
     def get_feature_config(self):
-        if self.include_fields == "all":
-          dir=[uri for uri in C.dpm.provider_uri.values()][0]+'/features'
-          dir_path_list = [os.path.join(dir, x) for x in os.listdir(dir)]
-          first_dir_path = dir_path_list[0]
-          file_list = [x for x in os.listdir(first_dir_path) if x.endswith('.bin')]
-          defauflt_fields = [file.split('.')[0] for file in file_list]
-        else:
-          defauflt_fields = self.include_fields
+        data_uri=str([uri for uri in C.dpm.provider_uri.values()][0])
+        return get_feature_config(data_uri, self.include_fields, self.labels)
 
-        fields = []
-        names = []
-        if self.labels:
-          for label in self.labels[0]:
-            if label[1:] in defauflt_fields:
-              defauflt_fields.remove(label[1:])
 
-        for field in defauflt_fields:
-            fields += ["$" + field]
-            names += [field]
-        return fields, names
-
-
-class FundA(DataHandlerLP):
+class FundA(HandlerCacheMixin, InstrumentBatchMixin, DataHandlerLP):
     def __init__(
         self,
         instruments="longest1k",
@@ -130,6 +414,10 @@ class FundA(DataHandlerLP):
     ):
         infer_processors = check_transform_proc(infer_processors, fit_start_time, fit_end_time)
         learn_processors = check_transform_proc(learn_processors, fit_start_time, fit_end_time)
+        # the currency conversion of the monetary fields, see data.wrds_fx.FXConvert
+        shared_processors = []
+        if kwargs.get("fx", None) is not None:
+            shared_processors.append({"class": "FXConvert", "module_path": "data.wrds_fx", "kwargs": kwargs["fx"]})
 
         data_loader = {
             "class": "WRDSDataLoader",
@@ -142,16 +430,31 @@ class FundA(DataHandlerLP):
                 "filter_pipe": filter_pipe,
                 "freq": freq,
                 "inst_processor": inst_processor,
+                "use_categorical": kwargs.get("use_categorical", False),
+                "max_workers": kwargs.get("max_workers", 1),
+                "link": kwargs.get("link", None),
             },
         }
 
+        self.cache_dir = kwargs.get("cache_dir", None)
+        self.cache_size = kwargs.get("cache_size", 10)
+        # max_workers does not change the data
+        self.cache_config = dict(
+            data_loader={**data_loader, "kwargs": {k: v for k, v in data_loader["kwargs"].items() if k != "max_workers"}},
+            shared_processors=shared_processors,
+            infer_processors=infer_processors,
+            learn_processors=learn_processors,
+        )
+
         super().__init__(
             instruments=instruments,
             start_time=start_time,
             end_time=end_time,
             data_loader=data_loader,
+            shared_processors=shared_processors,
             learn_processors=learn_processors,
             infer_processors=infer_processors,
+            init_data=kwargs.get("init_data", True),
         )
 
     def get_label_config(self):
@@ -165,4 +468,94 @@ class FundA(DataHandlerLP):
             fields += ["$" + field]
             names += [field]
 
-        return fields, names
\ No newline at end of file
+        return fields, names
+
+class MultiWRDS(HandlerCacheMixin, DataHandlerLP):
+    """
+    handler of several dumped datasets in one prepare, loaded by MultiWRDSDataLoader, e.g.
+
+        handler = MultiWRDS(
+            datasets={
+                "msf": "/storage/qlib/qlib_data/crsp/a_stock/msf",
+                "funda": {"provider_uri": "/storage/qlib/qlib_data/wrds/comp/naa/funda", "include_fields": ["at", "lt"]},
+                "fx": {"provider_uri": ".../g_exrt_mth", "instruments": "all"},
+            },
+            instruments="all",
+        )
+
+    the feature columns are named "<dataset>:<field>".
+    """
+
+    def __init__(
+        self,
+        datasets: dict,
+        instruments="all",
+        start_time=None,
+        end_time=None,
+        freq="day",
+        infer_processors=[],
+        learn_processors=[],
+        fit_start_time=None,
+        fit_end_time=None,
+        **kwargs,
+    ):
+        """
+        Parameters
+        ----------
+        datasets: dict
+            dataset name -> provider dir, or dict(provider_uri=..., include_fields="all", label=None, instruments=None,
+            filter_pipe=None, inst_processor=None, link=None), instruments overrides the instruments of the handler for
+            the dataset, link re-keys its instruments, see WRDSDataLoader
+        """
+        infer_processors = check_transform_proc(infer_processors, fit_start_time, fit_end_time)
+        learn_processors = check_transform_proc(learn_processors, fit_start_time, fit_end_time)
+        # the currency conversion of the monetary fields, see data.wrds_fx.FXConvert
+        shared_processors = []
+        if kwargs.get("fx", None) is not None:
+            shared_processors.append({"class": "FXConvert", "module_path": "data.wrds_fx", "kwargs": kwargs["fx"]})
+
+        self.datasets = {}
+        for name, dataset in datasets.items():
+            dataset = {"provider_uri": dataset} if isinstance(dataset, (str, Path)) else dict(dataset)
+            dataset["provider_uri"] = str(Path(str(dataset["provider_uri"])).expanduser().resolve())
+            labels = dataset.pop("label", None)
+            config = {"feature": get_feature_config(dataset["provider_uri"], dataset.pop("include_fields", "all"), labels)}
+            if labels:
+                config["label"] = labels
+            dataset["config"] = config
+            self.datasets[name] = dataset
+
+        data_loader = {
+            "class": "MultiWRDSDataLoader",
+            "module_path": "data.wrds_dataloader",
+            "kwargs": {
+                "datasets": self.datasets,
+                "freq": freq,
+                "use_categorical": kwargs.get("use_categorical", False),
+                "max_workers": kwargs.get("max_workers", 1),
+            },
+        }
+
+        self.cache_dir = kwargs.get("cache_dir", None)
+        self.cache_size = kwargs.get("cache_size", 10)
+        # max_workers does not change the data
+        self.cache_config = dict(
+            data_loader={**data_loader, "kwargs": {k: v for k, v in data_loader["kwargs"].items() if k != "max_workers"}},
+            shared_processors=shared_processors,
+            infer_processors=infer_processors,
+            learn_processors=learn_processors,
+        )
+
+        super().__init__(
+            instruments=instruments,
+            start_time=start_time,
+            end_time=end_time,
+            data_loader=data_loader,
+            shared_processors=shared_processors,
+            learn_processors=learn_processors,
+            infer_processors=infer_processors,
+            init_data=kwargs.get("init_data", True),
+        )
+
+    def get_data_version(self) -> dict:
+        return {name: self.get_uri_version(dataset["provider_uri"]) for name, dataset in self.datasets.items()}
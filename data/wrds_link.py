@@ -0,0 +1,216 @@
+import os
+from typing import Union
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# process-wide cache of the link tables: (path, kwargs) -> ((mtime, size), LinkTable)
+_LINK_CACHE = {}
+
+
+class LinkTable:
+    """
+    date-interval index of a link table, e.g. the CRSP/Compustat merged link history(ccmxpf_lnkhist):
+
+        gvkey  liid  linktype  lpermno  lpermco  linkprim  linkdt      linkenddt
+        001004 01    LU        54594    20000    P         1972-04-24  NaT
+
+    the links of each from key are sorted by start, a query(key, date) is answered by one searchsorted over
+    (key code, start day) for all rows, so that "which gvkey is linked to these permnos on these dates" needs no
+    per-row filter. when several links of a key cover a date, the one starting last is used.
+
+        link = LinkTable.read("ccmxpf_lnkhist.parquet", from_field="lpermno", to_field="gvkey")
+        gvkeys = link.lookup(permnos, dates)
+    """
+
+    # days are packed below the key code in one int64
+    DAY_BITS = 20
+    DAY_OFFSET = 1 << (DAY_BITS - 1)
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        from_field: str = "lpermno",
+        to_field: str = "gvkey",
+        start_field: str = "linkdt",
+        end_field: str = "linkenddt",
+        linktype: Union[list, tuple] = ("LU", "LC"),
+        linkprim: Union[list, tuple] = ("P", "C"),
+        to_format: str = None,
+    ):
+        """
+        Parameters
+        ----------
+        df: pd.DataFrame
+            link table
+        from_field: str
+            identifier of the queries
+        to_field: str
+            identifier returned by the queries
+        start_field: str
+            first date of the link
+        end_field: str
+            last date of the link, NaT(or not a date, e.g. "E") means still active
+        linktype: list
+            link types kept, all if None
+        linkprim: list
+            primary link markers kept, all if None
+        to_format: str
+            format of the returned identifiers, e.g. "{:06d}", integral float identifiers(e.g. lpermno) are
+            formatted as int
+        """
+        self.from_field = from_field
+        self.to_field = to_field
+        if linktype is not None and "linktype" in df.columns:
+            df = df[df["linktype"].isin(list(linktype))]
+        if linkprim is not None and "linkprim" in df.columns:
+            df = df[df["linkprim"].isin(list(linkprim))]
+        df = df[df[from_field].notna() & df[to_field].notna()]
+
+        from_keys = self.format_keys(df[from_field])
+        self.keys = pd.Index(pd.unique(from_keys))
+        codes = self.keys.get_indexer(from_keys)
+        starts = self.to_days(df[start_field])
+        ends = self.to_days(df[end_field], fill=self.DAY_OFFSET - 1)
+        valid = starts > -self.DAY_OFFSET
+        packed = (codes[valid].astype(np.int64) << self.DAY_BITS) + starts[valid] + self.DAY_OFFSET
+        order = np.argsort(packed, kind="stable")
+        self.packed = packed[order]
+        self.ends = ends[valid][order]
+        # the latest end of the links of the same key started so far, a link ended before a date can hide an
+        # earlier one still active on it
+        self.max_ends = pd.Series(self.ends).groupby(self.packed >> self.DAY_BITS).cummax().to_numpy()
+        self.values = self.format_keys(df[to_field], to_format)[valid][order]
+        logger.info(f"{len(self.packed)} links of {len(self.keys)} {from_field}")
+
+    @classmethod
+    def read(cls, path: str, **kwargs) -> "LinkTable":
+        """
+        read a link table(parquet or csv), cached in the process and reloaded when the file changes
+        """
+        path = os.path.expanduser(str(path))
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        key = (path, tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in kwargs.items())))
+        cached = _LINK_CACHE.get(key)
+        if cached is None or cached[0] != version:
+            df = pd.read_parquet(path) if path.endswith("parquet") else pd.read_csv(path)
+            cached = (version, cls(df, **kwargs))
+            _LINK_CACHE[key] = cached
+        return cached[1]
+
+    # integral float strings, e.g. the instruments "10001.0" dumped from a float permno column
+    INTEGRAL_FLOAT_PATTERN = r"^([+-]?\d+)\.0*$"
+
+    @classmethod
+    def format_keys(cls, keys: pd.Series, key_format: str = None) -> np.ndarray:
+        """
+        keys as str, integral floats(as numbers or strings) are formatted as int, so that 10001.0, "10001.0" and
+        "10001" are the same key
+        """
+        keys = pd.Series(keys)
+        if pd.api.types.is_float_dtype(keys) and (keys.dropna() % 1 == 0).all():
+            keys = keys.astype("Int64")
+        if key_format is not None:
+            return np.array([key_format.format(key) for key in keys], dtype=object)
+        keys = keys.astype(str).str.strip().str.replace(cls.INTEGRAL_FLOAT_PATTERN, r"\1", regex=True)
+        return keys.to_numpy(dtype=object)
+
+    @staticmethod
+    def read_instruments(uri: str, market: str = "all") -> pd.Index:
+        """
+        instrument names of a dumped dataset
+        """
+        path = os.path.join(os.path.expanduser(str(uri)), "instruments", f"{market}.txt")
+        return pd.Index(pd.read_csv(path, sep="\t", header=None, usecols=[0], dtype=str, keep_default_na=False)[0])
+
+    @classmethod
+    def to_days(cls, dates, fill: int = None) -> np.ndarray:
+        """
+        days from 1970-01-01, not a date(NaT, "E") is fill, or the min value if fill is None
+        """
+        dates = pd.to_datetime(pd.Series(dates), errors="coerce")
+        days = dates.values.astype("datetime64[D]").astype(np.int64)
+        days = np.clip(days, -cls.DAY_OFFSET + 1, cls.DAY_OFFSET - 1)
+        return np.where(dates.isna().to_numpy(), -cls.DAY_OFFSET if fill is None else fill, days)
+
+    def lookup(self, keys, dates) -> np.ndarray:
+        """
+        the linked identifiers of (keys[i], dates[i]), None where no link is active
+
+        Parameters
+        ----------
+        keys: array like
+            from identifiers
+        dates: array like
+            dates of the queries
+        """
+        # format the distinct keys only
+        query_codes, uniques = pd.factorize(pd.Series(keys))
+        codes = np.append(self.keys.get_indexer(self.format_keys(pd.Series(uniques))), -1)[query_codes]
+        days = self.to_days(dates)
+        packed = (codes.astype(np.int64) << self.DAY_BITS) + days + self.DAY_OFFSET
+        pos = np.searchsorted(self.packed, packed, side="right") - 1
+        # the links of the key started not later than the date, walked back from the one starting last
+        pending = (codes >= 0) & (days > -self.DAY_OFFSET) & (pos >= 0)
+        pos = np.where(pending, pos, 0)
+        found = np.zeros(len(pos), dtype=bool)
+        while pending.any():
+            pending &= ((self.packed[pos] >> self.DAY_BITS) == codes) & (self.max_ends[pos] >= days)
+            found |= pending & (self.ends[pos] >= days)
+            pending &= ~found
+            pos = np.where(pending, pos - 1, pos)
+            pending &= pos >= 0
+            pos = np.maximum(pos, 0)
+        values = self.values[pos] if len(self.values) else np.empty(len(pos), dtype=object)
+        return np.where(found, values, None)
+
+    def rekey(
+        self,
+        df: pd.DataFrame,
+        symbol_fields: list = None,
+        symbol_field: str = None,
+        level: str = "instrument",
+        to_instruments: pd.Index = None,
+    ) -> pd.DataFrame:
+        """
+        replace the instruments of a loaded frame by their linked identifiers on each date, rows without link are
+        dropped, and only the first row is kept when several instruments are linked to the same one
+
+        Parameters
+        ----------
+        df: pd.DataFrame
+            frame indexed by (datetime, instrument) or (instrument, datetime)
+        symbol_fields: list
+            symbol fields of the instruments(manifest["symbol_fields"])
+        symbol_field: str
+            the symbol field of the from key, the from key is its part of the "_" joined instrument, the whole
+            instrument if None
+        to_instruments: pd.Index
+            instrument names of the dataset keyed by to_field(LinkTable.read_instruments), the linked identifiers
+            are renamed to them, e.g. "10001" to the "10001.0" of a msf dumped from a float permno column
+        """
+        instruments = df.index.get_level_values(level).astype(str)
+        if symbol_fields is not None and len(symbol_fields) > 1 and symbol_field is not None:
+            instruments = instruments.str.split("_").str[list(symbol_fields).index(symbol_field)]
+        dates = df.index.get_level_values("datetime")
+        linked = pd.Index(self.lookup(instruments, dates), dtype=object).str.upper()
+        if to_instruments is not None:
+            to_instruments = pd.Index(to_instruments)
+            names = pd.Series(to_instruments, index=pd.Index(self.format_keys(to_instruments)).str.upper())
+            names = names[~names.index.duplicated()]
+            # the identifiers not in the dataset are kept as they are
+            renamed = linked.map(names)
+            linked = pd.Index(np.where(pd.isna(renamed), linked, renamed), dtype=object)
+        keep = linked.notna()
+        df = df[keep]
+        names = df.index.names
+        index = df.index.to_frame(index=False)
+        index[level] = linked[keep].to_numpy()
+        df.index = pd.MultiIndex.from_frame(index, names=names)
+        duplicated = df.index.duplicated()
+        if duplicated.any():
+            logger.warning(f"{duplicated.sum()} rows linked to the same {self.to_field} are dropped")
+            df = df[~duplicated]
+        return df.sort_index()
@@ -0,0 +1,224 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from qlib.data.base import Feature
+from qlib.data.data import Cal, LocalExpressionProvider
+from qlib.data.storage.file_storage import FileFeatureStorage
+from qlib.log import get_module_logger
+from qlib.utils import time_to_slc_point
+
+
+def get_max_map_count(default: int = 65530) -> int:
+    """
+    the limit of memory map areas of a process(vm.max_map_count), default of the linux kernel if it can not be read
+    """
+    try:
+        return int(Path("/proc/sys/vm/max_map_count").read_text().strip())
+    except (OSError, ValueError):
+        return default
+
+
+class WRDSFeatureStorage(FileFeatureStorage):
+    """
+    FileFeatureStorage which memory-maps the `<field>.<freq>.bin` files dumped by scripts/dump_single/dump_single.py,
+    and the sparse `<field>.<freq>.sbin` files when the dense bin does not exist
+
+    the maps are cached in the process and reused by every query, so that repeated `dataset.prepare` hits the page
+    cache and the calendar slices are views of the map instead of fresh arrays.
+
+    select it in qlib.init:
+
+        qlib.init(
+            provider_uri=...,
+            feature_provider={
+                "class": "LocalFeatureProvider",
+                "kwargs": {"backend": {"class": "WRDSFeatureStorage", "module_path": "data.wrds_storage"}},
+            },
+        )
+    """
+
+    # np.memmap closes its file descriptor after mmap, so the maps are limited by vm.max_map_count instead of the
+    # open files, every map is one area of the process. keep at most a quarter of the limit, the rest is left to
+    # the libraries, the heap and the evicted maps still referenced by returned slices(unmapped when released)
+    MAX_MAPS = get_max_map_count() // 4
+    # sparse bins of low-density fields, dumped with `--sparse_ratio`
+    SPARSE_FILE_SUFFIX = ".sbin"
+    # typed bins of float64 fields and compact catagory codes: [dtype as 8 bytes ascii, start_index as int64], then
+    # [values...] as dtype, nulls of integer dtypes are the max value of the dtype
+    TYPED_FILE_SUFFIX = ".tbin"
+    TYPED_HEADER_SIZE = 16
+    _maps = OrderedDict()
+
+    @classmethod
+    def clear_maps(cls):
+        cls._maps.clear()
+
+    @property
+    def sparse_uri(self) -> Path:
+        return self.uri.with_suffix(self.SPARSE_FILE_SUFFIX)
+
+    @property
+    def typed_uri(self) -> Path:
+        return self.uri.with_suffix(self.TYPED_FILE_SUFFIX)
+
+    @staticmethod
+    def _decode(values: np.ndarray) -> np.ndarray:
+        # integer codes to float with nan nulls, codes up to uint16 are exact in float32
+        if values.dtype.kind == "f":
+            return values
+        float_dtype = np.float32 if values.dtype.itemsize <= 2 else np.float64
+        return np.where(values == np.iinfo(values.dtype).max, np.nan, values).astype(float_dtype)
+
+    def _get_map(self) -> Union[Tuple[int, int, Union[np.ndarray, None], np.ndarray], None]:
+        """
+        Returns
+        -------
+        (start_index, end_index, positions, values), positions is None for the dense and typed bins
+        """
+        for uri in [self.uri, self.sparse_uri, self.typed_uri]:
+            try:
+                stat = uri.stat()
+                break
+            except FileNotFoundError:
+                continue
+        else:
+            return None
+        key = str(uri)
+        # the bin may be rewritten or appended by dump_update, remap it when mtime or size changed
+        version = (stat.st_mtime_ns, stat.st_size)
+        cached = self._maps.get(key)
+        if cached is not None and cached[0] == version:
+            self._maps.move_to_end(key)
+            return cached[1]
+        if uri.suffix == self.SPARSE_FILE_SUFFIX:
+            # [start_index, end_index, positions...] as int32, then [values...] as float32
+            data = np.memmap(uri, dtype="<i4", mode="r")
+            count = (len(data) - 2) // 2
+            start_index, end_index = int(data[0]), int(data[1])
+            entry = (start_index, end_index, data[2 : 2 + count], data[2 + count :].view("<f"))
+        elif uri.suffix == self.TYPED_FILE_SUFFIX:
+            header = np.fromfile(uri, dtype=np.uint8, count=self.TYPED_HEADER_SIZE)
+            dtype = np.dtype(header[:8].tobytes().rstrip(b"\0").decode("ascii"))
+            start_index = int(header[8:].view("<i8")[0])
+            if stat.st_size > self.TYPED_HEADER_SIZE:
+                values = np.memmap(uri, dtype=dtype, mode="r", offset=self.TYPED_HEADER_SIZE)
+            else:
+                values = np.array([], dtype=dtype)
+            entry = (start_index, start_index + len(values) - 1, None, values)
+        else:
+            if stat.st_size < 4:
+                data = np.array([np.nan], dtype="<f")
+            else:
+                data = np.memmap(uri, dtype="<f", mode="r")
+            start_index = int(data[0])
+            entry = (start_index, start_index + len(data) - 2, None, data[1:])
+        self._maps[key] = (version, entry)
+        while len(self._maps) > self.MAX_MAPS:
+            self._maps.popitem(last=False)
+        return entry
+
+    @property
+    def start_index(self) -> Union[int, None]:
+        data = self._get_map()
+        if data is None:
+            return None
+        return data[0]
+
+    @property
+    def end_index(self) -> Union[int, None]:
+        data = self._get_map()
+        if data is None:
+            return None
+        return data[1]
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Tuple[int, float], pd.Series]:
+        data = self._get_map()
+        if data is None:
+            if isinstance(i, int):
+                return None, None
+            elif isinstance(i, slice):
+                return pd.Series(dtype=np.float32)
+            else:
+                raise TypeError(f"type(i) = {type(i)}")
+
+        storage_start_index, storage_end_index, positions, values = data
+        if isinstance(i, int):
+            if storage_start_index > i:
+                raise IndexError(f"{i}: start index is {storage_start_index}")
+            if positions is None:
+                return i, float(self._decode(values[i - storage_start_index : i - storage_start_index + 1])[0])
+            j = np.searchsorted(positions, i)
+            return i, float(values[j]) if j < len(positions) and positions[j] == i else np.nan
+        elif isinstance(i, slice):
+            start_index = storage_start_index if i.start is None else i.start
+            end_index = storage_end_index if i.stop is None else min(i.stop - 1, storage_end_index)
+            si = max(start_index, storage_start_index)
+            if si > end_index:
+                return pd.Series(dtype=np.float32)
+            index = pd.RangeIndex(si, end_index + 1)
+            if positions is None:
+                # view of the map, no copy for the float bins
+                window = self._decode(np.asarray(values[si - storage_start_index : end_index - storage_start_index + 1]))
+                return pd.Series(window, index=index, copy=False)
+            # densify the requested window of the sparse bin
+            left, right = np.searchsorted(positions, [si, end_index + 1])
+            window = np.full(len(index), np.nan, dtype=np.float32)
+            window[positions[left:right] - si] = values[left:right]
+            return pd.Series(window, index=index, copy=False)
+        else:
+            raise TypeError(f"type(i) = {type(i)}")
+
+    def __len__(self) -> int:
+        data = self._get_map()
+        if data is None:
+            raise ValueError(f"{self.storage_name} not exists: {self.uri}")
+        return data[1] - data[0] + 1
+
+
+class WRDSExpressionProvider(LocalExpressionProvider):
+    """
+    LocalExpressionProvider which keeps the float64 series of the typed bins(dumped with `--float64_fields`) for
+    the raw features(e.g. `$at`), the other series are float32 as LocalExpressionProvider
+
+    select it in qlib.init with WRDSFeatureStorage:
+
+        qlib.init(
+            provider_uri=...,
+            feature_provider=...,
+            expression_provider={"class": "WRDSExpressionProvider", "module_path": "data.wrds_storage"},
+        )
+    """
+
+    def expression(self, instrument, field, start_time=None, end_time=None, freq="day"):
+        expression = self.get_expression_instance(field)
+        start_time = time_to_slc_point(start_time)
+        end_time = time_to_slc_point(end_time)
+        if self.time2idx:
+            _, _, start_index, end_index = Cal.locate_index(start_time, end_time, freq=freq, future=False)
+            lft_etd, rght_etd = expression.get_extended_window_size()
+            query_start, query_end = max(0, start_index - lft_etd), end_index + rght_etd
+        else:
+            start_index, end_index = query_start, query_end = start_time, end_time
+
+        try:
+            series = expression.load(instrument, query_start, query_end, freq)
+        except Exception as e:
+            get_module_logger("data").debug(
+                f"Loading expression error: "
+                f"instrument={instrument}, field=({field}), start_time={start_time}, end_time={end_time}, freq={freq}. "
+                f"error info: {str(e)}"
+            )
+            raise
+        # only the raw features keep float64, the results of operators are float32 as LocalExpressionProvider
+        if not (isinstance(expression, Feature) and series.dtype == np.float64):
+            try:
+                series = series.astype(np.float32)
+            except (ValueError, TypeError):
+                pass
+        if not series.empty:
+            series = series.loc[start_index:end_index]
+        return series
@@ -0,0 +1,331 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import sys
+import json
+import time
+import shutil
+import platform
+import resource
+import subprocess
+import traceback
+import multiprocessing as mp
+from pathlib import Path
+from queue import Empty
+
+import fire
+import pyarrow.parquet as pq
+from loguru import logger
+
+CUR_DIR = Path(__file__).resolve().parent
+REPO_DIR = CUR_DIR.parent.parent
+sys.path.extend([str(CUR_DIR), str(REPO_DIR), str(CUR_DIR.parent), str(CUR_DIR.parent.joinpath("dump_single"))])
+
+from generate import WRDSGenerator
+
+ALL_CASES = (
+    "dump_numeric",
+    "dump_all",
+    "dump_stream",
+    "split_instruments",
+    "dump_data_all",
+    "check_bin",
+    "wrds_prepare",
+    "funda_prepare",
+)
+
+
+def _max_rss_mb(who) -> float:
+    # ru_maxrss is KB on linux and bytes on macOS
+    max_rss = resource.getrusage(who).ru_maxrss
+    return max_rss / 1024**2 if sys.platform == "darwin" else max_rss / 1024
+
+
+def _run_case(case_func, kwargs: dict, queue):
+    result = dict(status="ok", error=None)
+    start = time.time()
+    try:
+        case_func(**kwargs)
+    except Exception:
+        result.update(status="error", error=traceback.format_exc())
+    result["seconds"] = time.time() - start
+    result["peak_rss_mb"] = _max_rss_mb(resource.RUSAGE_SELF)
+    result["peak_children_rss_mb"] = _max_rss_mb(resource.RUSAGE_CHILDREN)
+    queue.put(result)
+
+
+def dump_numeric(parquet_path, qlib_dir, generator, max_workers, **kwargs):
+    from dump_single import DumpNumeric
+
+    string_fields = ",".join(generator._get_string_fields() + generator.shape["date_fields"])
+    DumpNumeric(
+        csv_path=parquet_path,
+        qlib_dir=qlib_dir,
+        symbol_field_name=generator.symbol_field_name,
+        date_field_name=generator.date_field_name,
+        exclude_fields=string_fields,
+        max_workers=max_workers,
+    ).dump()
+
+
+def dump_all(parquet_path, qlib_dir, generator, max_workers, engine="group", **kwargs):
+    from dump_single import DumpNumericCatagory
+
+    DumpNumericCatagory(
+        csv_path=parquet_path,
+        qlib_dir=qlib_dir,
+        symbol_field_name=generator.symbol_field_name,
+        date_field_name=generator.date_field_name,
+        max_workers=max_workers,
+        engine=engine,
+    ).dump()
+
+
+def dump_stream(parquet_path, qlib_dir, generator, max_workers, max_memory=1, **kwargs):
+    from dump_single import DumpNumericCatagoryStream
+
+    DumpNumericCatagoryStream(
+        csv_path=parquet_path,
+        qlib_dir=qlib_dir,
+        symbol_field_name=generator.symbol_field_name,
+        date_field_name=generator.date_field_name,
+        max_workers=max_workers,
+        max_memory=max_memory,
+    ).dump()
+
+
+def split_instruments(parquet_path, csv_dir, generator, max_workers, **kwargs):
+    from split_instruments import SplitInstruments
+
+    SplitInstruments(
+        csv_path=parquet_path,
+        target_dir=csv_dir,
+        symbol_field_name=generator.shape["symbol_fields"][0],
+        max_workers=max_workers,
+    ).split()
+
+
+def dump_data_all(csv_dir, qlib_dir, generator, max_workers, **kwargs):
+    from dump_bin import DumpDataAll
+
+    string_fields = ",".join(
+        generator.shape["symbol_fields"] + generator._get_string_fields() + generator.shape["date_fields"]
+    )
+    DumpDataAll(
+        csv_path=csv_dir,
+        qlib_dir=qlib_dir,
+        date_field_name=generator.date_field_name,
+        symbol_field_name=generator.shape["symbol_fields"][0],
+        exclude_fields=string_fields,
+        max_workers=max_workers,
+    ).dump()
+
+
+def check_bin(parquet_path, qlib_dir, max_workers, **kwargs):
+    from check_dump_single import CheckBin
+
+    CheckBin(
+        qlib_dir=str(qlib_dir) + "/", parquet_path=parquet_path, check_symbol_num=-1, max_workers=max_workers
+    ).check_single()
+
+
+def _prepare(qlib_dir, handler_config: dict):
+    import qlib
+    from qlib.utils import init_instance_by_config
+
+    qlib.init(provider_uri=str(qlib_dir))
+    dataset = init_instance_by_config(
+        {
+            "class": "DatasetH",
+            "module_path": "qlib.data.dataset",
+            "kwargs": {"handler": handler_config, "segments": {"all": ("1900-01-01", "2100-12-31")}},
+        }
+    )
+    df = dataset.prepare("all", col_set=["feature", "label"])
+    logger.info(f"prepare {df.shape}")
+
+
+def wrds_prepare(qlib_dir, **kwargs):
+    _prepare(
+        qlib_dir,
+        {
+            "class": "WRDS",
+            "module_path": "data.wrds_handler",
+            "kwargs": {
+                "instruments": "all",
+                "start_time": "1900-01-01",
+                "end_time": "2100-12-31",
+                "label": (["$cstk"], ["LABEL0"]),
+            },
+        },
+    )
+
+
+def funda_prepare(qlib_dir, **kwargs):
+    _prepare(
+        qlib_dir,
+        {
+            "class": "FundA",
+            "module_path": "data.wrds_handler",
+            "kwargs": {"instruments": "all", "start_time": "1900-01-01", "end_time": "2100-12-31"},
+        },
+    )
+
+
+# case: (function, dataset, the dir used as qlib_dir)
+CASES = {
+    "dump_numeric": (dump_numeric, "msf", "numeric"),
+    "dump_all": (dump_all, "g_funda", "all"),
+    "dump_stream": (dump_stream, "g_secd", "stream"),
+    "split_instruments": (split_instruments, "msf", None),
+    "dump_data_all": (dump_data_all, "msf", "data_all"),
+    "check_bin": (check_bin, "g_funda", "all"),
+    "wrds_prepare": (wrds_prepare, "g_funda", "all"),
+    "funda_prepare": (funda_prepare, "g_funda", "all"),
+}
+
+
+class Benchmark:
+    # seconds between the checks of a case process which has not reported yet
+    POLL_SECONDS = 5
+
+    def __init__(
+        self,
+        work_dir: str = "~/.wrds_benchmark",
+        scale: float = 1.0,
+        max_workers: int = 16,
+        nan_ratio: float = 0.3,
+        seed: int = 0,
+    ):
+        """
+        time and record peak RSS of the dump scripts and the handlers on synthetic WRDS-shaped data
+
+        Parameters
+        ----------
+        work_dir: str
+            directory of the generated parquet files and the dumped qlib dirs
+        scale: float, default 1.0
+            scale of the number of symbols of each dataset, see generate.DATASETS for the default sizes
+        max_workers: int, default 16
+            max_workers passed to the dump scripts
+        nan_ratio: float, default 0.3
+            ratio of nan in the generated data
+        seed: int, default 0
+            random seed of the generated data
+        """
+        self.work_dir = Path(work_dir).expanduser()
+        self.scale = scale
+        self.max_workers = max_workers
+        self.nan_ratio = nan_ratio
+        self.seed = seed
+
+    def _get_generator(self, dataset: str) -> WRDSGenerator:
+        generator = WRDSGenerator(dataset=dataset, nan_ratio=self.nan_ratio, seed=self.seed)
+        generator.shape["symbols"] = max(int(generator.shape["symbols"] * self.scale), 1)
+        return generator
+
+    def _get_parquet(self, dataset: str) -> Path:
+        generator = self._get_generator(dataset)
+        parquet_path = self.work_dir.joinpath(f"{dataset}_{generator.shape['symbols']}.parquet")
+        if not parquet_path.exists():
+            generator.generate(parquet_path)
+        return parquet_path
+
+    def _run(self, case: str) -> dict:
+        case_func, dataset, qlib_name = CASES[case]
+        parquet_path = self._get_parquet(dataset)
+        kwargs = dict(
+            parquet_path=str(parquet_path),
+            generator=self._get_generator(dataset),
+            csv_dir=str(self.work_dir.joinpath(f"{dataset}_csv")),
+            max_workers=self.max_workers,
+        )
+        if qlib_name is not None:
+            kwargs["qlib_dir"] = str(self.work_dir.joinpath(f"{dataset}_{qlib_name}"))
+        if case_func in (dump_numeric, dump_all, dump_stream, dump_data_all):
+            shutil.rmtree(kwargs["qlib_dir"], ignore_errors=True)
+        if case_func is split_instruments:
+            shutil.rmtree(kwargs["csv_dir"], ignore_errors=True)
+
+        # spawn a fresh process for each case, so that the peak RSS is not polluted by the other cases
+        ctx = mp.get_context("spawn")
+        queue = ctx.Queue()
+        process = ctx.Process(target=_run_case, args=(case_func, kwargs, queue))
+        start = time.time()
+        process.start()
+        result = self._wait_result(process, queue)
+        process.join()
+        if result is None or process.exitcode != 0:
+            # the child crashed or was killed(e.g. by the OOM killer) before or after reporting
+            exit_status = (
+                f"killed by signal {-process.exitcode}" if process.exitcode < 0 else f"exit code {process.exitcode}"
+            )
+            result = result or dict(seconds=time.time() - start, peak_rss_mb=None, peak_children_rss_mb=None)
+            result.update(status="failed", error=f"case process {exit_status}")
+
+        result.update(case=case, dataset=dataset, rows=pq.ParquetFile(parquet_path).metadata.num_rows)
+        if result["status"] == "failed":
+            logger.error(f"{case}: failed, {result['seconds']:.2f}s, {result['error']}")
+        else:
+            logger.info(
+                f"{case}: {result['status']}, {result['seconds']:.2f}s, peak rss {result['peak_rss_mb']:.0f}MB, "
+                f"peak children rss {result['peak_children_rss_mb']:.0f}MB"
+            )
+        return result
+
+    def _wait_result(self, process, queue) -> dict:
+        """
+        the result put by the case process, None if it exits without one
+        """
+        while True:
+            try:
+                return queue.get(timeout=self.POLL_SECONDS)
+            except Empty:
+                if not process.is_alive():
+                    break
+        # the result may be put right before the exit
+        try:
+            return queue.get(timeout=self.POLL_SECONDS)
+        except Empty:
+            return None
+
+    @staticmethod
+    def _get_version() -> str:
+        try:
+            return subprocess.check_output(
+                ["git", "describe", "--always", "--dirty"], cwd=REPO_DIR, stderr=subprocess.DEVNULL, text=True
+            ).strip()
+        except Exception:
+            return None
+
+    def run(self, cases: str = ",".join(ALL_CASES), output: str = None):
+        """
+        Parameters
+        ----------
+        cases: str
+            comma separated cases, the order matters: check_bin/wrds_prepare/funda_prepare read the dump of dump_all,
+            dump_data_all reads the csvs of split_instruments
+        output: str, default None
+            path of the json result, default <work_dir>/benchmark_<time>.json
+        """
+        cases = cases.split(",") if isinstance(cases, str) else list(cases)
+        for case in cases:
+            if case not in CASES:
+                raise ValueError(f"case must be in {list(CASES)}, got {case}")
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        report = dict(
+            version=self._get_version(),
+            time=time.strftime("%Y-%m-%d %H:%M:%S"),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            scale=self.scale,
+            max_workers=self.max_workers,
+            results=[self._run(case) for case in cases],
+        )
+        output = Path(output).expanduser() if output else self.work_dir.joinpath(f"benchmark_{int(time.time())}.json")
+        output.write_text(json.dumps(report, indent=2))
+        logger.info(f"save benchmark result into {output}")
+        return str(output)
+
+
+if __name__ == "__main__":
+    fire.Fire(Benchmark)
@@ -0,0 +1,137 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+from pathlib import Path
+
+import fire
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+# catagory fields of FundA in data/wrds_handler.py, fdate/pdate are datetime
+FUNDA_CATAGORY_FIELDS = ['curcd', 'loc', 'acqmeth', 'compst', 'bspr', 'auop', 'final', 'sedol', 'curcdi', 'acctstd',
+                         'iid', 'fic', 'isin', 'stalt', 'costat', 'au', 'conm']
+FUNDA_DATE_FIELDS = ['fdate', 'pdate']
+FUNDA_KEY_FIELDS = ['gvkey', 'indfmt', 'datafmt', 'consol', 'popsrc']
+
+# shape of each WRDS dataset: key fields, date field, frequency of the calendar and default sizes
+DATASETS = {
+    "msf": dict(symbol_fields=['permno'], date_field='date', freq='M', symbols=2000, dates=240,
+                numeric_fields=20, string_fields=3, date_fields=[]),
+    "funda": dict(symbol_fields=FUNDA_KEY_FIELDS, date_field='datadate', freq='A', symbols=2000, dates=30,
+                  numeric_fields=200, string_fields=10, date_fields=[]),
+    "g_funda": dict(symbol_fields=FUNDA_KEY_FIELDS, date_field='datadate', freq='A', symbols=2000, dates=30,
+                    numeric_fields=50, string_fields=FUNDA_CATAGORY_FIELDS, date_fields=FUNDA_DATE_FIELDS),
+    "g_secd": dict(symbol_fields=['gvkey', 'iid'], date_field='datadate', freq='B', symbols=500, dates=2500,
+                   numeric_fields=8, string_fields=3, date_fields=[]),
+}
+
+
+class WRDSGenerator:
+    def __init__(
+        self,
+        dataset: str = "msf",
+        symbols: int = None,
+        dates: int = None,
+        numeric_fields: int = None,
+        string_fields: int = None,
+        nan_ratio: float = 0.3,
+        string_cardinality: int = 50,
+        seed: int = 0,
+    ):
+        """
+        generate a synthetic parquet file shaped like a WRDS dataset
+
+        Parameters
+        ----------
+        dataset: str, default "msf"
+            one of msf, funda, g_funda, g_secd
+        symbols: int
+            number of symbols(the first symbol field), default by dataset
+        dates: int
+            number of dates on the calendar, default by dataset
+        numeric_fields: int
+            number of float64 fields, default by dataset
+        string_fields: int
+            number of object fields besides the key fields, default by dataset
+        nan_ratio: float, default 0.3
+            ratio of nan in numeric and string fields
+        string_cardinality: int, default 50
+            number of distinct values of each string field, conm/isin/sedol are unique for each symbol
+        seed: int, default 0
+            random seed
+        """
+        if dataset not in DATASETS:
+            raise ValueError(f"dataset must be one of {list(DATASETS)}, got {dataset}")
+        self.dataset = dataset
+        self.shape = dict(DATASETS[dataset])
+        for key, value in dict(symbols=symbols, dates=dates, numeric_fields=numeric_fields,
+                               string_fields=string_fields).items():
+            if value is not None:
+                self.shape[key] = value
+        self.nan_ratio = nan_ratio
+        self.string_cardinality = string_cardinality
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def symbol_field_name(self) -> str:
+        return ",".join(self.shape["symbol_fields"])
+
+    @property
+    def date_field_name(self) -> str:
+        return self.shape["date_field"]
+
+    def _get_string_fields(self) -> list:
+        string_fields = self.shape["string_fields"]
+        if isinstance(string_fields, int):
+            string_fields = [f"str{i}" for i in range(string_fields)]
+        return string_fields
+
+    def _with_nan(self, values: np.ndarray) -> np.ndarray:
+        values = values.astype(object) if values.dtype.kind in "OU" else values
+        values[self.rng.random(len(values)) < self.nan_ratio] = None if values.dtype == object else np.nan
+        return values
+
+    def generate_df(self) -> pd.DataFrame:
+        n_symbols, n_dates = self.shape["symbols"], self.shape["dates"]
+        calendar = pd.date_range("1990-01-01", periods=n_dates, freq=self.shape["freq"])
+        # each symbol is observed in a random consecutive range of the calendar
+        lengths = self.rng.integers(1, n_dates + 1, n_symbols)
+        starts = (self.rng.random(n_symbols) * (n_dates - lengths + 1)).astype(int)
+        symbol_ids = np.repeat(np.arange(n_symbols), lengths)
+        date_ids = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+
+        df = pd.DataFrame()
+        symbol_fields = self.shape["symbol_fields"]
+        df[symbol_fields[0]] = pd.Series(symbol_ids).map("{:06d}".format).to_numpy(dtype=object)
+        for field in symbol_fields[1:]:
+            # every 10th symbol uses another value of the other key fields, e.g. indfmt INDL/FS
+            df[field] = np.where(symbol_ids % 10 == 0, f"{field[:2].upper()}1", f"{field[:2].upper()}0").astype(object)
+        df[self.shape["date_field"]] = calendar[date_ids].values
+        numeric_fields = [f"num{i}" for i in range(self.shape["numeric_fields"])]
+        if self.dataset == "g_funda":
+            # label of FundA
+            numeric_fields[0] = "cstk"
+        for field in numeric_fields:
+            df[field] = self._with_nan(self.rng.normal(size=len(df)))
+        for field in self._get_string_fields():
+            if field in ("conm", "isin", "sedol"):
+                values = np.char.add(f"{field.upper()} ", symbol_ids.astype(str))
+            else:
+                values = np.char.add(f"{field.upper()} ", self.rng.integers(0, self.string_cardinality, len(df)).astype(str))
+            df[field] = self._with_nan(values)
+        for field in self.shape["date_fields"]:
+            offsets = pd.to_timedelta(self.rng.integers(30, 120, len(df)), unit="D")
+            df[field] = (df[self.shape["date_field"]] + offsets).where(self.rng.random(len(df)) >= self.nan_ratio)
+        return df
+
+    def generate(self, path: str):
+        path = Path(path).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        df = self.generate_df()
+        df.to_parquet(path, index=False)
+        logger.info(f"generate {self.dataset} {df.shape} into {path}")
+        return str(path)
+
+
+if __name__ == "__main__":
+    fire.Fire(WRDSGenerator)
@@ -0,0 +1,46 @@
+import os
+import signal
+
+import pandas as pd
+import pytest
+
+import benchmark
+from benchmark import Benchmark
+
+
+def ok_case(**kwargs):
+    pass
+
+
+def exit_case(**kwargs):
+    os._exit(3)
+
+
+def kill_case(**kwargs):
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+@pytest.fixture()
+def bench(tmp_path, monkeypatch):
+    parquet_path = tmp_path / "data.parquet"
+    pd.DataFrame({"a": [1.0, 2.0]}).to_parquet(parquet_path)
+    cases = {"ok": ok_case, "exit": exit_case, "kill": kill_case}
+    monkeypatch.setattr(benchmark, "CASES", {name: (func, "msf", None) for name, func in cases.items()})
+    monkeypatch.setattr(Benchmark, "POLL_SECONDS", 0.2)
+    monkeypatch.setattr(Benchmark, "_get_parquet", lambda self, dataset: parquet_path)
+    monkeypatch.setattr(Benchmark, "_get_generator", lambda self, dataset: None)
+    return Benchmark(work_dir=str(tmp_path))
+
+
+@pytest.mark.parametrize(
+    "case, status, error",
+    [
+        ("ok", "ok", None),
+        ("exit", "failed", "case process exit code 3"),
+        ("kill", "failed", "case process killed by signal 9"),
+    ],
+)
+def test_case_process_exit(bench, case, status, error):
+    # a crashed case is reported instead of waiting for its result forever
+    result = bench._run(case)
+    assert (result["status"], result["error"], result["rows"]) == (status, error, 2)
@@ -1,6 +1,8 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import json
+import sys
 from pathlib import Path
 
 import qlib
@@ -13,6 +15,7 @@ from tqdm import tqdm
 from loguru import logger
 import time
 import numpy as np
+import pyarrow.dataset as ds
 class CheckBin:
 
     NOT_IN_FEATURES = "not in features"
@@ -39,7 +42,7 @@ class CheckBin:
         parquet_path : str
             origin csv path
         check_fields : str, optional
-            check fields, by default None, check qlib_dir/features/<first_dir>/*.<freq>.bin
+            check fields, by default None, check the fields of manifest.json(qlib_dir/features/<first_dir>/*.<freq>.bin for older dumps)
         freq : str, optional
             freq, value from ["day", "1m"]
         symbol_field_name: str, optional
@@ -49,6 +52,7 @@ class CheckBin:
         max_workers: int, optional
             max workers, by default 16
         """
+        self.manifest = self._get_manifest(qlib_dir)
         symbol_field_name,date_field_name = self._get_field_names(qlib_dir)
         self.qlib_dir = Path(qlib_dir).expanduser()
         self.check_symbol_num = check_symbol_num
@@ -56,7 +60,6 @@ class CheckBin:
         self.max_workers = max_workers
         self.freq = freq
         
-        bin_path_list = list(self.qlib_dir.joinpath("features").iterdir())
         
         if isinstance(symbol_field_name, str):
             symbol_field_name = symbol_field_name.split(",")
@@ -68,26 +71,44 @@ class CheckBin:
         except:
             self.catagory_mappers=None
             self.catagory_fields=None
-        if check_fields is None:
-            check_fields = list(map(lambda x: x.name.split(".")[0], bin_path_list[0].glob(f"*.bin")))
+        numeric_date_path = self.qlib_dir.joinpath("numeric_date_fields.txt")
+        if self.manifest is not None:
+            self.numeric_date_fields = self.manifest["numeric_date_fields"]
+        else:
+            self.numeric_date_fields = numeric_date_path.read_text(encoding="utf-8").split() if numeric_date_path.exists() else []
+        if check_fields is None and self.manifest is not None:
+            check_fields = self.manifest["fields"]
+        elif check_fields is None:
+            bin_path = next(self.qlib_dir.joinpath("features").iterdir())
+            check_fields = list(map(lambda x: x.name.split(".")[0], bin_path.glob(f"*.bin")))
         else:
             check_fields = check_fields.split(",") if isinstance(check_fields, str) else check_fields
         self.check_fields = list(map(lambda x: x.strip(), check_fields))[:check_feature_num]
         self.check_fields = list(set(self.check_fields)|set(self.catagory_fields))
         self.qlib_fields = list(map(lambda x: f"${x}", self.check_fields))
         self.parquet_path = parquet_path
-        self.origin_df = pd.read_parquet(parquet_path)
+        self.origin_df = pd.read_parquet(parquet_path, columns=self._get_read_columns(parquet_path))
         self.symbol_field_name = self._get_symbol_field_name()
         
         self.origin_df[date_field_name] = pd.to_datetime(self.origin_df[date_field_name])
         self.origin_df[[self.symbol_field_name]] = self.origin_df[[self.symbol_field_name]].astype(str)
         self.check_symbols = self._get_check_symbols()
         
+        qlib_kwargs = {}
+        if self.manifest is not None and (self.manifest.get("sparse_fields") or self.manifest.get("bin_dtypes")):
+            # the sparse bins(*.sbin) and typed bins(*.tbin) are read by data.wrds_storage.WRDSFeatureStorage
+            sys.path.append(str(Path(__file__).resolve().parents[2]))
+            qlib_kwargs["feature_provider"] = {
+                "class": "LocalFeatureProvider",
+                "kwargs": {"backend": {"class": "WRDSFeatureStorage", "module_path": "data.wrds_storage"}},
+            }
+            qlib_kwargs["expression_provider"] = {"class": "WRDSExpressionProvider", "module_path": "data.wrds_storage"}
         qlib.init(
             provider_uri=str(self.qlib_dir.resolve()),
             mount_path=str(self.qlib_dir.resolve()),
             auto_mount=False,
             redis_port=-1,
+            **qlib_kwargs,
         )
     
         self.qlib_df = D.features(self.check_symbols, self.qlib_fields, freq=self.freq)
@@ -103,7 +124,20 @@ class CheckBin:
         self.qlib_df = self.qlib_df.reindex(self.origin_df.index)
         self.qlib_df = self.qlib_df.astype(self.origin_df.dtypes.to_dict())
     
+    def _get_read_columns(self, parquet_path):
+        # only decode the key fields and the checked fields
+        read_fields = set(self.symbol_field_tuple) | {self.date_field_name} | set(self.check_fields)
+        column_names = ds.dataset(parquet_path, format="parquet").schema.names
+        return [col for col in column_names if col in read_fields]
+
+    def _get_manifest(self, qlib_dir):
+        # manifest.json written by dump_single.py, None for the dumps of older versions
+        manifest_path = Path(qlib_dir).expanduser().joinpath("manifest.json")
+        return json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() else None
+
     def _get_field_names(self,qlib_dir):
+        if self.manifest is not None:
+            return ",".join(self.manifest["symbol_fields"]), self.manifest["date_field"]
         f = open(qlib_dir+"symbol_fileds.txt",encoding = "utf-8")
         symbol_field_name=f.readline().strip()
         f = open(qlib_dir+"date_field.txt",encoding = "utf-8")
@@ -126,12 +160,17 @@ class CheckBin:
         catagory_dict={}
         dir=uri+'/catagories'
         for file in os.listdir(dir):
+            if not file.endswith('.txt'):
+                continue
             field= file.split('.')[0]
             with open(dir+'/'+file, 'r') as f:
                 content=f.read().splitlines()
             catagory_dict[field]=dict(zip(range(len(content)), content))
         return catagory_dict
     def _map_catagory_fields(self, df:pd.DataFrame):
+        for numeric_date_field in self.numeric_date_fields:
+            if numeric_date_field in df.columns:
+                df[numeric_date_field]=pd.to_datetime(df[numeric_date_field].astype("float64"), unit="D")
         if self.catagory_mappers is None:
             return df
         for catafory_field_i in self.catagory_mappers: 
@@ -1,15 +1,26 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 import abc
+import sys
+import json
 import shutil
 import traceback
+import time
+import multiprocessing as mp
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Iterable, List, Union
 from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 import fire
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
 from tqdm import tqdm
 from loguru import logger
 from qlib.utils import fname_to_code, code_to_fname
@@ -17,6 +28,21 @@ from qlib.utils import fname_to_code, code_to_fname
 numeric_types=['float64']
 catagory_types=['object','datetime64[ns]']
 
+# the dumper shared with forked workers, see DumpNumeric._dump_features_parallel
+_FORK_DUMPER = None
+
+
+def can_fork() -> bool:
+    """
+    fork after threads(numpy/pyarrow pools, the system frameworks of macOS) is only safe on linux, the features are
+    dumped serially elsewhere
+    """
+    return sys.platform.startswith("linux") and "fork" in mp.get_all_start_methods()
+
+
+def _fork_dump_slice(offsets):
+    _FORK_DUMPER._dump_slice(offsets)
+
 
 class DumpDataBase:
     INSTRUMENTS_START_FIELD = "start_datetime"
@@ -25,6 +51,12 @@ class DumpDataBase:
     FEATURES_DIR_NAME = "features"
     INSTRUMENTS_DIR_NAME = "instruments"
     DUMP_FILE_SUFFIX = ".bin"
+    # sparse bin: [start_index, end_index, positions...] as int32, then [values...] as float32
+    SPARSE_FILE_SUFFIX = ".sbin"
+    # typed bin: [dtype as 8 bytes ascii, start_index as int64], then [values...] as dtype, nulls of integer
+    # dtypes are the max value of the dtype
+    TYPED_FILE_SUFFIX = ".tbin"
+    TYPED_HEADER_SIZE = 16
     DAILY_FORMAT = "%Y-%m-%d"
     HIGH_FREQ_FORMAT = "%Y-%m-%d %H:%M:%S"
     INSTRUMENTS_SEP = "\t"
@@ -105,6 +137,7 @@ class DumpDataBase:
 
         self._mode = self.ALL_MODE
         self._kwargs = {}
+        self._timings = {}
 
     def _backup_qlib_dir(self, target_dir: Path):
         shutil.copytree(str(self.qlib_dir.resolve()), str(target_dir.resolve()))
@@ -170,6 +203,8 @@ class DumpDataBase:
                 self.INSTRUMENTS_START_FIELD,
                 self.INSTRUMENTS_END_FIELD,
             ],
+            dtype=str,
+            keep_default_na=False,
         )
 
         return df
@@ -177,8 +212,8 @@ class DumpDataBase:
     def save_calendars(self, calendars_data: list):
         self._calendars_dir.mkdir(parents=True, exist_ok=True)
         calendars_path = str(self._calendars_dir.joinpath(f"{self.freq}.txt").expanduser().resolve())
-        result_calendars_list = list(map(lambda x: self._format_datetime(x), calendars_data))
-        np.savetxt(calendars_path, result_calendars_list, fmt="%s", encoding="utf-8")
+        result_calendars_list = pd.DatetimeIndex(calendars_data).strftime(self.calendar_format)
+        self._save_lines(calendars_path, result_calendars_list)
 
     def save_instruments(self, instruments_data: Union[list, pd.DataFrame]):
         self._instruments_dir.mkdir(parents=True, exist_ok=True)
@@ -191,45 +226,131 @@ class DumpDataBase:
             )
             instruments_data.to_csv(instruments_path, header=False, sep=self.INSTRUMENTS_SEP, index=False)
         else:
-            np.savetxt(instruments_path, instruments_data, fmt="%s", encoding="utf-8")
-
-    def data_merge_calendar(self, df: pd.DataFrame, calendars_list: List[pd.Timestamp]) -> pd.DataFrame:
-        # calendars
-        calendars_df = pd.DataFrame(data=calendars_list, columns=[self.date_field_name])
-        calendars_df[self.date_field_name] = calendars_df[self.date_field_name].astype(np.datetime64)
-        cal_df = calendars_df[
-            (calendars_df[self.date_field_name] >= df[self.date_field_name].min())
-            & (calendars_df[self.date_field_name] <= df[self.date_field_name].max())
-        ]
-        # align index
-        cal_df.set_index(self.date_field_name, inplace=True)
-        df.set_index(self.date_field_name, inplace=True)
-        r_df = df.reindex(cal_df.index)
-        return r_df
+            self._save_lines(instruments_path, instruments_data)
 
     @staticmethod
-    def get_datetime_index(df: pd.DataFrame, calendar_list: List[pd.Timestamp]) -> int:
-        return calendar_list.index(df.index.min())
+    def _save_lines(path: str, lines: Iterable[str]):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("".join(line + "\n" for line in lines))
+
+    def _get_calendar_index(self, calendar_list: List[pd.Timestamp]) -> np.ndarray:
+        # sorted int64(ns) calendar, built once and shared by all symbols
+        if getattr(self, "_calendar_index_source", None) is not calendar_list:
+            self._calendar_index = pd.DatetimeIndex(calendar_list).asi8
+            self._calendar_index_source = calendar_list
+        return self._calendar_index
+
+    def align_calendar(self, dates: pd.Series, calendar_list: List[pd.Timestamp]):
+        """
+        locate dates on the calendar
+
+        Returns
+        -------
+        (date_index, length, positions, mask): the calendar index of the first date, the number of calendar days
+        between the first and the last date, the positions of the dates relative to date_index,
+        and whether each date is on the calendar
+        """
+        calendar_index = self._get_calendar_index(calendar_list)
+        dates = pd.DatetimeIndex(dates).asi8
+        positions = np.searchsorted(calendar_index, dates)
+        mask = calendar_index[np.minimum(positions, len(calendar_index) - 1)] == dates
+        if not mask.any():
+            return 0, 0, positions, mask
+        date_index = positions[mask].min()
+        length = positions[mask].max() - date_index + 1
+        return date_index, length, positions - date_index, mask
 
     def _data_to_bin(self, df: pd.DataFrame, calendar_list: List[pd.Timestamp], features_dir: Path):
         if df.empty:
             logger.warning(f"{features_dir.name} data is None or empty")
             return
-        # align index
-        _df = self.data_merge_calendar(df, calendar_list)
-        # used when creating a bin file
-        date_index = self.get_datetime_index(_df, calendar_list)
-        for field in self.get_dump_fields(_df.columns):
+        # align index, rows are scattered into a nan-filled buffer which starts at date_index
+        date_index, length, positions, mask = self.align_calendar(df[self.date_field_name], calendar_list)
+        positions = positions[mask]
+        columns = df.columns.drop(self.date_field_name)
+        sparse_fields = self._kwargs.get("sparse_fields", ())
+        bin_dtypes = self._kwargs.get("bin_dtypes", {})
+        for field in self.get_dump_fields(columns):
             bin_path = features_dir.joinpath(f"{field.lower()}.{self.freq}{self.DUMP_FILE_SUFFIX}")
-            if field not in _df.columns:
+            if field not in columns:
+                continue
+            if field.lower() in sparse_fields:
+                sparse_path = features_dir.joinpath(f"{field.lower()}.{self.freq}{self.SPARSE_FILE_SUFFIX}")
+                self._save_sparse(sparse_path, date_index, date_index + length - 1, positions + date_index, df[field].values[mask])
                 continue
+            if field.lower() in bin_dtypes:
+                data = np.full(length, np.nan, dtype=np.float64)
+                data[positions] = df[field].values[mask]
+                typed_path = features_dir.joinpath(f"{field.lower()}.{self.freq}{self.TYPED_FILE_SUFFIX}")
+                self._save_typed(typed_path, date_index, data, bin_dtypes[field.lower()])
+                continue
+            data = np.full(length + 1, np.nan, dtype="<f")
+            data[0] = date_index
+            data[1:][positions] = df[field].values[mask]
             if bin_path.exists() and self._mode == self.UPDATE_MODE:
                 # update
                 with bin_path.open("ab") as fp:
-                    np.array(_df[field]).astype("<f").tofile(fp)
+                    data[1:].tofile(fp)
             else:
                 # append; self._mode == self.ALL_MODE or not bin_path.exists()
-                np.hstack([date_index, _df[field]]).astype("<f").tofile(str(bin_path.resolve()))
+                data.tofile(str(bin_path.resolve()))
+
+    @staticmethod
+    def _save_sparse(path: Path, start_index: int, end_index: int, positions: np.ndarray, values: np.ndarray):
+        """
+        save the non-nan values with their calendar positions, sorted by position
+        """
+        values = np.asarray(values, dtype="<f")
+        keep = ~np.isnan(values)
+        positions, values = np.asarray(positions)[keep], values[keep]
+        order = np.argsort(positions, kind="stable")
+        with path.open("wb") as fp:
+            np.hstack([[start_index, end_index], positions[order]]).astype("<i4").tofile(fp)
+            values[order].tofile(fp)
+
+    @staticmethod
+    def _read_sparse(path: Path):
+        """
+        Returns
+        -------
+        (start_index, end_index, positions, values)
+        """
+        data = np.fromfile(str(path), dtype="<i4")
+        count = (len(data) - 2) // 2
+        return int(data[0]), int(data[1]), data[2 : 2 + count], data[2 + count :].view("<f")
+
+    @staticmethod
+    def _to_typed(values: np.ndarray, dtype: str) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        if dtype.kind == "f":
+            return np.asarray(values, dtype=dtype)
+        values = np.asarray(values, dtype=np.float64)
+        return np.where(np.isnan(values), np.iinfo(dtype).max, values).astype(dtype)
+
+    @staticmethod
+    def _from_typed(values: np.ndarray) -> np.ndarray:
+        if values.dtype.kind == "f":
+            return values.astype(np.float64)
+        return np.where(values == np.iinfo(values.dtype).max, np.nan, values.astype(np.float64))
+
+    @classmethod
+    def _save_typed(cls, path: Path, start_index: int, values: np.ndarray, dtype: str):
+        with path.open("wb") as fp:
+            fp.write(np.dtype(dtype).str.encode("ascii").ljust(8, b"\0"))
+            np.array([start_index], dtype="<i8").tofile(fp)
+            cls._to_typed(values, dtype).tofile(fp)
+
+    @classmethod
+    def _read_typed(cls, path: Path):
+        """
+        Returns
+        -------
+        (start_index, values as stored dtype)
+        """
+        with path.open("rb") as fp:
+            dtype = fp.read(8).rstrip(b"\0").decode("ascii")
+            start_index = int(np.fromfile(fp, dtype="<i8", count=1)[0])
+            return start_index, np.fromfile(fp, dtype=dtype)
 
     def _dump_bin(self, file_or_data: [Path, pd.DataFrame], calendar_list: List[pd.Timestamp]):
         if isinstance(file_or_data, pd.DataFrame):
@@ -260,10 +381,29 @@ class DumpDataBase:
     def dump(self):
         raise NotImplementedError("dump not implemented!")
 
+    @contextmanager
+    def _timer(self, name: str):
+        start = time.time()
+        yield
+        self._timings[name] = time.time() - start
+        logger.info(f"{name} takes {self._timings[name]:.2f}s")
+
+    def _report_timings(self):
+        report = ", ".join(f"{name}: {cost:.2f}s" for name, cost in self._timings.items())
+        logger.info(f"time cost of dump: {report}, total: {sum(self._timings.values()):.2f}s")
+
     def __call__(self, *args, **kwargs):
         self.dump()
 
 class DumpNumeric(DumpDataBase):
+    GROUP_ENGINE = "group"
+    BULK_ENGINE = "bulk"
+    ENGINES = (GROUP_ENGINE, BULK_ENGINE)
+    MANIFEST_FILE = "manifest.json"
+    # per instrument counts of the source rows and the non-null values of each field
+    COVERAGE_FILE = "coverage.parquet"
+    COVERAGE_ROWS_FIELD = "_rows"
+
     def __init__(
         self,
         csv_path: str,
@@ -277,6 +417,9 @@ class DumpNumeric(DumpDataBase):
         exclude_fields: str = "",
         include_fields: str = "",
         limit_nums: int = None,
+        engine: str = "group",
+        sparse_ratio: float = 0,
+        float64_fields: str = "",
     ):
         """
         Parameters
@@ -289,8 +432,8 @@ class DumpNumeric(DumpDataBase):
             if backup_dir is not None, backup qlib_dir to backup_dir
         freq: str, default "day"
             transaction frequency
-        max_workers: int, default None
-            number of threads
+        max_workers: int, default 16
+            number of processes to dump features, dump serially if max_workers <= 1 or not on linux
         date_field_name: str, default "date"
             the name of the date field in the csv
         file_suffix: str, default ".csv"
@@ -303,27 +446,46 @@ class DumpNumeric(DumpDataBase):
             fields not dumped
         limit_nums: int
             Use when debugging, default None
+        engine: str, default "group"
+            "group": dump each symbol from its own DataFrame;
+            "bulk": sort the whole frame by symbol once, then write every symbol's bin field by field
+        sparse_ratio: float, default 0
+            fields whose ratio of non-null values on the calendar spans of the instruments is below sparse_ratio are
+            saved as sparse bins(*.sbin, read by data.wrds_storage.WRDSFeatureStorage), 0 means all dense
+        float64_fields: str, default ""
+            fields saved as float64 typed bins(*.tbin, read by data.wrds_storage.WRDSFeatureStorage), e.g. large
+            identifiers and monetary amounts, the other fields are float32 bins
         """
-        csv_path = Path(csv_path).expanduser()
-        if isinstance(exclude_fields, str):
-            exclude_fields = exclude_fields.split(",")
-        if isinstance(include_fields, str):
-            include_fields = include_fields.split(",")
-        self._exclude_fields = tuple(filter(lambda x: len(x) > 0, map(str.strip, exclude_fields)))
-        self._include_fields = tuple(filter(lambda x: len(x) > 0, map(str.strip, include_fields)))
+        self._init_fields(symbol_field_name, date_field_name, include_fields, exclude_fields, file_suffix)
+        self._load(Path(csv_path).expanduser(), limit_nums)
+        self._init_dump(qlib_dir, backup_dir, freq, max_workers, engine, sparse_ratio, float64_fields)
+
+    @staticmethod
+    def _split_fields(fields) -> tuple:
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        return tuple(filter(lambda x: len(x) > 0, map(str.strip, fields)))
+
+    def _init_fields(self, symbol_field_name, date_field_name, include_fields, exclude_fields, file_suffix):
+        self._exclude_fields = self._split_fields(exclude_fields)
+        self._include_fields = self._split_fields(include_fields)
         self.file_suffix = file_suffix
         self.symbol_field_name = symbol_field_name
-        
+        self.date_field_name = date_field_name
+
+    def _load(self, csv_path: Path, limit_nums: int = None):
         #read dataframe
-        self.csv=self._read(csv_path)
+        self.csv=self._read(csv_path, self._get_read_columns(csv_path))
 
         if limit_nums is not None:
             selected_symbols=self.csv[self.symbol_field_name].drop_duplicates()[:limit_nums]
-            self.csv=self.csv[self.csv[symbol_field_name].isin(selected_symbols)]
+            self.csv=self.csv[self.csv[self.symbol_field_name].isin(selected_symbols)]
         self._check()
         self._group_by_symbol=self.csv.groupby(self.symbol_field_name)
-        
+
+    def _init_dump(self, qlib_dir, backup_dir, freq, max_workers, engine, sparse_ratio, float64_fields):
         self.qlib_dir = Path(qlib_dir).expanduser()
+        self.qlib_dir.mkdir(parents=True, exist_ok=True)
         self.backup_dir = backup_dir if backup_dir is None else Path(backup_dir).expanduser()
         if backup_dir is not None:
             self._backup_qlib_dir(Path(backup_dir).expanduser())
@@ -332,7 +494,11 @@ class DumpNumeric(DumpDataBase):
         self.calendar_format = self.DAILY_FORMAT if self.freq == "day" else self.HIGH_FREQ_FORMAT
 
         self.works = max_workers
-        self.date_field_name = date_field_name
+        if engine not in self.ENGINES:
+            raise ValueError(f"engine must be one of {self.ENGINES}, got {engine}")
+        self.engine = engine
+        self.sparse_ratio = sparse_ratio
+        self.float64_fields = tuple(map(str.lower, self._split_fields(float64_fields)))
 
         self._calendars_dir = self.qlib_dir.joinpath(self.CALENDARS_DIR_NAME)
         self._features_dir = self.qlib_dir.joinpath(self.FEATURES_DIR_NAME)
@@ -342,6 +508,7 @@ class DumpNumeric(DumpDataBase):
 
         self._mode = self.ALL_MODE
         self._kwargs = {}
+        self._timings = {}
     
     def _get_catagory_fields(self):
         dtypes=self.csv.dtypes.apply(str)
@@ -359,42 +526,58 @@ class DumpNumeric(DumpDataBase):
         symbol, symbol_df=group
         return str(symbol).strip().lower(), super()._get_date(symbol_df, as_set=as_set,is_begin_end=is_begin_end)
     
-    def _read(self, path):
+    def _read(self, path, columns: list=None):
+        path=str(path)
+        if path.endswith('csv'):
+            return pd.read_csv(path, usecols=columns)
+        elif path.endswith('parquet'):
+            return pd.read_parquet(path, columns=columns)
+        else:
+            raise NotImplementedError('not support for this file format!')
+
+    def _read_column_names(self, path) -> list:
         path=str(path)
         if path.endswith('csv'):
-            return pd.read_csv(path)
+            return pd.read_csv(path, nrows=0).columns.tolist()
         elif path.endswith('parquet'):
-            return pd.read_parquet(path)
+            return ds.dataset(path, format="parquet").schema.names
         else:
             raise NotImplementedError('not support for this file format!')
+
+    def _get_key_fields(self) -> tuple:
+        return (self.symbol_field_name, self.date_field_name)
+
+    def _get_read_columns(self, path) -> list:
+        # push include_fields/exclude_fields down to the reader, so that the other columns are never decoded
+        if not self._include_fields and not self._exclude_fields:
+            return None
+        column_names=self._read_column_names(path)
+        dump_fields=set(self.get_dump_fields(column_names))|set(self._get_key_fields())
+        return [col for col in column_names if col in dump_fields]
     
     def _get_all_date(self):
         logger.info("start get all date......")
-        all_datetime = set()
-        date_range_list = []
-        _begin=self._group_by_symbol.apply(lambda x:x[self.date_field_name].min())
-        _end=self._group_by_symbol.apply(lambda x:x[self.date_field_name].max())
-        _begin_end=pd.DataFrame(dict(begin=_begin, end=_end)).reset_index()
-        with tqdm(total=len(_begin_end)) as p_bar:
-            for symbol, _begin_time, _end_time in zip(
-                _begin_end[self.symbol_field_name],_begin_end['begin'],_begin_end['end']
-                ):
-                if isinstance(_begin_time, pd.Timestamp) and isinstance(_end_time, pd.Timestamp):
-                    _begin_time = self._format_datetime(_begin_time)
-                    _end_time = self._format_datetime(_end_time)
-                    symbol=str(symbol).strip().lower()
-                    _inst_fields = [symbol.upper(), _begin_time, _end_time]
-                    date_range_list.append(f"{self.INSTRUMENTS_SEP.join(_inst_fields)}")
-                p_bar.update()
-        all_datetime = set(self.csv[self.date_field_name])
-        self._kwargs["all_datetime_set"] = all_datetime
-        self._kwargs["date_range_list"] = date_range_list
+        _begin_end=self.csv.groupby(self.symbol_field_name)[self.date_field_name].agg(['min','max'])
+        _begin_end=_begin_end.rename(columns=dict(min='begin', max='end')).reset_index()
+        self._kwargs["all_datetime_set"] = self.csv[self.date_field_name].unique()
+        self._kwargs["date_range_list"] = self._get_date_range_list(_begin_end)
         logger.info("end of get all date.\n")
 
+    def _get_instrument_symbols(self, symbols: pd.Series) -> pd.Series:
+        return symbols.astype(str).str.strip().str.upper()
+
+    def _get_date_range_list(self, _begin_end: pd.DataFrame):
+        _begin_end=_begin_end.dropna(subset=['begin','end'])
+        symbols=self._get_instrument_symbols(_begin_end[self.symbol_field_name])
+        _begin_time=pd.DatetimeIndex(_begin_end['begin']).strftime(self.calendar_format)
+        _end_time=pd.DatetimeIndex(_begin_end['end']).strftime(self.calendar_format)
+        return (symbols+self.INSTRUMENTS_SEP+_begin_time+self.INSTRUMENTS_SEP+_end_time).tolist()
+
     def _dump_calendars(self):
         logger.info("start dump calendars......")
-        self._calendars_list = sorted(map(pd.Timestamp, self._kwargs["all_datetime_set"]))
+        self._calendars_list = pd.DatetimeIndex(self._kwargs["all_datetime_set"]).dropna().unique().sort_values().tolist()
         self.save_calendars(self._calendars_list)
+        self._get_calendar_index(self._calendars_list)
         logger.info("end of calendars dump.\n")
 
     def _dump_instruments(self):
@@ -406,31 +589,246 @@ class DumpNumeric(DumpDataBase):
         _,df=group
         super()._dump_bin(df,calendar_list)
 
+    def _get_notna_counts(self) -> pd.Series:
+        columns=self.csv.columns.drop([self.symbol_field_name, self.date_field_name], errors="ignore")
+        fields=[field for field in self.get_dump_fields(columns) if field in columns]
+        return self.csv[fields].notna().sum()
+
+    def _select_sparse_fields(self) -> list:
+        if not self.sparse_ratio:
+            return []
+        # number of cells of the dense bins: the calendar span of each instrument
+        calendar_index = self._get_calendar_index(self._calendars_list)
+        spans = pd.Series(self._kwargs["date_range_list"]).str.split(self.INSTRUMENTS_SEP, expand=True)
+        begin = np.searchsorted(calendar_index, pd.DatetimeIndex(spans[1]).asi8)
+        end = np.searchsorted(calendar_index, pd.DatetimeIndex(spans[2]).asi8)
+        cells = (end - begin + 1).sum()
+        counts = self._get_notna_counts()
+        sparse_fields = sorted(field.lower() for field, count in counts.items() if count < self.sparse_ratio * cells)
+        logger.info(f"sparse fields: {sparse_fields}")
+        return sparse_fields
+
+    def _get_sparse_fields(self) -> list:
+        # selected once, before the features are dumped by(forked) workers or buckets
+        if "sparse_fields" not in self._kwargs:
+            self._kwargs["sparse_fields"] = self._select_sparse_fields()
+        return self._kwargs["sparse_fields"]
+
+    def _select_bin_dtypes(self) -> dict:
+        sparse_fields = self._get_sparse_fields()
+        return {field: "<f8" for field in self.float64_fields if field not in sparse_fields}
+
+    def _get_bin_dtypes(self) -> dict:
+        """
+        dtypes of the typed bins(*.tbin) keyed by the lower-case field name, the other dense fields are float32 bins
+        """
+        if "bin_dtypes" not in self._kwargs:
+            self._kwargs["bin_dtypes"] = self._select_bin_dtypes()
+        return self._kwargs["bin_dtypes"]
+
     def _dump_features(self):
         logger.info("start dump features......")
+        self._get_sparse_fields()
+        self._get_bin_dtypes()
+        if self.engine == self.BULK_ENGINE:
+            self._dump_features_bulk()
+        elif self.works is not None and self.works > 1 and can_fork():
+            self._dump_features_parallel()
+        else:
+            if self.works is not None and self.works > 1:
+                logger.warning(f"fork is unsafe on {sys.platform}, dump features serially")
+            with tqdm(total=len(self._group_by_symbol)) as p_bar:
+                for group in self._group_by_symbol:
+                    self._dump_bin(group, self._calendars_list)
+                    p_bar.update()
+        logger.info("end of features dump.\n")
 
-        with tqdm(total=len(self._group_by_symbol)) as p_bar:
-            for group in self._group_by_symbol:
-                self._dump_bin(group, self._calendars_list)
+    def _sort_by_symbol(self):
+        # rows of one symbol are contiguous in self.csv.take(order), the order of rows in each symbol is kept
+        codes, symbols = pd.factorize(self.csv[self.symbol_field_name], sort=True)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.searchsorted(codes[order], np.arange(len(symbols) + 1))
+        order = order[bounds[0]:]
+        bounds = bounds - bounds[0]
+        return order, bounds, symbols
+
+    def _get_symbol_offsets(self):
+        order, bounds, _ = self._sort_by_symbol()
+        return order, list(zip(bounds[:-1], bounds[1:]))
+
+    def _dump_slice(self, offsets):
+        start, end = offsets
+        df = self.csv.take(self._symbol_order[start:end])
+        self._dump_bin((None, df), self._calendars_list)
+
+    def _dump_features_parallel(self):
+        # pickling each group is slower than serial dump, so the workers are forked after self.csv and the
+        # symbol order are ready, and only the offsets of each symbol are sent to them
+        global _FORK_DUMPER
+        self._symbol_order, symbol_offsets = self._get_symbol_offsets()
+        _FORK_DUMPER = self
+        try:
+            chunksize = max(len(symbol_offsets) // (self.works * 16), 1)
+            with tqdm(total=len(symbol_offsets)) as p_bar:
+                with ProcessPoolExecutor(max_workers=self.works, mp_context=mp.get_context("fork")) as executor:
+                    for _ in executor.map(_fork_dump_slice, symbol_offsets, chunksize=chunksize):
+                        p_bar.update()
+        finally:
+            _FORK_DUMPER = None
+            self._symbol_order = None
+
+    def _dump_features_bulk(self):
+        order, bounds, symbols = self._sort_by_symbol()
+        symbol_codes = np.repeat(np.arange(len(symbols)), np.diff(bounds))
+        date_index, length, positions, mask = self.align_calendar(
+            self.csv[self.date_field_name].values[order], self._calendars_list
+        )
+        positions = positions + date_index
+        # try to remove dup rows, keep the first one like DumpDataBase._dump_bin. only the rows on the calendar, NaT
+        # and off-calendar dates are located at the position of a real date and must not hide its row
+        selected = np.flatnonzero(mask)
+        mask[selected[pd.MultiIndex.from_arrays([symbol_codes[selected], positions[selected]]).duplicated()]] = False
+        rows, symbol_codes, positions = order[mask], symbol_codes[mask], positions[mask]
+        if len(rows) == 0:
+            logger.warning("data is None or empty")
+            return
+
+        # layout of each symbol's bin in one buffer: [date_index, values on calendar from date_index...]
+        symbol_ids, row_starts, row_counts = np.unique(symbol_codes, return_index=True, return_counts=True)
+        date_index = np.minimum.reduceat(positions, row_starts)
+        length = np.maximum.reduceat(positions, row_starts) - date_index + 1
+        buffer_bounds = np.concatenate([[0], np.cumsum(length + 1)])
+        buffer_positions = np.repeat(buffer_bounds[:-1] + 1 - date_index, row_counts) + positions
+
+        bin_dirs = []
+        for symbol in symbols[symbol_ids]:
+            features_dir = self._features_dir.joinpath(code_to_fname(fname_to_code(str(symbol).lower())).lower())
+            features_dir.mkdir(parents=True, exist_ok=True)
+            bin_dirs.append(features_dir)
+        columns = self.csv.columns.drop([self.symbol_field_name, self.date_field_name])
+        fields = [field for field in self.get_dump_fields(columns) if field in columns]
+        sparse_fields = self._get_sparse_fields()
+        bin_dtypes = self._get_bin_dtypes()
+        with tqdm(total=len(fields)) as p_bar:
+            for field in fields:
+                if field.lower() in sparse_fields:
+                    values = self.csv[field].values[rows]
+                    sparse_name = f"{field.lower()}.{self.freq}{self.SPARSE_FILE_SUFFIX}"
+                    for i, features_dir in enumerate(bin_dirs):
+                        start, end = row_starts[i], row_starts[i] + row_counts[i]
+                        self._save_sparse(
+                            features_dir.joinpath(sparse_name),
+                            date_index[i],
+                            date_index[i] + length[i] - 1,
+                            positions[start:end],
+                            values[start:end],
+                        )
+                    p_bar.update()
+                    continue
+                if field.lower() in bin_dtypes:
+                    data = np.full(buffer_bounds[-1], np.nan, dtype=np.float64)
+                    data[buffer_positions] = self.csv[field].values[rows]
+                    typed_name = f"{field.lower()}.{self.freq}{self.TYPED_FILE_SUFFIX}"
+                    for i, (features_dir, start, end) in enumerate(zip(bin_dirs, buffer_bounds[:-1], buffer_bounds[1:])):
+                        self._save_typed(
+                            features_dir.joinpath(typed_name), date_index[i], data[start + 1 : end], bin_dtypes[field.lower()]
+                        )
+                    p_bar.update()
+                    continue
+                data = np.full(buffer_bounds[-1], np.nan, dtype="<f")
+                data[buffer_bounds[:-1]] = date_index
+                data[buffer_positions] = self.csv[field].values[rows]
+                bin_name = f"{field.lower()}.{self.freq}{self.DUMP_FILE_SUFFIX}"
+                for features_dir, start, end in zip(bin_dirs, buffer_bounds[:-1], buffer_bounds[1:]):
+                    data[start:end].tofile(str(features_dir.joinpath(bin_name).resolve()))
                 p_bar.update()
-        #_dump_func = partial(self._dump_bin, calendar_list=self._calendars_list)
-        #with tqdm(total=len(self._group_by_symbol)) as p_bar:
-        #    with ProcessPoolExecutor(max_workers=self.works) as executor:
-        #        for _ in executor.map(_dump_func, self._group_by_symbol):
-        #            p_bar.update()
-        logger.info("end of features dump.\n")
+
+    def _get_dtypes(self) -> pd.Series:
+        return self.csv.dtypes.apply(str)
+
+    def _get_field_dtypes(self) -> dict:
+        """
+        dtypes of the dumped fields in the source data, keyed by the lower-case bin name
+        """
+        dtypes=self._get_dtypes()
+        columns=dtypes.index.drop([self.symbol_field_name, self.date_field_name], errors="ignore")
+        return {field.lower(): dtypes[field] for field in self.get_dump_fields(columns) if field in columns}
+
+    def _count_coverage(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        counts of the rows and the non-null values of each dumped field, indexed by the instrument
+        """
+        columns=df.columns.drop([self.symbol_field_name, self.date_field_name], errors="ignore")
+        fields=[field for field in self.get_dump_fields(columns) if field in columns]
+        # count by the raw symbols first, only the distinct symbols are formatted
+        grouped=df.groupby(self.symbol_field_name, sort=False)
+        coverage=grouped[fields].count().rename(columns=str.lower)
+        coverage.insert(0, self.COVERAGE_ROWS_FIELD, grouped.size())
+        coverage.index=self._get_instrument_symbols(coverage.index.to_series()).values
+        return coverage.groupby(level=0).sum()
+
+    def _get_coverage(self) -> pd.DataFrame:
+        return self._count_coverage(self.csv)
+
+    def _dump_coverage(self):
+        logger.info("start dump coverage......")
+        coverage=self._get_coverage().astype("int64")
+        coverage.index.name=self.symbol_field_name
+        coverage.reset_index().to_parquet(self.qlib_dir.joinpath(self.COVERAGE_FILE), index=False)
+        logger.info("end of coverage dump.\n")
+
+    def _get_manifest(self) -> dict:
+        field_dtypes=self._get_field_dtypes()
+        csv=getattr(self, "csv", None)
+        instruments=self._read_instruments(self._instruments_dir.joinpath(self.INSTRUMENTS_FILE_NAME))
+        return dict(
+            freq=self.freq,
+            symbol_fields=list(getattr(self, "symbol_field_tuple", (self.symbol_field_name,))),
+            symbol_field=self.symbol_field_name,
+            date_field=self.date_field_name,
+            fields=sorted(field_dtypes),
+            dtypes=field_dtypes,
+            catagory_fields={},
+            numeric_date_fields=[],
+            sparse_ratio=self.sparse_ratio,
+            sparse_fields=list(self._kwargs.get("sparse_fields", [])),
+            bin_dtypes=dict(self._kwargs.get("bin_dtypes", {})),
+            instrument_count=len(instruments),
+            row_count=int(self._kwargs.get("row_count", 0 if csv is None else len(csv))),
+            calendar=dict(
+                start=self._calendars_list[0].strftime(self.calendar_format) if self._calendars_list else None,
+                end=self._calendars_list[-1].strftime(self.calendar_format) if self._calendars_list else None,
+                length=len(self._calendars_list),
+            ),
+        )
+
+    def _dump_manifest(self):
+        logger.info("start dump manifest......")
+        manifest=self._get_manifest()
+        self.qlib_dir.joinpath(self.MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        logger.info("end of manifest dump.\n")
 
     def dump(self):
-        self._get_all_date()
-        self._dump_calendars()
-        self._dump_instruments()
-        self._dump_features()
+        with self._timer("get all date"):
+            self._get_all_date()
+        with self._timer("dump calendars"):
+            self._dump_calendars()
+        with self._timer("dump instruments"):
+            self._dump_instruments()
+        with self._timer("dump features"):
+            self._dump_features()
+        with self._timer("dump coverage"):
+            self._dump_coverage()
+        with self._timer("dump manifest"):
+            self._dump_manifest()
+        self._report_timings()
         
 class DumpNumericCatagory(DumpNumeric):
     CATAGORY_DIR_NAME='catagories'
     SYMBOL_FILE='symbol_fileds.txt'
     DATE_FILE='date_field.txt'
     CATAGORY_DTYPE_FILE='catagory_dtypes.txt'
+    NUMERIC_DATE_FILE='numeric_date_fields.txt'
     
     def __init__(
         self,
@@ -445,6 +843,12 @@ class DumpNumericCatagory(DumpNumeric):
         exclude_fields: str = "",
         include_fields: str = "",
         limit_nums: int = None,
+        engine: str = "group",
+        binary_catagory: bool = False,
+        numeric_date: bool = False,
+        sparse_ratio: float = 0,
+        float64_fields: str = "",
+        compact_catagory: bool = False,
     ):
         """
         Parameters
@@ -457,8 +861,8 @@ class DumpNumericCatagory(DumpNumeric):
             if backup_dir is not None, backup qlib_dir to backup_dir
         freq: str, default "day"
             transaction frequency
-        max_workers: int, default None
-            number of threads
+        max_workers: int, default 16
+            number of processes to dump features, dump serially if max_workers <= 1 or not on linux
         date_field_name: str, default "date"
             the name of the date field in the csv
         file_suffix: str, default ".csv"
@@ -471,52 +875,61 @@ class DumpNumericCatagory(DumpNumeric):
             fields not dumped
         limit_nums: int
             Use when debugging, default None
+        engine: str, default "group"
+            "group": dump each symbol from its own DataFrame;
+            "bulk": sort the whole frame by symbol once, then write every symbol's bin field by field
+        binary_catagory: bool, default False
+            also save catagories/*.arrow besides catagories/*.txt, which the data loader reads without line splitting
+        numeric_date: bool, default False
+            save datetime fields(e.g. fdate, pdate) as float day offsets from 1970-01-01 instead of catagories,
+            they are listed in numeric_date_fields.txt and loaded as datetime without dictionary by WRDSDataLoader
+        sparse_ratio: float, default 0
+            fields whose ratio of non-null values on the calendar spans of the instruments is below sparse_ratio are
+            saved as sparse bins(*.sbin, read by data.wrds_storage.WRDSFeatureStorage), 0 means all dense
+        float64_fields: str, default ""
+            fields saved as float64 typed bins(*.tbin, read by data.wrds_storage.WRDSFeatureStorage), e.g. large
+            identifiers and monetary amounts, the other fields are float32 bins
+        compact_catagory: bool, default False
+            save the codes of catagory fields as uint8/uint16/uint32 typed bins(*.tbin), by the number of catagories
         """
-        csv_path = Path(csv_path).expanduser()
-        if isinstance(exclude_fields, str):
-            exclude_fields = exclude_fields.split(",")
-        if isinstance(include_fields, str):
-            include_fields = include_fields.split(",")
-        self._exclude_fields = tuple(filter(lambda x: len(x) > 0, map(str.strip, exclude_fields)))
-        self._include_fields = tuple(filter(lambda x: len(x) > 0, map(str.strip, include_fields)))
-        self.file_suffix = file_suffix
-        ## key fields
-        if isinstance(symbol_field_name, str):
-            symbol_field_name = symbol_field_name.split(",")
-        self.symbol_field_tuple = tuple(filter(lambda x: len(x) > 0, map(str.strip, symbol_field_name)))
-        self.date_field_name = date_field_name
+        self.compact_catagory = compact_catagory
+        self.binary_catagory = binary_catagory
+        self.numeric_date = numeric_date
+        super().__init__(
+            csv_path=csv_path,
+            qlib_dir=qlib_dir,
+            backup_dir=backup_dir,
+            freq=freq,
+            max_workers=max_workers,
+            date_field_name=date_field_name,
+            file_suffix=file_suffix,
+            symbol_field_name=symbol_field_name,
+            exclude_fields=exclude_fields,
+            include_fields=include_fields,
+            limit_nums=limit_nums,
+            engine=engine,
+            sparse_ratio=sparse_ratio,
+            float64_fields=float64_fields,
+        )
+        self._catagory_dir=self.qlib_dir.joinpath(self.CATAGORY_DIR_NAME)
+        self._catagories_list=[]
+
+        self.log_symbol_date_filed()
+
+    def _init_fields(self, symbol_field_name, date_field_name, include_fields, exclude_fields, file_suffix):
+        super()._init_fields(symbol_field_name, date_field_name, include_fields, exclude_fields, file_suffix)
+        ## key fields, the symbol field name is known once the frame is read
+        self.symbol_field_tuple = self._split_fields(symbol_field_name)
+        self.symbol_field_name = None
 
-        self.csv=self._read(csv_path)
+    def _load(self, csv_path: Path, limit_nums: int = None):
+        self.csv=self._read(csv_path, self._get_read_columns(csv_path))
         self.symbol_field_name=self._get_symbol_field_name()
         
         if limit_nums is not None:
             seleted_symbols=self.csv[self.symbol_field_name].drop_duplicates()[:limit_nums]
             self.csv=self.csv[self.csv[self.symbol_field_name].isin(seleted_symbols)]
         self._group_by_symbol=self.csv.groupby(self.symbol_field_name, as_index=True)
-
-        self.qlib_dir = Path(qlib_dir).expanduser()
-        self.qlib_dir.mkdir(parents=True, exist_ok=True)
-        self.backup_dir = backup_dir if backup_dir is None else Path(backup_dir).expanduser()
-        if backup_dir is not None:
-            self._backup_qlib_dir(Path(backup_dir).expanduser())
-
-        self.freq = freq
-        self.calendar_format = self.DAILY_FORMAT if self.freq == "day" else self.HIGH_FREQ_FORMAT
-        self.works = max_workers
-        
-
-        self._calendars_dir = self.qlib_dir.joinpath(self.CALENDARS_DIR_NAME)
-        self._features_dir = self.qlib_dir.joinpath(self.FEATURES_DIR_NAME)
-        self._instruments_dir = self.qlib_dir.joinpath(self.INSTRUMENTS_DIR_NAME)
-        self._catagory_dir=self.qlib_dir.joinpath(self.CATAGORY_DIR_NAME)
-
-        self._catagories_list=[]
-        self._calendars_list = []
-
-        self._mode = self.ALL_MODE
-        self._kwargs = {}
-
-        self.log_symbol_date_filed()
     
     def log_symbol_date_filed(self):
         key_list=','.join(self.symbol_field_tuple)
@@ -534,60 +947,731 @@ class DumpNumericCatagory(DumpNumeric):
         else:
             #merge multi cols into one col
             symbol_field_name="_".join(self.symbol_field_tuple)
-            self.csv[symbol_field_name]=""
-            for field in self.symbol_field_tuple:
-                self.csv[symbol_field_name]+= "_"+self.csv[field]
-            self.csv[symbol_field_name]=self.csv[symbol_field_name].apply(lambda x:x[1:])
+            self._merge_symbol_fields(self.csv, symbol_field_name)
             return symbol_field_name
 
+    def _get_key_fields(self) -> tuple:
+        return self.symbol_field_tuple+(self.date_field_name,)
+
+    def _merge_symbol_fields(self, df: pd.DataFrame, symbol_field_name: str):
+        # join the key fields on the unique key combinations only, then take back to rows
+        codes, keys = pd.MultiIndex.from_frame(df[list(self.symbol_field_tuple)]).factorize()
+        keys = keys.to_frame(index=False)
+        symbols = keys.iloc[:, 0].str.cat([keys.iloc[:, i] for i in range(1, keys.shape[1])], sep="_")
+        df[symbol_field_name] = symbols.to_numpy()[codes]
+
+    def _get_catagory_fields(self):
+        catagory_fields=self._get_dtypes()
+        catagory_fields=catagory_fields[~catagory_fields.isin(numeric_types)]
+        catagory_fields=catagory_fields[~catagory_fields.index.isin([self.symbol_field_name, self.date_field_name])]
+        if self.numeric_date:
+            catagory_fields=catagory_fields[catagory_fields!='datetime64[ns]']
+        return catagory_fields.index
+
+    def _get_numeric_date_fields(self) -> pd.Index:
+        if not self.numeric_date:
+            return pd.Index([])
+        # kept after the fields are converted to day offsets
+        if 'numeric_date_fields' not in self._kwargs:
+            dtypes=self._get_dtypes()
+            dtypes=dtypes[dtypes=='datetime64[ns]']
+            self._kwargs['numeric_date_fields']=dtypes.index[~dtypes.index.isin([self.symbol_field_name, self.date_field_name])]
+        return self._kwargs['numeric_date_fields']
+
+    def _convert_numeric_dates(self, df: pd.DataFrame):
+        # day offsets from 1970-01-01, NaT is nan
+        for col in self._get_numeric_date_fields():
+            if col in df.columns:
+                df[col]=(df[col]-pd.Timestamp(0))/pd.Timedelta(days=1)
+
+    def _get_manifest(self) -> dict:
+        manifest=super()._get_manifest()
+        catagory_dtypes=dict(line.split(self.CATAGORIES_SEP) for line in self._kwargs['all_catagory_dtypes'])
+        numeric_date_fields=list(self._get_numeric_date_fields())
+        # the catagory fields are codes and the numeric date fields are day offsets in the bins by now
+        for field, dtype in list(catagory_dtypes.items())+[(field, 'datetime64[ns]') for field in numeric_date_fields]:
+            if field.lower() in manifest['dtypes']:
+                manifest['dtypes'][field.lower()]=dtype
+        manifest['catagory_fields']={field.lower(): dtype for field, dtype in catagory_dtypes.items() if field.lower() in manifest['dtypes']}
+        manifest['numeric_date_fields']=[field.lower() for field in numeric_date_fields]
+        return manifest
+
+    @staticmethod
+    def _get_code_dtype(catagory_num: int) -> str:
+        # the max value of the dtype is kept for nulls
+        for dtype in ("<u1", "<u2", "<u4"):
+            if catagory_num < np.iinfo(dtype).max:
+                return dtype
+        return "<f8"
+
+    def _select_bin_dtypes(self) -> dict:
+        bin_dtypes=super()._select_bin_dtypes()
+        if self.compact_catagory:
+            sparse_fields=self._get_sparse_fields()
+            for col, cat_list in self._kwargs['all_catagory'].items():
+                if col.lower() not in sparse_fields:
+                    bin_dtypes[col.lower()]=self._get_code_dtype(len(cat_list))
+        return bin_dtypes
+
     def _get_all_catagory(self):
         logger.info("start get all catagory......")
         all_catagory={}
         all_catagory_types=[]
+        catagory_codes={}
         for col in self._get_catagory_fields():
             series=self.csv[col]
             _type_fileds=[col,str(series.dtype)]
             all_catagory_types.append(f"{self.CATAGORIES_SEP.join(_type_fileds)}")
-            if series.dtype == 'datetime64[ns]':
-                all_catagory[col]=sorted(map(pd.Timestamp,self.csv[col].drop_duplicates()))
-            elif series.dtype=='object':
-                all_catagory[col]=sorted(map(str,self.csv[col].drop_duplicates()))
-            else:
-                raise NotImplementedError('Not support for this type')
+            all_catagory[col], catagory_codes[col]=self._encode_catagory(series)
 
         self._kwargs['all_catagory']=all_catagory
         self._kwargs['all_catagory_dtypes']=all_catagory_types
+        self._kwargs['catagory_codes']=catagory_codes
         logger.info("end of get all catagory.\n")
+
+    @staticmethod
+    def _encode_catagory(series: pd.Series):
+        """
+        hash based factorization, the codes follow the sorted catagories as catagories/*.txt, nulls are nan
+
+        Returns
+        -------
+        (catagory list, float64 codes of each row)
+        """
+        codes, uniques = pd.factorize(series)
+        dtype = str(series.dtype)
+        if dtype == 'datetime64[ns]':
+            uniques = pd.DatetimeIndex(uniques)
+            order = np.argsort(uniques.asi8, kind="stable")
+        elif dtype == 'object':
+            uniques = np.asarray(uniques).astype(str)
+            order = np.argsort(uniques, kind="stable")
+        else:
+            raise NotImplementedError('Not support for this type')
+        rank = np.empty(len(order) + 1, dtype="float64")
+        rank[order] = np.arange(len(order))
+        # codes of nulls are -1
+        rank[-1] = np.nan
+        return list(uniques[order]), rank[codes]
+
+    @staticmethod
+    def _sort_catagory(values: Iterable, dtype: str) -> list:
+        if dtype == 'datetime64[ns]':
+            return sorted(map(pd.Timestamp,values))
+        elif dtype=='object':
+            return sorted(map(str,values))
+        else:
+            raise NotImplementedError('Not support for this type')
     
     def _dump_catagories(self):
         logger.info("start dump catagories......")
         self._catagory_dir.mkdir(parents=True, exist_ok=True)
+        all_catagory_dtypes = dict(line.split(self.CATAGORIES_SEP) for line in self._kwargs['all_catagory_dtypes'])
         for cat, cat_list in self._kwargs['all_catagory'].items():
             cat_path = str(self._catagory_dir.joinpath(f"{cat}.{self.freq}.txt").expanduser().resolve())
-            np.savetxt(cat_path, cat_list, fmt="%s", encoding="utf-8")
+            self._save_lines(cat_path, map(str, cat_list))
+            binary_path = self._catagory_dir.joinpath(f"{cat}.{self.freq}.arrow")
+            # keep an existing binary catagory in sync, e.g. in dump_update
+            if self.binary_catagory or binary_path.exists():
+                self._save_binary_catagory(binary_path, cat_list, all_catagory_dtypes[cat])
         cat_dtype_paths=str(self.qlib_dir.joinpath(self.CATAGORY_DTYPE_FILE).expanduser().resolve())
         np.savetxt(cat_dtype_paths, self._kwargs['all_catagory_dtypes'], fmt="%s", encoding="utf-8")
+        if self.numeric_date:
+            self._save_lines(self.qlib_dir.joinpath(self.NUMERIC_DATE_FILE), self._get_numeric_date_fields())
         logger.info("end of catagories dump.\n")
         
+    @staticmethod
+    def _save_binary_catagory(path: Path, values: list, dtype: str):
+        if dtype == 'datetime64[ns]':
+            array = pa.array(pd.DatetimeIndex(values))
+        else:
+            array = pa.array(list(map(str, values)), type=pa.string())
+        feather.write_feather(pa.table({"value": array}), str(path), compression="uncompressed")
+
     def _convert_catagory_features(self):
         logger.info("start convert catagories to index......")
+        for col, codes in self._kwargs.pop('catagory_codes').items():
+            self.csv[col]=codes
+        self._convert_numeric_dates(self.csv)
+        logger.info("end of conversion catagories to index.\n")
+
+    def _catagory_to_index(self, df: pd.DataFrame):
         for col, col_list in self._kwargs['all_catagory'].items():
-            cat2index=dict(zip(col_list,range(len(col_list))))
-            self.csv[col]=self.csv[col].map(cat2index)
+            if str(df[col].dtype) == 'datetime64[ns]':
+                codes=pd.DatetimeIndex(col_list).get_indexer(df[col])
+            else:
+                codes=pd.Index(col_list, dtype=object).get_indexer(df[col].astype(str))
+            df[col]=np.where((codes < 0) | df[col].isna().to_numpy(), np.nan, codes)
+
+    def dump(self):
+        with self._timer("get all date"):
+            self._get_all_date()
+        with self._timer("get all catagory"):
+            self._get_all_catagory()
+        with self._timer("convert catagory features"):
+            self._convert_catagory_features()
+        with self._timer("dump calendars"):
+            self._dump_calendars()
+        with self._timer("dump catagories"):
+            self._dump_catagories()
+        with self._timer("dump instruments"):
+            self._dump_instruments()
+        with self._timer("dump features"):
+            self._dump_features()
+        with self._timer("dump coverage"):
+            self._dump_coverage()
+        with self._timer("dump manifest"):
+            self._dump_manifest()
+        self._report_timings()
+
+class DumpNumericCatagoryStream(DumpNumericCatagory):
+    SPILL_DIR_NAME='.spill'
+    SAMPLE_ROWS=10000
+    # peak memory of a working frame relative to its deep memory usage(groupby, reindex copies...)
+    MEMORY_FACTOR=4
+
+    def __init__(
+        self,
+        csv_path: str,
+        qlib_dir: str,
+        file_suffix: str = ".parquet",
+        max_memory: float = 16,
+        **kwargs,
+    ):
+        """
+        Out-of-core version of DumpNumericCatagory, the parquet file is never loaded as a whole.
+
+        The first pass iterates the parquet by batches and collects calendars, instrument ranges and catagories,
+        the second pass converts catagories to index and spills the rows into buckets partitioned by symbol,
+        then each bucket is loaded and dumped independently.
+
+        Parameters
+        ----------
+        csv_path: str
+            stock data path, only parquet is supported
+        qlib_dir: str
+            qlib(dump) data director
+        file_suffix: str, default ".parquet"
+            file suffix
+        max_memory: float, default 16
+            memory ceiling(GB) of the working frames, used to decide the batch size and the number of buckets
+        kwargs:
+            the other parameters of DumpNumericCatagory
+        """
+        self._max_memory = max_memory
+        super().__init__(csv_path=csv_path, qlib_dir=qlib_dir, file_suffix=file_suffix, **kwargs)
+        self._spill_dir=self.qlib_dir.joinpath(self.SPILL_DIR_NAME)
+
+    def _load(self, csv_path: Path, limit_nums: int = None):
+        # only the schema is read here, the rows are read by batches when dumping
+        if not str(csv_path).endswith('parquet'):
+            raise NotImplementedError('only support parquet file in stream mode!')
+        self._parquet=pq.ParquetFile(csv_path)
+        self._columns=self._get_read_columns(csv_path)
+        self._dtypes=self._parquet.schema_arrow.empty_table().to_pandas().dtypes.apply(str)
+        if self._columns is not None:
+            self._dtypes=self._dtypes[self._columns]
+        self.symbol_field_name=self._get_symbol_field_name()
+        self._limit_nums=limit_nums
+        self._selected_symbols=None
+        self._plan_batches(self._max_memory)
+
+    def _get_symbol_field_name(self):
+        if len(self.symbol_field_tuple)==0:
+            raise ValueError("symbol field name must be specified! ")
+        elif len(self.symbol_field_tuple)==1:
+            return self.symbol_field_tuple[0]
+        else:
+            # the merged col is built batch by batch in self._iter_batches
+            return "_".join(self.symbol_field_tuple)
+
+    def _get_dtypes(self) -> pd.Series:
+        return self._dtypes
+
+    def _get_notna_counts(self) -> pd.Series:
+        return self._kwargs["notna_counts"]
+
+    def _get_coverage(self) -> pd.DataFrame:
+        return self._kwargs["coverage"]
+
+    def _plan_batches(self, max_memory: float):
+        num_rows=self._parquet.metadata.num_rows
+        sample=next(self._parquet.iter_batches(batch_size=self.SAMPLE_ROWS, columns=self._columns), None)
+        if sample is None or num_rows==0:
+            raise ValueError("parquet file is empty!")
+        sample=sample.to_pandas()
+        row_bytes=sample.memory_usage(deep=True, index=False).sum()/len(sample)*self.MEMORY_FACTOR
+        budget=max_memory*1024**3
+        self._batch_size=max(int(budget/row_bytes), 1)
+        self._bucket_num=max(int(np.ceil(num_rows*row_bytes/budget)), 1)
+        logger.info(f"{num_rows} rows, {row_bytes/self.MEMORY_FACTOR:.0f} bytes per row, "
+                    f"batch size {self._batch_size}, {self._bucket_num} buckets.\n")
+
+    def _iter_batches(self, columns: list=None):
+        columns=self._columns if columns is None else columns
+        with tqdm(total=self._parquet.metadata.num_rows) as p_bar:
+            for batch in self._parquet.iter_batches(batch_size=self._batch_size, columns=columns):
+                df=batch.to_pandas()
+                p_bar.update(len(df))
+                if len(self.symbol_field_tuple)>1:
+                    self._merge_symbol_fields(df, self.symbol_field_name)
+                if self._selected_symbols is not None:
+                    df=df[df[self.symbol_field_name].isin(self._selected_symbols)]
+                if not df.empty:
+                    yield df
+
+    def _select_symbols(self):
+        if self._limit_nums is None:
+            return
+        logger.info("start select symbols......")
+        selected_symbols={}
+        for df in self._iter_batches(columns=list(self.symbol_field_tuple)):
+            for symbol in df[self.symbol_field_name].drop_duplicates():
+                selected_symbols.setdefault(symbol, None)
+            if len(selected_symbols)>=self._limit_nums:
+                break
+        self._selected_symbols=list(selected_symbols)[:self._limit_nums]
+        logger.info("end of select symbols.\n")
+
+    @staticmethod
+    def _merge_unique(uniques: pa.Array, values: pd.Series) -> pa.Array:
+        """
+        merge the distinct non-null values of a batch into a compact arrow array, instead of a set of python objects
+        growing with the distinct values, the objects are str like catagories/*.txt
+        """
+        values = values.dropna().unique()
+        if values.dtype == object:
+            values = values.astype(str)
+        values = pa.array(values)
+        if uniques is None:
+            return values
+        return pc.unique(pa.concat_arrays([uniques, values]))
+
+    def _scan(self):
+        logger.info("start scan date and catagory......")
+        all_datetime = np.array([], dtype="datetime64[ns]")
+        begin_end_list = []
+        coverage_list = []
+        catagory_values = {col:None for col in self._get_catagory_fields()}
+        self._kwargs["row_count"] = 0
+        columns=self._dtypes.index.drop([self.symbol_field_name, self.date_field_name], errors="ignore")
+        fields=[field for field in self.get_dump_fields(columns) if field in columns]
+        notna_counts = pd.Series(0, index=fields)
+        for df in self._iter_batches():
+            self._kwargs["row_count"] += len(df)
+            notna_counts += df[fields].notna().sum()
+            all_datetime = np.union1d(all_datetime, df[self.date_field_name].unique())
+            begin_end_list.append(df.groupby(self.symbol_field_name)[self.date_field_name].agg(['min','max']))
+            coverage_list.append(self._count_coverage(df))
+            for col, values in catagory_values.items():
+                catagory_values[col] = self._merge_unique(values, df[col])
+        _begin_end=pd.concat(begin_end_list).groupby(level=0).agg({'min':'min','max':'max'})
+        _begin_end=_begin_end.rename(columns=dict(min='begin', max='end')).reset_index()
+        self._kwargs["all_datetime_set"] = all_datetime
+        self._kwargs["date_range_list"] = self._get_date_range_list(_begin_end)
+        self._kwargs["notna_counts"] = notna_counts
+        self._kwargs["coverage"] = pd.concat(coverage_list).groupby(level=0).sum()
+
+        all_catagory={}
+        all_catagory_types=[]
+        for col, values in catagory_values.items():
+            _type_fileds=[col,self._dtypes[col]]
+            all_catagory_types.append(f"{self.CATAGORIES_SEP.join(_type_fileds)}")
+            values=[] if values is None else values.to_numpy(zero_copy_only=False)
+            all_catagory[col]=self._sort_catagory(values, self._dtypes[col])
+        self._kwargs['all_catagory']=all_catagory
+        self._kwargs['all_catagory_dtypes']=all_catagory_types
+        logger.info("end of scan date and catagory.\n")
+
+    def _spill(self):
+        logger.info("start spill buckets......")
+        shutil.rmtree(self._spill_dir, ignore_errors=True)
+        self._spill_dir.mkdir(parents=True)
+        writers={}
+        try:
+            for df in self._iter_batches():
+                self._catagory_to_index(df)
+                for col in self._kwargs['all_catagory']:
+                    df[col]=df[col].astype('float64')
+                self._convert_numeric_dates(df)
+                buckets=pd.util.hash_array(df[self.symbol_field_name].to_numpy(dtype=object))%self._bucket_num
+                for bucket, bucket_df in df.groupby(buckets):
+                    table=pa.Table.from_pandas(bucket_df, preserve_index=False)
+                    if bucket not in writers:
+                        bucket_path=self._spill_dir.joinpath(f"{bucket}.parquet")
+                        writers[bucket]=pq.ParquetWriter(bucket_path, table.schema)
+                    writers[bucket].write_table(table)
+        finally:
+            for writer in writers.values():
+                writer.close()
+        logger.info("end of spill buckets.\n")
+
+    def _dump_features(self):
+        logger.info("start dump features......")
+        bucket_paths=sorted(self._spill_dir.glob("*.parquet"))
+        for i, bucket_path in enumerate(bucket_paths):
+            logger.info(f"dump bucket {i+1}/{len(bucket_paths)}")
+            self.csv=pd.read_parquet(bucket_path)
+            self._group_by_symbol=self.csv.groupby(self.symbol_field_name)
+            super()._dump_features()
+            self.csv=None
+            self._group_by_symbol=None
+        shutil.rmtree(self._spill_dir, ignore_errors=True)
+        logger.info("end of features dump.\n")
+
+    def dump(self):
+        with self._timer("select symbols"):
+            self._select_symbols()
+        with self._timer("scan"):
+            self._scan()
+        with self._timer("dump calendars"):
+            self._dump_calendars()
+        with self._timer("dump catagories"):
+            self._dump_catagories()
+        with self._timer("dump instruments"):
+            self._dump_instruments()
+        with self._timer("spill"):
+            self._spill()
+        with self._timer("dump features"):
+            self._dump_features()
+        with self._timer("dump coverage"):
+            self._dump_coverage()
+        with self._timer("dump manifest"):
+            self._dump_manifest()
+        self._report_timings()
+
+class DumpNumericCatagoryUpdate(DumpNumericCatagory):
+    # the dumps before nulls were stored as nan wrote them as catagories
+    LEGACY_NULL_CATAGORIES=("None", "nan", "NaT")
+    # read from the manifest of the dumped dataset, not from the arguments
+    DUMPED_OPTIONS=("sparse_ratio", "float64_fields", "compact_catagory", "numeric_date")
+
+    def __init__(
+        self,
+        csv_path: str,
+        qlib_dir: str,
+        date_field_name: str = "date",
+        symbol_field_name: str = "symbol",
+        **kwargs,
+    ):
+        """
+        Append a new parquet delta to a qlib_dir dumped by DumpNumericCatagory.
+
+        Calendars and instruments/all.txt are extended, new values are appended to catagories/*.txt so the
+        existing codes stay valid, and the bins of existing symbols are appended. History can not be rewritten:
+        rows not later than the symbol's end_datetime, and rows inside the old calendar range but not on the old
+        calendar, are dropped with a warning; use a full dump for them.
+
+        Parameters
+        ----------
+        csv_path: str
+            delta data path
+        qlib_dir: str
+            qlib(dump) data director to be updated
+        date_field_name: str, default "date"
+            the name of the date field in the csv, must be the same as the dumped one
+        symbol_field_name: str, default "symbol"
+            symbol field name, must be the same as the dumped one
+        kwargs:
+            the other parameters of DumpNumericCatagory, the storage options(sparse_ratio, float64_fields,
+            compact_catagory, numeric_date) of the dumped dataset are kept and ignored here
+        """
+        qlib_dir = Path(qlib_dir).expanduser()
+        if isinstance(symbol_field_name, (list, tuple)):
+            symbol_field_name = ",".join(symbol_field_name)
+        for file_name, value in [(self.SYMBOL_FILE, symbol_field_name), (self.DATE_FILE, date_field_name)]:
+            dumped_value = qlib_dir.joinpath(file_name).read_text(encoding="utf-8").strip()
+            if dumped_value != ",".join(map(str.strip, value.split(","))):
+                raise ValueError(f"{value} is different from {dumped_value} in {qlib_dir.joinpath(file_name)}")
+        ignored = [option for option in self.DUMPED_OPTIONS if kwargs.pop(option, None)]
+        if ignored:
+            logger.warning(f"{ignored} are kept from the dumped dataset in update mode, ignored")
+        super().__init__(
+            csv_path=csv_path,
+            qlib_dir=qlib_dir,
+            date_field_name=date_field_name,
+            symbol_field_name=symbol_field_name,
+            **kwargs,
+        )
+        self._mode = self.UPDATE_MODE
+        # keep the storage of datetime fields of the dumped dataset
+        self.numeric_date = self.qlib_dir.joinpath(self.NUMERIC_DATE_FILE).exists()
+        self._old_calendars_list = self._read_calendars(self._calendars_dir.joinpath(f"{self.freq}.txt"))
+        self._old_instruments = self._read_instruments(
+            self._instruments_dir.joinpath(self.INSTRUMENTS_FILE_NAME)
+        ).set_index(self.symbol_field_name)
+
+    def _filter_delta(self):
+        logger.info("start filter delta......")
+        dates = self.csv[self.date_field_name]
+        old_last = self._old_calendars_list[-1]
+        on_calendar = (dates > old_last) | dates.isin(self._old_calendars_list)
+        old_end = pd.to_datetime(
+            self._get_instrument_symbols(self.csv[self.symbol_field_name]).map(
+                self._old_instruments[self.INSTRUMENTS_END_FIELD]
+            )
+        )
+        after_end = old_end.isna() | (dates > old_end)
+        keep = on_calendar & after_end
+        if (~keep).any():
+            logger.warning(
+                f"drop {(~after_end).sum()} rows not later than the dumped end_datetime, "
+                f"{(after_end & ~on_calendar).sum()} rows not on the dumped calendar"
+            )
+        self.csv = self.csv[keep.to_numpy()]
+        self._group_by_symbol = self.csv.groupby(self.symbol_field_name)
+        logger.info("end of filter delta.\n")
+
+    def _get_all_date(self):
+        logger.info("start get all date......")
+        _begin_end = self.csv.groupby(self.symbol_field_name)[self.date_field_name].agg(['min', 'max'])
+        _begin_end.index = self._get_instrument_symbols(_begin_end.index.to_series())
+        new_symbols = _begin_end.index.difference(self._old_instruments.index)
+        instruments = self._old_instruments.reindex(self._old_instruments.index.union(new_symbols))
+        _begin = _begin_end['min'].dt.strftime(self.calendar_format)
+        _end = _begin_end['max'].dt.strftime(self.calendar_format)
+        instruments.loc[_end.index, self.INSTRUMENTS_END_FIELD] = _end
+        instruments.loc[new_symbols, self.INSTRUMENTS_START_FIELD] = _begin[new_symbols]
+        logger.info(f"{len(_begin_end) - len(new_symbols)} symbols updated, {len(new_symbols)} new symbols")
+
+        new_dates = pd.DatetimeIndex(self.csv[self.date_field_name].unique())
+        new_dates = new_dates[new_dates > self._old_calendars_list[-1]].sort_values()
+        self._kwargs["all_datetime_set"] = pd.DatetimeIndex(self._old_calendars_list).append(new_dates)
+        self._kwargs["date_range_list"] = (
+            instruments.index
+            + self.INSTRUMENTS_SEP
+            + instruments[self.INSTRUMENTS_START_FIELD]
+            + self.INSTRUMENTS_SEP
+            + instruments[self.INSTRUMENTS_END_FIELD]
+        ).tolist()
+        logger.info("end of get all date.\n")
+
+    def _read_catagory(self, col: str, dtype: str) -> list:
+        cat_path = self._catagory_dir.joinpath(f"{col}.{self.freq}.txt")
+        if not cat_path.exists():
+            return []
+        lines = cat_path.read_text(encoding="utf-8").splitlines()
+        if dtype == 'datetime64[ns]':
+            return pd.to_datetime(lines).tolist()
+        return lines
+
+    def _check_legacy_nulls(self, col: str, old_list: list, dtype: str):
+        """
+        the codes of the legacy null lines decode to the strings "None"/"nan"(or NaT), while the appended nulls are
+        nan, so the mixed codes of a field would decode differently, a full dump is required
+        """
+        if dtype == 'datetime64[ns]':
+            legacy = any(pd.isna(value) for value in old_list)
+        else:
+            legacy = any(value in self.LEGACY_NULL_CATAGORIES for value in old_list)
+        if legacy:
+            raise ValueError(
+                f"{self._catagory_dir.joinpath(f'{col}.{self.freq}.txt')} has null catagories written by an older "
+                f"version of dump_single.py, re-dump {self.qlib_dir} with dump_all or dump_stream"
+            )
+
+    def _get_all_catagory(self):
+        logger.info("start extend all catagory......")
+        dtypes_path = self.qlib_dir.joinpath(self.CATAGORY_DTYPE_FILE)
+        all_catagory_dtypes = dict(
+            line.split(self.CATAGORIES_SEP) for line in dtypes_path.read_text(encoding="utf-8").splitlines()
+        )
+        all_catagory = {}
+        for col in self._get_catagory_fields():
+            dtype = str(self.csv[col].dtype)
+            if all_catagory_dtypes.setdefault(col, dtype) != dtype:
+                raise ValueError(f"dtype of {col} is {dtype}, but {all_catagory_dtypes[col]} is dumped")
+            old_list = self._read_catagory(col, dtype)
+            self._check_legacy_nulls(col, old_list, dtype)
+            # append only, the dumped codes stay valid
+            values = self.csv[col].dropna().unique()
+            index = pd.DatetimeIndex(old_list) if dtype == 'datetime64[ns]' else pd.Index(old_list, dtype=object)
+            if dtype == 'object':
+                values = values.astype(str)
+            new_values = values[index.get_indexer(values) < 0]
+            all_catagory[col] = old_list + self._sort_catagory(new_values, dtype)
+            if len(new_values):
+                logger.info(f"{len(new_values)} new catagories of {col}")
+        self._kwargs['all_catagory'] = all_catagory
+        self._kwargs['all_catagory_dtypes'] = [
+            f"{self.CATAGORIES_SEP.join(_type_fileds)}" for _type_fileds in all_catagory_dtypes.items()
+        ]
+        logger.info("end of extend all catagory.\n")
+
+    def _get_manifest(self) -> dict:
+        manifest=super()._get_manifest()
+        manifest_path=self.qlib_dir.joinpath(self.MANIFEST_FILE)
+        if not manifest_path.exists():
+            return manifest
+        # merge with the manifest of the dumped dataset
+        old_manifest=json.loads(manifest_path.read_text(encoding="utf-8"))
+        for key in ("dtypes", "catagory_fields"):
+            manifest[key]={**old_manifest.get(key, {}), **manifest[key]}
+        manifest["fields"]=sorted(manifest["dtypes"])
+        manifest["numeric_date_fields"]=sorted(set(old_manifest.get("numeric_date_fields", []))|set(manifest["numeric_date_fields"]))
+        manifest["row_count"]+=old_manifest.get("row_count", 0)
+        manifest["sparse_ratio"]=old_manifest.get("sparse_ratio", 0)
+        return manifest
+
+    def _get_coverage(self) -> pd.DataFrame:
+        coverage=super()._get_coverage()
+        coverage_path=self.qlib_dir.joinpath(self.COVERAGE_FILE)
+        if not coverage_path.exists():
+            return coverage
+        # add the counts of the delta to the dumped ones
+        old_coverage=pd.read_parquet(coverage_path).set_index(self.symbol_field_name)
+        return old_coverage.add(coverage, fill_value=0).fillna(0)
+
+    def _select_bin_dtypes(self) -> dict:
+        # keep the dtypes of the dumped bins, widen the codes when the catagories outgrow them
+        manifest_path=self.qlib_dir.joinpath(self.MANIFEST_FILE)
+        if not manifest_path.exists():
+            return {}
+        bin_dtypes=json.loads(manifest_path.read_text(encoding="utf-8")).get("bin_dtypes", {})
+        for col, cat_list in self._kwargs['all_catagory'].items():
+            dtype=bin_dtypes.get(col.lower())
+            if dtype is not None and np.dtype(dtype).kind == "u":
+                code_dtype=self._get_code_dtype(len(cat_list))
+                if np.dtype(code_dtype).itemsize > np.dtype(dtype).itemsize:
+                    bin_dtypes[col.lower()]=code_dtype
+        return bin_dtypes
+
+    def _select_sparse_fields(self) -> list:
+        # keep the format of the dumped bins, new fields are dense
+        manifest_path=self.qlib_dir.joinpath(self.MANIFEST_FILE)
+        if not manifest_path.exists():
+            return []
+        return json.loads(manifest_path.read_text(encoding="utf-8")).get("sparse_fields", [])
+
+    def _convert_catagory_features(self):
+        logger.info("start convert catagories to index......")
+        self._catagory_to_index(self.csv)
+        self._convert_numeric_dates(self.csv)
         logger.info("end of conversion catagories to index.\n")
 
+    def _data_to_bin(self, df: pd.DataFrame, calendar_list: List[pd.Timestamp], features_dir: Path):
+        if df.empty:
+            logger.warning(f"{features_dir.name} data is None or empty")
+            return
+        date_index, length, positions, mask = self.align_calendar(df[self.date_field_name], calendar_list)
+        positions = positions + date_index
+        columns = df.columns.drop(self.date_field_name)
+        sparse_fields = self._kwargs.get("sparse_fields", ())
+        bin_dtypes = self._kwargs.get("bin_dtypes", {})
+        for field in self.get_dump_fields(columns):
+            bin_path = features_dir.joinpath(f"{field.lower()}.{self.freq}{self.DUMP_FILE_SUFFIX}")
+            if field not in columns:
+                continue
+            if field.lower() in sparse_fields:
+                self._update_sparse(
+                    features_dir.joinpath(f"{field.lower()}.{self.freq}{self.SPARSE_FILE_SUFFIX}"),
+                    date_index,
+                    positions[mask],
+                    df[field].values[mask],
+                )
+                continue
+            if field.lower() in bin_dtypes:
+                self._update_typed(
+                    features_dir.joinpath(f"{field.lower()}.{self.freq}{self.TYPED_FILE_SUFFIX}"),
+                    date_index,
+                    positions[mask],
+                    df[field].values[mask],
+                    bin_dtypes[field.lower()],
+                )
+                continue
+            if bin_path.exists():
+                # the bin of an existing symbol: [start_index, values...], append from the day after its end
+                start = int(np.fromfile(str(bin_path.resolve()), dtype="<f", count=1)[0])
+                start += bin_path.stat().st_size // 4 - 1
+            else:
+                start = date_index
+            rows = mask & (positions >= start)
+            if not rows.any():
+                continue
+            data = np.full(positions[rows].max() - start + 1, np.nan, dtype="<f")
+            data[positions[rows] - start] = df[field].values[rows]
+            if bin_path.exists():
+                with bin_path.open("ab") as fp:
+                    data.tofile(fp)
+            else:
+                np.hstack([start, data]).astype("<f").tofile(str(bin_path.resolve()))
+
+    def _update_typed(self, typed_path: Path, date_index: int, positions: np.ndarray, values: np.ndarray, dtype: str):
+        if len(positions) == 0:
+            return
+        if not typed_path.exists():
+            data = np.full(positions.max() - date_index + 1, np.nan, dtype=np.float64)
+            data[positions - date_index] = values
+            self._save_typed(typed_path, date_index, data, dtype)
+            return
+        start, old_data = self._read_typed(typed_path)
+        # append from the day after its end
+        end = start + len(old_data) - 1
+        rows = positions > end
+        if not rows.any() and old_data.dtype == np.dtype(dtype):
+            return
+        data = np.full(positions[rows].max() - end if rows.any() else 0, np.nan, dtype=np.float64)
+        data[positions[rows] - end - 1] = values[rows]
+        if old_data.dtype == np.dtype(dtype):
+            with typed_path.open("ab") as fp:
+                self._to_typed(data, dtype).tofile(fp)
+        else:
+            # the codes outgrew the dtype of the bin, rewrite it with the wider one
+            self._save_typed(typed_path, start, np.concatenate([self._from_typed(old_data), data]), dtype)
+
+    def _update_sparse(self, sparse_path: Path, date_index: int, positions: np.ndarray, values: np.ndarray):
+        if len(positions) == 0:
+            return
+        if not sparse_path.exists():
+            self._save_sparse(sparse_path, date_index, positions.max(), positions, values)
+            return
+        # the header holds end_index, so the sparse bin is rewritten instead of appended
+        start, end, old_positions, old_values = self._read_sparse(sparse_path)
+        rows = positions > end
+        if not rows.any():
+            return
+        self._save_sparse(
+            sparse_path,
+            start,
+            positions[rows].max(),
+            np.concatenate([old_positions, positions[rows]]),
+            np.concatenate([old_values, values[rows]]),
+        )
+
+    def _dump_features(self):
+        if self.engine == self.BULK_ENGINE:
+            logger.warning("bulk engine does not support update, use group engine")
+            self.engine = self.GROUP_ENGINE
+        super()._dump_features()
+
     def dump(self):
-        self._get_all_date()
-        self._get_all_catagory()
-        self._convert_catagory_features()
-        self._dump_calendars()
-        self._dump_catagories()
-        self._dump_instruments()
-        self._dump_features()
+        with self._timer("filter delta"):
+            self._filter_delta()
+        with self._timer("get all date"):
+            self._get_all_date()
+        with self._timer("extend all catagory"):
+            self._get_all_catagory()
+        with self._timer("convert catagory features"):
+            self._convert_catagory_features()
+        with self._timer("dump calendars"):
+            self._dump_calendars()
+        with self._timer("dump catagories"):
+            self._dump_catagories()
+        with self._timer("dump instruments"):
+            self._dump_instruments()
+        with self._timer("dump features"):
+            self._dump_features()
+        with self._timer("dump coverage"):
+            self._dump_coverage()
+        with self._timer("dump manifest"):
+            self._dump_manifest()
+        self._report_timings()
 
 if __name__ == "__main__":
     fire.Fire({
         "dump_numeric":DumpNumeric,
         "dump_all":DumpNumericCatagory,
-        "dump_numeric_catagory":DumpNumericCatagory
+        "dump_numeric_catagory":DumpNumericCatagory,
+        "dump_stream":DumpNumericCatagoryStream,
+        "dump_update":DumpNumericCatagoryUpdate,
     })
\ No newline at end of file
@@ -0,0 +1,251 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import re
+import json
+import shutil
+from pathlib import Path
+
+import fire
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+from tqdm import tqdm
+from loguru import logger
+
+from dump_single import DumpNumericCatagoryStream
+
+
+class FusePIT:
+    FUSE_DIR_NAME = ".fuse"
+    FUSED_FILE_NAME = "fused.parquet"
+    AVAILABLE_FIELD = "_available_date"
+
+    def __init__(
+        self,
+        price_path: str,
+        fund_path: str,
+        qlib_dir: str,
+        join_field_name: str = "gvkey",
+        price_symbol_field_name: str = "gvkey,iid",
+        price_date_field_name: str = "datadate",
+        fund_date_field_name: str = "datadate",
+        available_field_name: str = "fdate,pdate",
+        fill_lag_days: int = None,
+        fund_query: str = None,
+        fund_include_fields: str = "",
+        fund_exclude_fields: str = "",
+        fund_prefix: str = "fund_",
+        batch_size: int = 1000000,
+        **dump_kwargs,
+    ):
+        """
+        Point-in-time fusion of fundamentals onto the price calendar, then dump the fused data as one qlib dataset.
+
+        Every price row gets the fundamentals of the latest fiscal period which is available on its date, the
+        availability of a fundamental row is the first non-null date of available_field_name(e.g. the final or
+        preliminary filing date), so that the fused features have no look-ahead. Restatements made available later
+        for an older period than the latest available one are dropped.
+
+        The fundamentals are held in memory, the price data is as-of joined batch by batch and spilled into one
+        parquet, which is dumped by DumpNumericCatagoryStream.
+
+        Parameters
+        ----------
+        price_path: str
+            price data path(parquet), e.g. comp/secm, g_secd
+        fund_path: str
+            fundamental data path(parquet), e.g. comp/funda, g_funda
+        qlib_dir: str
+            qlib(dump) data director of the fused dataset
+        join_field_name: str, default "gvkey"
+            fields relating the price and fundamental rows, split by ","
+        price_symbol_field_name: str, default "gvkey,iid"
+            symbol fields of the fused dataset, split by ","
+        price_date_field_name: str, default "datadate"
+            date field of the price data, the calendar of the fused dataset
+        fund_date_field_name: str, default "datadate"
+            fiscal period end of the fundamental data
+        available_field_name: str, default "fdate,pdate"
+            date fields when the fundamental row becomes available, the first non-null one is used, split by ","
+        fill_lag_days: int, default None
+            rows without any available date are available fill_lag_days after the fiscal period end, dropped if None
+        fund_query: str, default None
+            DataFrame.query applied on the fundamental data, e.g. "indfmt=='INDL' & datafmt=='STD' & consol=='C'"
+        fund_include_fields: str
+            fundamental fields fused
+        fund_exclude_fields: str
+            fundamental fields not fused
+        fund_prefix: str, default "fund_"
+            prefix of the fundamental fields which also exist in the price data, including the fiscal period end
+        batch_size: int, default 1000000
+            number of price rows joined at once
+        dump_kwargs:
+            passed to DumpNumericCatagoryStream, e.g. max_workers, numeric_date, sparse_ratio, max_memory
+        """
+        self.price_path = Path(price_path).expanduser()
+        self.fund_path = Path(fund_path).expanduser()
+        self.qlib_dir = Path(qlib_dir).expanduser()
+        self.join_fields = self._split(join_field_name)
+        self.price_symbol_fields = self._split(price_symbol_field_name)
+        self.price_date_field_name = price_date_field_name
+        self.fund_date_field_name = fund_date_field_name
+        self.available_fields = self._split(available_field_name)
+        self.fill_lag_days = fill_lag_days
+        self.fund_query = fund_query
+        self._fund_include_fields = self._split(fund_include_fields)
+        self._fund_exclude_fields = self._split(fund_exclude_fields)
+        self.fund_prefix = fund_prefix
+        self.batch_size = batch_size
+        self.dump_kwargs = dump_kwargs
+        self._fuse_dir = self.qlib_dir.joinpath(self.FUSE_DIR_NAME)
+
+    @staticmethod
+    def _split(fields) -> tuple:
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        return tuple(filter(lambda x: len(x) > 0, map(str.strip, fields)))
+
+    def _get_fund_read_columns(self, column_names: list) -> list:
+        keys = set(self.join_fields) | {self.fund_date_field_name} | set(self.available_fields)
+        if self._fund_include_fields:
+            read_fields = set(self._fund_include_fields) | keys
+        else:
+            read_fields = set(column_names) - (set(self._fund_exclude_fields) - keys)
+        return [col for col in column_names if col in read_fields]
+
+    def _get_query_columns(self, column_names: list) -> list:
+        if self.fund_query is None:
+            return []
+        return [col for col in column_names if re.search(rf"\b{re.escape(col)}\b", self.fund_query)]
+
+    def _read_fund(self) -> pd.DataFrame:
+        logger.info("start read fundamentals......")
+        column_names = ds.dataset(str(self.fund_path), format="parquet").schema.names
+        columns = self._get_fund_read_columns(column_names)
+        query_columns = [col for col in self._get_query_columns(column_names) if col not in columns]
+        fund = pd.read_parquet(self.fund_path, columns=columns + query_columns)
+        if self.fund_query is not None:
+            fund = fund.query(self.fund_query).drop(columns=query_columns)
+
+        # the first non-null available date, never before the fiscal period end
+        period_end = pd.to_datetime(fund[self.fund_date_field_name])
+        available = pd.Series(pd.NaT, index=fund.index, dtype="datetime64[ns]")
+        for field in reversed(self.available_fields):
+            dates = pd.to_datetime(fund[field])
+            available = available.mask(dates.notna(), dates)
+        if self.fill_lag_days is not None:
+            available = available.fillna(period_end + pd.Timedelta(days=self.fill_lag_days))
+        fund[self.AVAILABLE_FIELD] = np.maximum(available.values, period_end.values)
+        dropped = fund[self.AVAILABLE_FIELD].isna() | period_end.isna() | fund[list(self.join_fields)].isna().any(axis=1)
+        if dropped.any():
+            logger.warning(f"{dropped.sum()} fundamental rows without available date or join fields are dropped")
+        fund = fund[~dropped]
+
+        # keep the latest period of each available date, and drop the restatements of older periods
+        fund = fund.sort_values([*self.join_fields, self.AVAILABLE_FIELD, self.fund_date_field_name], kind="stable")
+        fund = fund[~fund.duplicated([*self.join_fields, self.AVAILABLE_FIELD], keep="last").values]
+        period_ns = pd.to_datetime(fund[self.fund_date_field_name]).values.astype(np.int64)
+        latest = pd.Series(period_ns, index=fund.index).groupby([fund[col] for col in self.join_fields]).cummax()
+        fund = fund[period_ns == latest.values]
+        logger.info(f"{len(fund)} fundamental rows are fused")
+
+        # unmatched price rows are null, keep the dtypes of the fused columns the same in all batches
+        for col in fund.columns:
+            if col in self.join_fields or col == self.AVAILABLE_FIELD:
+                continue
+            if pd.api.types.is_integer_dtype(fund[col]) or pd.api.types.is_bool_dtype(fund[col]):
+                fund[col] = fund[col].astype("float64")
+        logger.info("end of read fundamentals.\n")
+        return fund.sort_values(self.AVAILABLE_FIELD, kind="stable").reset_index(drop=True)
+
+    def _rename_fund(self, fund: pd.DataFrame, price_columns: list) -> pd.DataFrame:
+        price_columns = set(price_columns)
+        return fund.rename(
+            columns={
+                col: f"{self.fund_prefix}{col}"
+                for col in fund.columns
+                if col in price_columns and col not in self.join_fields
+            }
+        )
+
+    def _cast_join_fields(self, price_schema: pa.Schema, fund: pd.DataFrame) -> dict:
+        # merge_asof needs the same dtypes of the join fields on both sides
+        casts = {}
+        price_dtypes = price_schema.empty_table().to_pandas().dtypes
+        for field in self.join_fields:
+            if price_dtypes[field] != fund[field].dtype:
+                logger.warning(f"dtypes of {field} are different, join on str")
+                fund[field] = fund[field].astype(str)
+                casts[field] = str
+        return casts
+
+    def fuse(self):
+        fund = self._read_fund()
+        price_file = pq.ParquetFile(self.price_path)
+        price_schema = price_file.schema_arrow
+        fund = self._rename_fund(fund, price_schema.names)
+        casts = self._cast_join_fields(price_schema, fund)
+        fund_fields = [col for col in fund.columns if col not in self.join_fields and col != self.AVAILABLE_FIELD]
+        schema = pa.unify_schemas(
+            [price_schema, pa.Schema.from_pandas(fund[fund_fields], preserve_index=False)]
+        ).remove_metadata()
+
+        logger.info("start fuse......")
+        shutil.rmtree(self._fuse_dir, ignore_errors=True)
+        self._fuse_dir.mkdir(parents=True)
+        fused_path = self._fuse_dir.joinpath(self.FUSED_FILE_NAME)
+        with pq.ParquetWriter(fused_path, schema) as writer, tqdm(total=price_file.metadata.num_rows) as p_bar:
+            for batch in price_file.iter_batches(batch_size=self.batch_size):
+                price = batch.to_pandas()
+                for field, dtype in casts.items():
+                    price[field] = price[field].astype(dtype)
+                price = price[price[self.price_date_field_name].notna()]
+                price = price.sort_values(self.price_date_field_name, kind="stable")
+                df = pd.merge_asof(
+                    price,
+                    fund,
+                    left_on=self.price_date_field_name,
+                    right_on=self.AVAILABLE_FIELD,
+                    by=list(self.join_fields),
+                    direction="backward",
+                )
+                writer.write_table(pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False))
+                p_bar.update(len(batch))
+        logger.info("end of fuse.\n")
+        return fused_path
+
+    def dump(self):
+        fused_path = self.fuse()
+        try:
+            DumpNumericCatagoryStream(
+                csv_path=fused_path,
+                qlib_dir=self.qlib_dir,
+                symbol_field_name=",".join(self.price_symbol_fields),
+                date_field_name=self.price_date_field_name,
+                **self.dump_kwargs,
+            ).dump()
+        finally:
+            shutil.rmtree(self._fuse_dir, ignore_errors=True)
+        self._dump_fusion()
+
+    def _dump_fusion(self):
+        # record the fusion in the manifest of the fused dataset
+        manifest_path = self.qlib_dir.joinpath(DumpNumericCatagoryStream.MANIFEST_FILE)
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+        manifest["fusion"] = dict(
+            price_path=str(self.price_path),
+            fund_path=str(self.fund_path),
+            join_fields=list(self.join_fields),
+            fund_date_field=self.fund_date_field_name,
+            available_fields=list(self.available_fields),
+            fill_lag_days=self.fill_lag_days,
+            fund_query=self.fund_query,
+            fund_prefix=self.fund_prefix,
+        )
+        manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    fire.Fire(FusePIT)
@@ -0,0 +1,237 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dump_single
+from dump_single import DumpNumeric, DumpNumericCatagoryStream, DumpNumericCatagoryUpdate
+
+
+def test_update_refuses_legacy_nulls(tmp_path, make_data, dump):
+    df = make_data()
+    qlib_dir = tmp_path / "qlib"
+    dump(df[df["date"] < "2001-02-01"], tmp_path / "base.parquet", qlib_dir)
+    catagory_path = qlib_dir / "catagories" / "kind.day.txt"
+    assert catagory_path.read_text().splitlines() == ["A", "B"]
+    # the layout of the older versions, nulls were a catagory line
+    catagory_path.write_text("A\nB\nNone\n")
+    with pytest.raises(ValueError, match="re-dump"):
+        dump(df[df["date"] >= "2001-02-01"], tmp_path / "delta.parquet", qlib_dir, cls=DumpNumericCatagoryUpdate)
+
+
+def read_dump(qlib_dir) -> dict:
+    files = {}
+    for path in sorted(qlib_dir.rglob("*")):
+        if path.is_file() and path.name not in ("manifest.json", "coverage.parquet"):
+            files[str(path.relative_to(qlib_dir))] = path.read_bytes()
+    files["coverage"] = pd.read_parquet(qlib_dir / "coverage.parquet").sort_values("symbol", ignore_index=True)
+    return files
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"sparse_ratio": 0.5, "float64_fields": "big", "compact_catagory": True}])
+def test_stream_and_bulk_equal_group(tmp_path, make_data, dump, kwargs):
+    df = make_data()
+    dump(df, tmp_path / "data.parquet", tmp_path / "group", **kwargs)
+    dump(df, tmp_path / "data.parquet", tmp_path / "bulk", engine="bulk", **kwargs)
+    # a tiny memory bound, so that the scan and the spill run over many batches and buckets
+    dump(
+        df, tmp_path / "data.parquet", tmp_path / "stream", cls=DumpNumericCatagoryStream, max_memory=0.00002, **kwargs
+    )
+    expected = read_dump(tmp_path / "group")
+    for name in ("bulk", "stream"):
+        files = read_dump(tmp_path / name)
+        pd.testing.assert_frame_equal(files.pop("coverage"), expected["coverage"])
+        assert files == {k: v for k, v in expected.items() if k != "coverage"}
+    assert (tmp_path / "group" / "catagories" / "filed.day.txt").read_text().splitlines() == sorted(
+        df["filed"].dropna().dt.strftime("%Y-%m-%d %H:%M:%S").unique()
+    )
+
+
+@pytest.mark.parametrize("platform", ["linux", "darwin"])
+def test_parallel_dump_forks_on_linux_only(tmp_path, make_data, dump, monkeypatch, platform):
+    df = make_data()
+    dump(df, tmp_path / "data.parquet", tmp_path / "serial")
+    monkeypatch.setattr(dump_single.sys, "platform", platform)
+    parallel = DumpNumeric._dump_features_parallel
+    calls = []
+    monkeypatch.setattr(DumpNumeric, "_dump_features_parallel", lambda self: calls.append(parallel(self)))
+    dump(df, tmp_path / "data.parquet", tmp_path / "parallel", max_workers=2)
+    assert len(calls) == (platform == "linux")
+    files, expected = read_dump(tmp_path / "parallel"), read_dump(tmp_path / "serial")
+    pd.testing.assert_frame_equal(files.pop("coverage"), expected.pop("coverage"))
+    assert files == expected
+
+
+def decode_catagory(qlib_dir, field: str) -> dict:
+    # codes of the dense bins to the catagory lines, the order of appended catagories differs from a full dump
+    lines = (qlib_dir / "catagories" / f"{field}.day.txt").read_text().splitlines()
+    decoded = {}
+    for path in sorted((qlib_dir / "features").glob(f"*/{field}.day.bin")):
+        codes = np.fromfile(path, dtype="<f")
+        values = [None if np.isnan(code) else lines[int(code)] for code in codes[1:]]
+        decoded[path.parent.name] = [int(codes[0])] + values
+    return decoded
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"sparse_ratio": 0.5, "float64_fields": "big", "compact_catagory": True}])
+def test_update_equals_full_dump(tmp_path, make_data, dump, kwargs):
+    df = make_data()
+    dump(df, tmp_path / "data.parquet", tmp_path / "full", **kwargs)
+    # the delta has new dates, new catagories and a new symbol, and overlaps the end of the base
+    base = df[(df["date"] < "2001-02-01") & (df["symbol"] != "S05")]
+    delta = df[(df["date"] >= "2001-01-25") | (df["symbol"] == "S05")]
+    dump(base, tmp_path / "base.parquet", tmp_path / "update", **kwargs)
+    dump(delta, tmp_path / "delta.parquet", tmp_path / "update", cls=DumpNumericCatagoryUpdate)
+    files, expected = read_dump(tmp_path / "update"), read_dump(tmp_path / "full")
+    pd.testing.assert_frame_equal(files.pop("coverage"), expected.pop("coverage"), check_dtype=False)
+    for name in [name for name in expected if "filed" in name]:
+        files.pop(name), expected.pop(name)
+    assert files == expected
+    assert decode_catagory(tmp_path / "update", "filed") == decode_catagory(tmp_path / "full", "filed")
+    manifest = json.loads((tmp_path / "update" / "manifest.json").read_text())
+    assert manifest["row_count"] == len(df)
+
+
+def test_bulk_keeps_rows_hidden_by_dropped_dates(tmp_path, make_data, dump, monkeypatch):
+    df = make_data()
+    first = df[df["symbol"] == "S00"].iloc[[0, 3]]
+    # a NaT date is located at the first calendar date, a duplicated row keeps the first one
+    extra = pd.concat([first.iloc[[0]].assign(date=pd.NaT, price=-1.0), first.iloc[[1]].assign(price=-2.0)])
+    df = pd.concat([extra.iloc[[0]], df, extra.iloc[[1]]], ignore_index=True)
+    # the rows on a date dropped from the calendar are off-calendar, located at the position of the next date
+    off_date = df.loc[df["symbol"] == "S01", "date"].iloc[2]
+    dump_calendars = DumpNumeric._dump_calendars
+
+    def drop_date(self):
+        dump_calendars(self)
+        self._calendars_list = [date for date in self._calendars_list if date != off_date]
+
+    monkeypatch.setattr(DumpNumeric, "_dump_calendars", drop_date)
+    dump(df, tmp_path / "data.parquet", tmp_path / "group")
+    dump(df, tmp_path / "data.parquet", tmp_path / "bulk", engine="bulk")
+    files, expected = read_dump(tmp_path / "bulk"), read_dump(tmp_path / "group")
+    pd.testing.assert_frame_equal(files.pop("coverage"), expected.pop("coverage"))
+    assert files == expected
+    price = np.fromfile(tmp_path / "bulk" / "features" / "s00" / "price.day.bin", dtype="<f")
+    assert price[1] == np.float32(first["price"].iloc[0])
+    assert price[1:][np.isin(price[1:], [-1.0, -2.0])].size == 0
+
+
+def test_update_takes_the_dump_options(tmp_path, make_data, dump):
+    df = make_data()
+    base, delta = df[df["date"] < "2001-02-01"], df[df["date"] >= "2001-02-01"]
+    dump(base, tmp_path / "base.parquet", tmp_path / "qlib", sparse_ratio=0.5)
+    manifest = json.loads((tmp_path / "qlib" / "manifest.json").read_text())
+    # the storage options of the dumped dataset are kept, the other options are the ones of a full dump
+    dump(
+        delta,
+        tmp_path / "delta.parquet",
+        tmp_path / "qlib",
+        cls=DumpNumericCatagoryUpdate,
+        binary_catagory=True,
+        sparse_ratio=0.9,
+    )
+    assert (tmp_path / "qlib" / "catagories" / "kind.day.arrow").exists()
+    updated = json.loads((tmp_path / "qlib" / "manifest.json").read_text())
+    assert updated["sparse_ratio"] == manifest["sparse_ratio"] == 0.5
+    assert updated["sparse_fields"] == manifest["sparse_fields"]
+
+
+def test_align_calendar():
+    calendar = list(pd.bdate_range("2001-01-01", periods=10))
+    dates = pd.Series(
+        [
+            calendar[5],
+            calendar[2],
+            pd.NaT,
+            # a saturday, before the first and after the last calendar date
+            pd.Timestamp("2001-01-06"),
+            pd.Timestamp("2000-12-29"),
+            pd.Timestamp("2001-02-01"),
+            calendar[3],
+        ]
+    )
+    dumper = object.__new__(DumpNumeric)
+    date_index, length, positions, mask = dumper.align_calendar(dates, calendar)
+    assert (date_index, length) == (2, 4)
+    np.testing.assert_array_equal(mask, [True, True, False, False, False, False, True])
+    np.testing.assert_array_equal(positions[mask], [3, 0, 1])
+    # the same located positions as a calendar index lookup
+    np.testing.assert_array_equal(positions[mask] + date_index, pd.DatetimeIndex(calendar).get_indexer(dates[mask]))
+    # no date on the calendar, the positions are still one per date
+    date_index, length, positions, mask = dumper.align_calendar(dates.iloc[2:6], calendar)
+    assert (date_index, length, len(positions), mask.any()) == (0, 0, 4, False)
+    # the calendar index is rebuilt for a new calendar list only
+    calendar_index = dumper._get_calendar_index(calendar)
+    assert dumper._get_calendar_index(calendar) is calendar_index
+    assert dumper._get_calendar_index(calendar[1:]) is not calendar_index
+
+
+def test_bins_equal_reindexed_source(tmp_path, dump):
+    # two symbols with gaps, the calendar is the union of their dates
+    df = pd.DataFrame(
+        {
+            "symbol": ["X", "X", "X", "Y", "Y"],
+            "date": pd.to_datetime(["2001-01-02", "2001-01-05", "2001-01-09", "2001-01-03", "2001-01-05"]),
+            "price": [1.0, 2.0, 3.0, 4.0, np.nan],
+        }
+    )
+    dump(df, tmp_path / "data.parquet", tmp_path / "qlib")
+    calendar = pd.to_datetime((tmp_path / "qlib" / "calendars" / "day.txt").read_text().split())
+    for symbol, group in df.groupby("symbol"):
+        data = np.fromfile(tmp_path / "qlib" / "features" / symbol.lower() / "price.day.bin", dtype="<f")
+        span = calendar[(calendar >= group["date"].min()) & (calendar <= group["date"].max())]
+        expected = group.set_index("date")["price"].reindex(span).to_numpy(dtype=np.float32)
+        assert data[0] == calendar.get_loc(group["date"].min())
+        np.testing.assert_array_equal(data[1:], expected)
+
+
+@pytest.mark.parametrize("cls", [dump_single.DumpNumericCatagory, DumpNumericCatagoryStream])
+@pytest.mark.parametrize(
+    "fields, read_columns, dumped",
+    [
+        ({"include_fields": "at,curcd"}, ["gvkey", "iid", "datadate", "at", "curcd"], {"at", "curcd"}),
+        # the fields of a multi-field symbol are not excluded
+        (
+            {"exclude_fields": "conm, sale"},
+            ["gvkey", "iid", "datadate", "at", "curcd"],
+            {"gvkey", "iid", "at", "curcd"},
+        ),
+        ({}, None, {"gvkey", "iid", "conm", "at", "sale", "curcd"}),
+    ],
+)
+def test_fields_pushed_down_to_the_read(tmp_path, monkeypatch, cls, fields, read_columns, dumped):
+    dates = pd.to_datetime(["2001-03-31", "2001-06-30", "2001-09-30"])
+    df = pd.DataFrame(
+        {
+            "gvkey": ["001"] * 3,
+            "conm": ["ACME"] * 3,
+            "iid": ["01"] * 3,
+            "datadate": dates,
+            "at": [1.0, 2.0, 3.0],
+            "sale": [4.0, 5.0, 6.0],
+            "curcd": ["USD", "USD", "GBP"],
+        }
+    )
+    df.to_parquet(tmp_path / "funda.parquet")
+    reads = []
+    read = dump_single.DumpNumeric._read
+
+    def spy(self, path, columns=None):
+        reads.append(columns)
+        return read(self, path, columns)
+
+    monkeypatch.setattr(dump_single.DumpNumeric, "_read", spy)
+    dumper = cls(
+        csv_path=tmp_path / "funda.parquet",
+        qlib_dir=tmp_path / "qlib",
+        symbol_field_name="gvkey,iid",
+        date_field_name="datadate",
+        max_workers=1,
+        **fields,
+    )
+    # the key fields are read besides the dumped fields, in the order of the file
+    assert (dumper._columns if cls is DumpNumericCatagoryStream else reads[0]) == read_columns
+    dumper.dump()
+    assert {path.name.split(".")[0] for path in (tmp_path / "qlib" / "features" / "001_01").iterdir()} == dumped
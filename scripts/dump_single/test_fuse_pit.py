@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fuse_pit import FusePIT
+
+
+@pytest.fixture()
+def paths(tmp_path):
+    dates = pd.bdate_range("2001-01-01", "2001-07-31")
+    price = pd.DataFrame(
+        {
+            "gvkey": np.repeat(["001", "002"], len(dates)),
+            "iid": "01",
+            "datadate": np.tile(dates, 2),
+            "prc": np.arange(2 * len(dates), dtype=float),
+        }
+    )
+    fund = pd.DataFrame(
+        [
+            # gvkey, fiscal period end, final filing, preliminary filing, at
+            ("001", "2000-09-30", None, "2000-11-10", 0.5),
+            ("001", "2000-12-31", "2001-03-15", "2001-02-20", 1.0),
+            # a restatement of an older period than the latest available one
+            ("001", "2000-09-30", "2001-04-20", None, 9.0),
+            # no available date
+            ("001", "2001-03-31", None, None, 2.0),
+            # filed before the period end, available at the period end
+            ("001", "2001-06-30", "2001-05-01", None, 3.0),
+            ("002", "2000-12-31", "2001-02-01", None, 5.0),
+            # two periods available on the same date, the latest one is kept
+            ("002", "2001-03-31", "2001-05-15", None, 7.0),
+            ("002", "2000-12-31", "2001-05-15", None, 6.0),
+        ],
+        columns=["gvkey", "datadate", "fdate", "pdate", "at"],
+    )
+    for col in ["datadate", "fdate", "pdate"]:
+        fund[col] = pd.to_datetime(fund[col])
+    price.to_parquet(tmp_path / "price.parquet")
+    fund.to_parquet(tmp_path / "fund.parquet")
+    return tmp_path
+
+
+def fuse(paths, **kwargs) -> pd.DataFrame:
+    fuse_pit = FusePIT(paths / "price.parquet", paths / "fund.parquet", paths / "qlib", batch_size=50, **kwargs)
+    return pd.read_parquet(fuse_pit.fuse()).set_index(["gvkey", "datadate"]).sort_index()
+
+
+def expected_at(gvkey: str, changes: list) -> pd.Series:
+    dates = pd.bdate_range("2001-01-01", "2001-07-31")
+    at = pd.Series(np.nan, index=dates)
+    for date, value in changes:
+        at[at.index >= date] = value
+    return at.set_axis(pd.MultiIndex.from_product([[gvkey], dates], names=["gvkey", "datadate"]))
+
+
+@pytest.mark.parametrize("fill_lag_days", [None, 30])
+def test_fuse(paths, fill_lag_days):
+    df = fuse(paths, fill_lag_days=fill_lag_days)
+    # the prices are all kept, the fiscal period end of the fundamentals is prefixed
+    assert len(df) == 2 * len(pd.bdate_range("2001-01-01", "2001-07-31"))
+    assert {"prc", "iid", "fund_datadate", "at"} <= set(df.columns)
+    # the final filing date comes first, the final values are not available on the preliminary one
+    changes = [("2001-01-01", 0.5), ("2001-03-15", 1.0)]
+    if fill_lag_days is not None:
+        changes.append(("2001-04-30", 2.0))
+    changes.append(("2001-06-30", 3.0))
+    expected = pd.concat(
+        [expected_at("001", changes), expected_at("002", [("2001-02-01", 5.0), ("2001-05-15", 7.0)])]
+    )
+    pd.testing.assert_series_equal(df["at"], expected, check_names=False)
+    # no fundamentals before they are available
+    available = df["fund_datadate"].dropna()
+    assert (available.index.get_level_values("datadate") >= available.values).all()
+
+
+def test_dump_records_fusion(paths):
+    FusePIT(
+        paths / "price.parquet",
+        paths / "fund.parquet",
+        paths / "qlib",
+        fill_lag_days=30,
+        max_workers=1,
+    ).dump()
+    manifest = json.loads((paths / "qlib" / "manifest.json").read_text())
+    assert manifest["fusion"]["fill_lag_days"] == 30
+    assert manifest["fusion"]["available_fields"] == ["fdate", "pdate"]
+    assert not (paths / "qlib" / FusePIT.FUSE_DIR_NAME).exists()
+    assert (paths / "qlib" / "features" / "001_01" / "at.day.bin").exists()
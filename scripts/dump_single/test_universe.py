@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dump_single import DumpNumericCatagoryUpdate
+from universe import Universe
+
+
+@pytest.fixture()
+def dumped(tmp_path, make_data, dump):
+    df = make_data()
+    qlib_dir = tmp_path / "qlib"
+    dump(df, tmp_path / "data.parquet", qlib_dir, sparse_ratio=0.5, float64_fields="big", compact_catagory=True)
+    return df, qlib_dir
+
+
+def test_get_values(dumped):
+    df, qlib_dir = dumped
+    universe = Universe(qlib_dir)
+    assert universe.manifest["sparse_fields"] == ["rare"]
+    assert universe.manifest["bin_dtypes"]["big"] == "<f8"
+    assert universe.manifest["bin_dtypes"]["kind"] == "<u1"
+    source = df.assign(kind=df["kind"].map({"A": 0.0, "B": 1.0})).set_index(["date", "symbol"])
+    for date in universe.calendar:
+        expected = source.xs(date, level="date").reindex(universe.instruments["instrument"].values)
+        for field in ["price", "rare", "big", "kind"]:
+            values = universe.get_values(field, str(date.date()))
+            np.testing.assert_allclose(values, expected[field].to_numpy(np.float64), rtol=1e-6, equal_nan=True)
+    # the last calendar date not later than the date
+    np.testing.assert_array_equal(
+        universe.get_values("big", "2100-01-01"), universe.get_values("big", str(universe.calendar[-1].date()))
+    )
+
+
+def test_markets(dumped):
+    df, qlib_dir = dumped
+    universe = Universe(qlib_dir)
+    universe.longest(2)
+    universe.most_observed(3, fields="rare")
+    universe.top("price", str(universe.calendar[20].date()), n=2, ascending=True)
+
+    def read_market(name):
+        return pd.read_csv(qlib_dir / "instruments" / f"{name}.txt", sep="\t", header=None)[0].tolist()
+
+    # the spans of S00 and S01 are the longest
+    assert read_market("longest2") == ["S00", "S01"]
+    counts = df.groupby("symbol")["rare"].count()
+    expected = counts.reset_index().sort_values(["rare", "symbol"], ascending=[False, True])["symbol"][:3]
+    assert read_market("observed3") == sorted(expected)
+    prices = df[df["date"] == universe.calendar[20]].set_index("symbol")["price"]
+    assert read_market("topprice2") == sorted(prices.nsmallest(2).index)
+
+
+def test_get_values_of_updated_field(tmp_path, make_data, dump):
+    # price is added by dump_update, its bins start after the instruments
+    df = make_data()
+    qlib_dir = tmp_path / "qlib"
+    base = df[df["date"] < "2001-02-01"]
+    delta = df[df["date"] >= "2001-02-01"]
+    dump(base.drop(columns="price"), tmp_path / "base.parquet", qlib_dir, float64_fields="big")
+    dump(delta, tmp_path / "delta.parquet", qlib_dir, cls=DumpNumericCatagoryUpdate)
+    universe = Universe(qlib_dir)
+    source = delta.set_index(["date", "symbol"])["price"]
+    for date in universe.calendar:
+        values = universe.get_values("price", str(date.date()))
+        if date < pd.Timestamp("2001-02-01"):
+            assert np.isnan(values).all()
+        else:
+            expected = source.xs(date, level="date").reindex(universe.instruments["instrument"].values)
+            np.testing.assert_allclose(values, expected.to_numpy(np.float64), rtol=1e-6, equal_nan=True)
+    # the typed bins of big start with the instruments
+    np.testing.assert_array_equal(
+        universe.get_values("big", "2001-02-15"),
+        df[df["date"] == "2001-02-15"].set_index("symbol")["big"].reindex(universe.instruments["instrument"].values),
+    )
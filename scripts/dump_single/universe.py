@@ -0,0 +1,223 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+import os
+import json
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import fire
+import numpy as np
+import pandas as pd
+from loguru import logger
+from qlib.utils import fname_to_code, code_to_fname
+
+from dump_single import DumpNumeric
+
+
+class Universe:
+    def __init__(self, qlib_dir: str, freq: str = "day"):
+        """
+        Build market files(instruments/<market>.txt) of a dumped dataset, e.g. test100 or longest1k, from
+        instruments/all.txt, the calendar and the coverage counts recorded by the dump(coverage.parquet), so
+        that regenerating the universes after a re-dump loads no features.
+
+            python universe.py --qlib_dir ... longest --n 1000
+            python universe.py --qlib_dir ... most_observed --n 100 --fields prc,ret --market test100
+            python universe.py --qlib_dir ... top --field me --date 2020-12-31 --n 500
+
+        The selected instruments keep their spans of all.txt, ties are broken by the instrument name.
+
+        Parameters
+        ----------
+        qlib_dir: str
+            qlib(dump) data director
+        freq: str, default "day"
+            transaction frequency
+        """
+        self.qlib_dir = Path(qlib_dir).expanduser()
+        self.freq = freq
+        self._instruments_dir = self.qlib_dir.joinpath(DumpNumeric.INSTRUMENTS_DIR_NAME)
+        self._features_dir = self.qlib_dir.joinpath(DumpNumeric.FEATURES_DIR_NAME)
+        self.instruments = pd.read_csv(
+            self._instruments_dir.joinpath(DumpNumeric.INSTRUMENTS_FILE_NAME),
+            sep=DumpNumeric.INSTRUMENTS_SEP,
+            names=["instrument", DumpNumeric.INSTRUMENTS_START_FIELD, DumpNumeric.INSTRUMENTS_END_FIELD],
+            dtype=str,
+            keep_default_na=False,
+        )
+        manifest_path = self.qlib_dir.joinpath(DumpNumeric.MANIFEST_FILE)
+        self.manifest = json.loads(manifest_path.read_text(encoding="utf-8")) if manifest_path.exists() else {}
+        self.calendar = pd.DatetimeIndex(
+            pd.read_csv(
+                self.qlib_dir.joinpath(DumpNumeric.CALENDARS_DIR_NAME, f"{freq}.txt"), header=None, dtype=str
+            )[0]
+        )
+
+    @staticmethod
+    def _get_market_name(name: str, n: int) -> str:
+        # 1000 -> "1k", the name of the hand-built markets
+        return f"{name}{n // 1000}k" if n >= 1000 and n % 1000 == 0 else f"{name}{n}"
+
+    @staticmethod
+    def _split(fields) -> list:
+        if isinstance(fields, str):
+            fields = fields.split(",")
+        return [field.lower() for field in map(str.strip, fields) if len(field) > 0]
+
+    def _read_coverage(self) -> pd.DataFrame:
+        coverage_path = self.qlib_dir.joinpath(DumpNumeric.COVERAGE_FILE)
+        if not coverage_path.exists():
+            raise FileNotFoundError(f"{coverage_path} is not found, re-dump the dataset to record the coverage")
+        coverage = pd.read_parquet(coverage_path)
+        return coverage.set_index(coverage.columns[0]).reindex(self.instruments["instrument"].values, fill_value=0)
+
+    def _save(self, scores: np.ndarray, n: int, market: str, ascending: bool = False) -> pd.DataFrame:
+        """
+        save the top n instruments by scores, nan scores are never selected
+        """
+        scores = np.asarray(scores, dtype=np.float64)
+        valid = np.flatnonzero(~np.isnan(scores))
+        keys = scores[valid] if ascending else -scores[valid]
+        # sorted by score, then by the instrument name
+        selected = valid[np.lexsort((self.instruments["instrument"].values[valid], keys))[:n]]
+        if len(selected) < n:
+            logger.warning(f"only {len(selected)} instruments are selected for {market}")
+        df = self.instruments.iloc[np.sort(selected)]
+        market_path = self._instruments_dir.joinpath(f"{market}.txt")
+        df.to_csv(market_path, header=False, sep=DumpNumeric.INSTRUMENTS_SEP, index=False)
+        logger.info(f"{len(df)} instruments are saved to {market_path}")
+        return df
+
+    def _get_span_index(self) -> tuple:
+        """
+        calendar indexes of the start and the end of each instrument, the start is the start index of its bins
+        """
+        calendar = self.calendar.asi8
+        start = np.searchsorted(calendar, pd.DatetimeIndex(self.instruments[DumpNumeric.INSTRUMENTS_START_FIELD]).asi8)
+        end = np.searchsorted(calendar, pd.DatetimeIndex(self.instruments[DumpNumeric.INSTRUMENTS_END_FIELD]).asi8)
+        return start, end
+
+    def get_spans(self) -> np.ndarray:
+        """
+        number of calendar periods between the start and the end of each instrument
+        """
+        start, end = self._get_span_index()
+        return end - start + 1
+
+    def longest(self, n: int = 1000, market: str = None):
+        """
+        the instruments of the longest spans on the calendar
+        """
+        self._save(self.get_spans(), n, market or self._get_market_name("longest", n))
+
+    def most_observed(self, n: int = 1000, market: str = None, fields: str = ""):
+        """
+        the instruments of the most non-null values of fields(all dumped fields if empty), or of the most rows if
+        fields is "rows"
+        """
+        coverage = self._read_coverage()
+        fields = self._split(fields)
+        if fields == ["rows"]:
+            scores = coverage[DumpNumeric.COVERAGE_ROWS_FIELD]
+        else:
+            columns = coverage.columns.drop(DumpNumeric.COVERAGE_ROWS_FIELD)
+            missing = set(fields) - set(columns)
+            if missing:
+                raise ValueError(f"{sorted(missing)} are not dumped")
+            scores = coverage[fields or list(columns)].sum(axis=1)
+        self._save(scores.to_numpy(), n, market or self._get_market_name("observed", n))
+
+    def get_values(self, field: str, date: str, max_workers: int = 16) -> np.ndarray:
+        """
+        values of field on the last calendar date not later than date, nan for the instruments whose span or bin does
+        not cover the date.
+
+        only the bins of the instruments whose span of all.txt covers the date are opened, each one is read by a
+        pread of its header and of the value at the calendar index minus the start index of the header in a thread
+        pool. the bin of a field may start after the instrument, e.g. a field added by dump_update, or a symbol
+        whose first rows of the field are null.
+        """
+        field = field.lower()
+        index = np.searchsorted(self.calendar.asi8, pd.Timestamp(date).value, side="right") - 1
+        if index < 0:
+            raise ValueError(f"{date} is before the calendar")
+        logger.info(f"values of {field} on {self.calendar[index].date()}")
+        start, end = self._get_span_index()
+        covered = np.flatnonzero((start <= index) & (index <= end))
+        instruments = self.instruments["instrument"].values[covered]
+
+        if field in self.manifest.get("sparse_fields", []):
+            suffix, read = DumpNumeric.SPARSE_FILE_SUFFIX, self._read_sparse_value
+        elif field in self.manifest.get("bin_dtypes", {}):
+            # the dtype of each bin is in its header, dump_update may widen the codes of the updated symbols only
+            suffix, read = DumpNumeric.TYPED_FILE_SUFFIX, self._read_typed_value
+        else:
+            suffix, read = DumpNumeric.DUMP_FILE_SUFFIX, self._read_value
+        file_name = f"{field}.{self.freq}{suffix}"
+        paths = [
+            os.path.join(self._features_dir, code_to_fname(fname_to_code(instrument.lower())).lower(), file_name)
+            for instrument in instruments
+        ]
+        values = np.full(len(self.instruments), np.nan)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            values[covered] = list(executor.map(read, paths, [int(index)] * len(paths), chunksize=256))
+        return values
+
+    @staticmethod
+    def _read_value(path: str, index: int) -> float:
+        # [start index, values...] as float32
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return np.nan
+        try:
+            header = np.frombuffer(os.pread(fd, 4, 0), dtype="<f")
+            if not len(header) or index < int(header[0]):
+                return np.nan
+            value = np.frombuffer(os.pread(fd, 4, (index - int(header[0]) + 1) * 4), dtype="<f")
+        finally:
+            os.close(fd)
+        return float(value[0]) if len(value) else np.nan
+
+    @staticmethod
+    def _read_typed_value(path: str, index: int) -> float:
+        # [dtype as 8 bytes ascii, start index as int64], then [values...] as dtype
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return np.nan
+        try:
+            header = os.pread(fd, DumpNumeric.TYPED_HEADER_SIZE, 0)
+            if len(header) < DumpNumeric.TYPED_HEADER_SIZE:
+                return np.nan
+            dtype = np.dtype(header[:8].rstrip(b"\0").decode("ascii"))
+            position = index - int(np.frombuffer(header[8:], dtype="<i8")[0])
+            if position < 0:
+                return np.nan
+            value = np.frombuffer(
+                os.pread(fd, dtype.itemsize, DumpNumeric.TYPED_HEADER_SIZE + position * dtype.itemsize), dtype=dtype
+            )
+        finally:
+            os.close(fd)
+        if not len(value):
+            return np.nan
+        return float(DumpNumeric._from_typed(value)[0])
+
+    @staticmethod
+    def _read_sparse_value(path: str, index: int) -> float:
+        if not os.path.exists(path):
+            return np.nan
+        _, _, positions, values = DumpNumeric._read_sparse(Path(path))
+        pos = np.searchsorted(positions, index)
+        return float(values[pos]) if pos < len(positions) and positions[pos] == index else np.nan
+
+    def top(self, field: str, date: str, n: int = 100, market: str = None, ascending: bool = False):
+        """
+        the instruments of the largest(smallest if ascending) values of field on date, e.g. market equity
+        """
+        values = self.get_values(field, date)
+        self._save(values, n, market or self._get_market_name(f"top{field.lower()}", n), ascending=ascending)
+
+
+if __name__ == "__main__":
+    fire.Fire(Universe)
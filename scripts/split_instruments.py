@@ -4,6 +4,7 @@ import fire
 from tqdm import tqdm
 import os
 import pandas as pd
+import pyarrow.dataset as ds
 from pathlib import Path
 from loguru import logger
 from qlib.utils import exists_qlib_data
@@ -16,7 +17,9 @@ class SplitInstruments:
         csv_path: str,
         target_dir : str,
         symbol_field_name: str = "symbol",
-        max_workers: int = 16,):
+        max_workers: int = 16,
+        exclude_fields: str = "",
+        include_fields: str = "",):
         """
         split one stock csv data into several csv datas
         each csv data is named using stock name
@@ -31,9 +34,19 @@ class SplitInstruments:
             symbol field name
         max_workers: int, default None
             number of threads
+        include_fields: str
+            fields saved in each csv, the symbol field is always saved
+        exclude_fields: str
+            fields not saved
         """
         
         csv_path=Path(csv_path).expanduser()
+        if isinstance(exclude_fields, str):
+            exclude_fields = exclude_fields.split(",")
+        if isinstance(include_fields, str):
+            include_fields = include_fields.split(",")
+        self._exclude_fields = tuple(filter(lambda x: len(x) > 0, map(str.strip, exclude_fields)))
+        self._include_fields = tuple(filter(lambda x: len(x) > 0, map(str.strip, include_fields)))
         self.symbol_field_name = symbol_field_name
         self.csv_file=self._read(csv_path)
         self.target_dir = Path(target_dir).expanduser()
@@ -42,9 +55,19 @@ class SplitInstruments:
     def _read(self,path):
         path=str(path)
         if path.endswith('csv'):
-            return pd.read_csv(path)
+            return pd.read_csv(path, usecols=self._get_read_columns(pd.read_csv(path, nrows=0).columns))
         elif path.endswith('parquet'):
-            return pd.read_parquet(path)
+            return pd.read_parquet(path, columns=self._get_read_columns(ds.dataset(path, format="parquet").schema.names))
+
+    def _get_read_columns(self, column_names):
+        # push the field selection down to the reader, so that the other columns are never decoded
+        if self._include_fields:
+            read_fields = set(self._include_fields) | {self.symbol_field_name}
+        elif self._exclude_fields:
+            read_fields = set(column_names) - (set(self._exclude_fields) - {self.symbol_field_name})
+        else:
+            return None
+        return [col for col in column_names if col in read_fields]
 
     def split(self):
         self.target_dir.mkdir(parents=True, exist_ok=True)